@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException
+from app.jobs.export_pool import is_yolo_dataset
 from app.models.save import SegmentationsYOLOMetadata
 from app.utils.paths import SEGMENTATIONS_DIR
 from pathlib import Path
@@ -14,7 +15,11 @@ def list_datasets():
     if not SEGMENTATIONS_DIR.exists():
         raise HTTPException(500, detail="Datasets directory missing")
     
-    datasets_names = [name for name in os.listdir(SEGMENTATIONS_DIR) if (SEGMENTATIONS_DIR / name).is_dir()]
+    # only YOLO label exports can be trained on; mask-only exports are left out
+    datasets_names = [
+        name for name in os.listdir(SEGMENTATIONS_DIR)
+        if (SEGMENTATIONS_DIR / name).is_dir() and is_yolo_dataset(SEGMENTATIONS_DIR / name)
+    ]
 
     metadata_list = [load_metadata(name) for name in datasets_names]
 
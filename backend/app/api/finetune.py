@@ -2,7 +2,9 @@ from fastapi import APIRouter, HTTPException
 from app.models.finetune import FineTuneRequest
 from app.services.model_service import ModelService
 from app.jobs.enqueue import enqueue_finetune_job
+from app.jobs.export_pool import is_yolo_dataset
 from app.jobs.store import create_job
+from app.utils.paths import SEGMENTATIONS_DIR
 
 router = APIRouter(prefix="/finetune", tags=["finetune"])
 svc = ModelService()
@@ -11,13 +13,20 @@ svc = ModelService()
 def start_finetune(req: FineTuneRequest):
     try:
         model = svc.get_model(req.base_model_id)
-        svc.resolve_checkpoint(req.base_model_id, req.checkpoint)
+        checkpoint = svc.resolve_checkpoint(req.base_model_id, req.checkpoint)
     except KeyError as e:
         raise HTTPException(400, str(e))
+
+    if checkpoint.suffix != ".pt":
+        raise HTTPException(400, "Only PyTorch checkpoints can be fine-tuned")
     
     if model["task"] != "segment":
         raise HTTPException(400, "Only segmentation models are supported")
-    
+
+    unlabelled = [d for d in req.dataset_ids if not is_yolo_dataset(SEGMENTATIONS_DIR / d)]
+    if unlabelled:
+        raise HTTPException(400, f"Datasets without a YOLO export: {', '.join(unlabelled)}")
+
     job = create_job(
         base_model_id=req.base_model_id,
         checkpoint=req.checkpoint,
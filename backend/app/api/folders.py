@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException
-from app.utils.paths import UPLOADS_DIR, SEGMENTATIONS_DIR
+from app.utils.paths import UPLOADS_DIR, SEGMENTATIONS_DIR, RESIZED_IMAGES_DIR
 from app.utils.validation import list_image_files, get_first_image_size
 from app.models.folders import RenameFolderRequest, FolderMetadata, UpdateDescriptionRequest
 import os
@@ -47,6 +47,9 @@ async def delete_folders(folder: str):
     except OSError as e:
         raise HTTPException(500, detail=f"Error deleting folder: {str(e)}")
     
+    # frames pre-resized for training are only a cache
+    shutil.rmtree(RESIZED_IMAGES_DIR / folder, ignore_errors=True)
+
     seg_path = SEGMENTATIONS_DIR / folder
     if seg_path.exists():
         try:
@@ -124,6 +127,8 @@ async def rename_folder(req: RenameFolderRequest):
             500,
             detail=f"Error renaming folder: {str(e)}"
         )
+
+    shutil.rmtree(RESIZED_IMAGES_DIR / old_name, ignore_errors=True)
     
     return {"message": "Folder renamed successfully", "new_name": new_name}
 
@@ -5,6 +5,7 @@ from pathlib import Path
 import time
 import json
 
+from app.jobs.cancel import request_cancel
 from app.jobs.store import load_job
 from app.utils.paths import JOBS_DIR
 
@@ -59,5 +60,5 @@ def cancel_job(job_id: str):
     if not job_dir.exists():
         raise HTTPException(404, "Job not found")
 
-    (job_dir / "cancel.flag").write_text("1")
+    request_cancel(job_id)
     return {"status": "cancel_requested"}
@@ -1,5 +1,14 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pathlib import Path
+import uuid
+from app.jobs.evaluation import EVALUATION_THREAD, run_evaluation
+from app.jobs.export_pool import is_yolo_dataset, submit_job
+from app.models.ml_models import EvaluateCheckpointsRequest
+from app.services.job_events import stream_job
+from app.services.job_store import EVALUATION_JOBS
 from app.services.model_service import ModelService
+from app.utils.paths import SEGMENTATIONS_DIR
 
 router = APIRouter(prefix="/ml_models", tags=["ml_models"])
 svc = ModelService()
@@ -68,10 +77,82 @@ def list_checkpoints(model_id: str):
             "id": c["id"],
             "label": c["label"],
             "epoch": c.get("epoch"),
+            "format": c["format"],
+            "precision": c.get("precision"),
+            "accuracy_delta": c.get("accuracy_delta"),
             "recommended": c.get("recommended", False),
         })
 
     return {
         "model_id": model_id,
         "checkpoints": out,
-    }
\ No newline at end of file
+    }
+
+@router.post("/{model_id}/evaluate")
+def evaluate_checkpoints(model_id: str, req: EvaluateCheckpointsRequest):
+    try:
+        model = svc.get_model(model_id)
+        checkpoints = svc.list_checkpoints(model_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Model not found")
+
+    if model["task"] != "segment":
+        raise HTTPException(400, "Only segmentation models are supported")
+
+    if req.checkpoints:
+        unknown = set(req.checkpoints) - {c["id"] for c in checkpoints}
+        if unknown:
+            raise HTTPException(404, f"Checkpoints not found: {', '.join(sorted(unknown))}")
+        checkpoints = [c for c in checkpoints if c["id"] in req.checkpoints]
+
+    if req.dataset_ids:
+        missing = [d for d in req.dataset_ids if not (SEGMENTATIONS_DIR / d).exists()]
+        if missing:
+            raise HTTPException(404, f"Datasets not found: {', '.join(missing)}")
+        unlabelled = [d for d in req.dataset_ids if not is_yolo_dataset(SEGMENTATIONS_DIR / d)]
+        if unlabelled:
+            raise HTTPException(400, f"Datasets without a YOLO export: {', '.join(unlabelled)}")
+    elif model["source"] != "finetuned":
+        raise HTTPException(400, "dataset_ids are required for models without a fine-tuning dataset")
+    elif not (Path(model["run_dir"]) / "dataset" / "data.yaml").exists():
+        # the training view the run directory links to was removed
+        raise HTTPException(409, "The fine-tuning dataset of this model no longer exists; pass dataset_ids to evaluate it")
+
+    job_id = str(uuid.uuid4())
+
+    EVALUATION_JOBS[job_id] = {
+        "model_id": model_id,
+        "checkpoints": [c["id"] for c in checkpoints],
+        "status": "running",
+        "processed": 0,
+        "total": len(checkpoints),
+        "progress": 0.0,
+        "results": [],
+        "error": None
+    }
+
+    submit_job(EVALUATION_THREAD, EVALUATION_JOBS, job_id, run_evaluation, model, checkpoints, req, job_id)
+
+    return {
+        "job_id": job_id,
+        "status": "started"
+    }
+
+@router.get("/evaluate/progress")
+def evaluation_progress(job_id: str):
+    job = EVALUATION_JOBS.get(job_id)
+
+    if not job:
+        raise HTTPException(404, "Job not found")
+
+    return job
+
+@router.get("/evaluate/stream")
+async def evaluation_stream(job_id: str):
+    if job_id not in EVALUATION_JOBS:
+        raise HTTPException(404, "Job not found")
+
+    return StreamingResponse(
+        stream_job(EVALUATION_JOBS, job_id),
+        media_type="text/event-stream"
+    )
@@ -1,27 +1,21 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
 from app.services.mask_store import MASK_STORE
-from app.services.job_store import YOLO_JOBS
+from app.services.job_store import YOLO_JOBS, EXPORT_JOBS
+from app.services.job_events import stream_job
 from app.models.save import *
+from app.jobs.export_pool import submit_export_job
+from app.jobs.yolo_export import run_yolo_export
+from app.jobs.mask_export import run_mask_export
+from app.jobs.overlay_video import run_overlay_export
 from app.utils.validation import safe_folder_path
-from app.utils.paths import SEGMENTATIONS_DIR, UPLOADS_DIR
-from app.utils.cocos import COCO_LABELS
-import os
-import json
-import cv2
+from pathlib import Path
 import uuid
-import asyncio
-import numpy as np
-from datetime import datetime
-from collections import defaultdict
 
 router = APIRouter(prefix="/save", tags=["save"])
 
 @router.post("/segmentations-yolo")
-async def save_segmentations_yolo(
-    req: SaveSegmentationsYOLORequest,
-    background_tasks: BackgroundTasks
-):
+async def save_segmentations_yolo(req: SaveSegmentationsYOLORequest):
     folder = req.folder
 
     if folder not in MASK_STORE.store:
@@ -37,7 +31,7 @@ async def save_segmentations_yolo(
         "error": None
     }
 
-    background_tasks.add_task(run_yolo_export, folder, req, job_id)
+    submit_export_job("yolo", YOLO_JOBS, job_id, run_yolo_export, folder, req, job_id)
 
     return {
         "job_id": job_id,
@@ -55,145 +49,94 @@ async def yolo_export_progress(job_id: str):
 
 @router.get("/segmentations-yolo/stream")
 async def yolo_progress_stream(job_id: str):
-    async def event_generator():
-        while True:
-            job = YOLO_JOBS[job_id]
-            if not job:
-                break
-            yield f"data: {json.dumps(job)}\n\n"
-            if job["status"] == "completed":
-                break
-            await asyncio.sleep(0.3)
+    if job_id not in YOLO_JOBS:
+        raise HTTPException(404, "Job not found")
 
     return StreamingResponse(
-        event_generator(),
+        stream_job(YOLO_JOBS, job_id),
         media_type="text/event-stream"
     )
 
-def run_yolo_export(folder: str, req: SaveSegmentationsYOLORequest, job_id: str):
-    store = MASK_STORE.store[folder]
-    obj_meta = MASK_STORE.objects.get(folder, {})
-
-    src_images_dir = UPLOADS_DIR / folder
-
-    save_dir = SEGMENTATIONS_DIR / folder
-    labels_dir = save_dir / "labels"
-    images_dir = save_dir / "images"
-
-    labels_dir.mkdir(parents=True, exist_ok=True)
-    images_dir.mkdir(parents=True, exist_ok=True)
-
-    total = len(store)
-    YOLO_JOBS[job_id]["total"] = total
+@router.post("/segmentations-coco")
+async def save_segmentations_coco(req: SaveSegmentationsJSONRequest):
+    return start_mask_export(req.folder, "coco_rle", req.save_negatives)
 
-    processed = 0
+@router.post("/segmentations-png")
+async def save_segmentations_png(req: SaveSegmentationsPNGRequest):
+    return start_mask_export(req.folder, "png", req.save_negatives)
 
-    empty_count = 0
-    label_count = 0
+@router.post("/overlay-video")
+async def save_overlay_video(req: SaveOverlayVideoRequest):
+    if not safe_folder_path(req.folder).exists():
+        raise HTTPException(404, detail="Folder not found")
 
-    used_classes = set()
-    labels_per_object = defaultdict(int)
-    labels_per_class = defaultdict(int)
-
-    for frame_idx, obj_masks in store.items():
-        label_lines = []
+    job_id = str(uuid.uuid4())
 
-        src_img = src_images_dir / f"{frame_idx:05d}.jpg"
-        dst_img = images_dir / f"{frame_idx:05d}.jpg"
+    EXPORT_JOBS[job_id] = {
+        "format": f"overlay_{req.format}",
+        "status": "running",
+        "processed": 0,
+        "total": 0,
+        "progress": 0.0,
+        "error": None,
+        "path": None
+    }
 
-        if src_img.exists() and not dst_img.exists():
-            os.symlink(src_img, dst_img)
+    submit_export_job("overlay", EXPORT_JOBS, job_id, run_overlay_export, req.folder, req, job_id)
 
+    return {
+        "job_id": job_id,
+        "status": "started"
+    }
 
-        for obj_id, mask in obj_masks.items():
-            class_id = obj_meta.get(obj_id, {}).get("class_id")
-            used_classes.add(class_id)
-            if class_id is None:
-                continue
+@router.get("/overlay-video/file")
+async def get_overlay_video(job_id: str):
+    job = EXPORT_JOBS.get(job_id)
 
-            h, w = mask.shape
+    if not job or not job.get("path"):
+        raise HTTPException(404, "Video not found")
 
-            contours, _ = cv2.findContours(
-                mask.astype(np.uint8),
-                cv2.RETR_EXTERNAL,
-                cv2.CHAIN_APPROX_SIMPLE
-            )
+    path = Path(job["path"])
+    media_type = "video/mp4" if path.suffix == ".mp4" else "video/x-motion-jpeg"
+    return FileResponse(path, media_type=media_type, filename=path.name)
 
-            for cnt in contours:
-                if cv2.contourArea(cnt) < req.min_area:
-                    continue
+@router.get("/exports/progress")
+async def export_progress(job_id: str):
+    job = EXPORT_JOBS.get(job_id)
 
-                if req.simplify:
-                    eps = 0.005 * cv2.arcLength(cnt, True)
-                    cnt = cv2.approxPolyDP(cnt, eps, True)
+    if not job:
+        raise HTTPException(404, "Job not found")
 
-                cnt = cnt.squeeze()
-                if cnt.ndim != 2 or cnt.shape[0] < 3:
-                    continue
+    return job
 
-                coords = []
-                for x, y in cnt:
-                    coords.append(x / w)
-                    coords.append(y / h)
+@router.get("/exports/stream")
+async def export_progress_stream(job_id: str):
+    if job_id not in EXPORT_JOBS:
+        raise HTTPException(404, "Job not found")
 
-                label_lines.append(
-                    " ".join([str(class_id)] + [f"{c:.6f}" for c in coords])
-                )
-                label_count += 1
+    return StreamingResponse(
+        stream_job(EXPORT_JOBS, job_id),
+        media_type="text/event-stream"
+    )
 
-                labels_per_object[obj_id] += 1
-                labels_per_class[class_id] += 1
+def start_mask_export(folder: str, fmt: str, save_negatives: bool):
+    if folder not in MASK_STORE.store:
+        raise HTTPException(404, detail="No masks found for folder")
 
-            empty = len(label_lines) == 0
-            if empty:
-                empty_count += 1
+    job_id = str(uuid.uuid4())
 
-        out_path = labels_dir / f"{frame_idx:05d}.txt"
-        with open(out_path, "w") as f:
-            f.write("\n".join(label_lines))
+    EXPORT_JOBS[job_id] = {
+        "format": fmt,
+        "status": "running",
+        "processed": 0,
+        "total": 0,
+        "progress": 0.0,
+        "error": None
+    }
 
-        processed += 1
-        YOLO_JOBS[job_id]["processed"] = processed
-        YOLO_JOBS[job_id]["progress"] = processed / total
+    submit_export_job("mask", EXPORT_JOBS, job_id, run_mask_export, folder, fmt, save_negatives, job_id)
 
-    meta = {
-        "dataset_id": folder,
-        "created_at": datetime.now().isoformat(),
+    return {
         "job_id": job_id,
-        "type": "yolo_segmentation",
-        "counts": {
-            "frames_total": total,
-            "frames_written": processed,
-            "frames_empty": empty_count,
-            "labels_total": label_count
-        },
-        "objects": [
-            {
-                "object_id": str(obj_id),
-                "class_id": obj_meta.get(obj_id, {}).get("class_id"),
-                "class_name": COCO_LABELS.get(obj_meta.get(obj_id, {}).get("class_id")),
-                "labels_written": count,
-            }
-            for obj_id, count in labels_per_object.items()
-        ],
-        "classes": [
-            {
-                "id": cid,
-                "name": COCO_LABELS[cid],
-                "labels_written": count,
-            }
-            for cid, count in sorted(labels_per_class.items())
-        ],
-        "export_config": {
-            "min_area": req.min_area,
-            "simplify": req.simplify
-        }
+        "status": "started"
     }
-
-    tmp = save_dir / "dataset.json.tmp"
-    with open(tmp, "w") as f:
-        json.dump(meta, f, indent=2)
-    tmp.replace(save_dir / "dataset.json")
-
-    YOLO_JOBS[job_id]["status"] = "completed"
-    YOLO_JOBS[job_id]["progress"] = 1.0
\ No newline at end of file
@@ -1,19 +1,28 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import JSONResponse, StreamingResponse
 from app.models.segmentation import *
-from app.services.sam2_engine import SAM2Engine
+from app.services.sam2_scheduler import SAM2Scheduler, BULK
+from app.services.sam2_pool import SAM2_WORKERS, SAM2WorkerPool, get_scheduler, release_folder
 from app.services.mask_store import MASK_STORE
+from app.services.chunked_propagation import propagate_chunked, propagate_preview, refine_span
+from app.services.job_events import stream_job
+from app.services.job_store import AUTO_LABEL_JOBS
+from app.services.model_service import ModelService
+from app.jobs.auto_label import AUTO_LABEL_THREAD, run_auto_label
+from app.jobs.export_pool import submit_job
 from app.utils.cocos import COCO_LABELS
-from app.utils.validation import safe_folder_path
+from app.utils.validation import safe_folder_path, list_frame_files
 from app.utils.overlay import make_overlay 
 import base64
 import cv2
 import numpy as np
+from pathlib import Path
 import io
-import torch
+import uuid
 
 
 router = APIRouter(prefix="/segmentation", tags=["segmentation"])
+svc = ModelService()
 
 @router.post("/load-model")
 async def load_model(req: LoadModelRequest):
@@ -22,9 +31,8 @@ async def load_model(req: LoadModelRequest):
     if not folder_path.exists():
         raise HTTPException(404, detail="Folder not found")
 
-    engine = SAM2Engine.get_instance()
-    engine.load()
-    state = engine.load_video_once(str(folder_path))
+    scheduler = get_scheduler(req.folder)
+    await scheduler.run(req.folder, lambda engine: engine.load_video_once(str(folder_path)))
 
     return {
         "status": "model_loaded",
@@ -43,14 +51,9 @@ async def delete_object(req: DeleteObjRequest):
 @router.post("/click")
 async def process_click(req: SegmentRequest):
     folder_path = safe_folder_path(req.folder)
-    engine = SAM2Engine.get_instance()
+    scheduler = get_scheduler(req.folder)
 
-    state = engine.load_video_once(str(folder_path))
-
-    frame_files = sorted(
-        [p for p in folder_path.iterdir() if p.suffix.lower() in [".jpg", ".jpeg", ".png"]],
-        key=lambda x: int(''.join(filter(str.isdigit, x.name)) or -1)
-    )
+    frame_files = list_frame_files(folder_path)
 
     if req.frame_index >= len(frame_files):
         raise HTTPException(400, "Invalid frame index")
@@ -58,19 +61,17 @@ async def process_click(req: SegmentRequest):
     point = np.array([[req.x, req.y]], dtype=np.float32)
     label = np.array([1 if req.is_positive else 0], dtype=np.int32)
 
-    _, out_obj_ids, out_logits = engine.predictor.add_new_points_or_box(
-        inference_state=state,
-        frame_idx=req.frame_index,
-        obj_id=req.object_id,
-        points=point,
-        labels=label,
+    out_obj_ids, out_masks = await scheduler.run(
+        req.folder,
+        lambda engine: engine.add_click(str(folder_path), req.frame_index, req.object_id, point, label),
+        key=("click", req.folder, req.frame_index, req.object_id),
     )
 
+    MASK_STORE.mark_prompted(req.folder, req.frame_index, req.object_id)
+
     updated_masks = []
 
-    for idx, obj_id in enumerate(out_obj_ids):
-        prob = torch.sigmoid(out_logits[idx])
-        mask = (prob > 0.5).int().squeeze().cpu().numpy().astype(np.uint8)
+    for obj_id, mask in zip(out_obj_ids, out_masks):
         coverage = float(mask.mean())
         pixels_on = int(mask.sum())
         h, w = mask.shape
@@ -101,26 +102,56 @@ async def propagate_masks(req: PropagateRequest):
     folder_path = safe_folder_path(req.folder)
     total_frames = req.total_frames
 
-    engine = SAM2Engine.get_instance()
-
-    state = engine.load_video_once(str(folder_path))
+    scheduler = get_scheduler(req.folder)
 
-    frame_files = sorted(
-        [p for p in folder_path.iterdir() if p.suffix.lower() in [".jpg", ".jpeg", ".png"]],
-        key=lambda x: int(''.join(filter(str.isdigit, x.name)) or -1)
-    )
+    frame_files = list_frame_files(folder_path)
 
     if len(frame_files) == 0:
         raise HTTPException(400, "No frames found")
-    
-    for out_frame_idx, out_obj_ids, out_logits in engine.predictor.propagate_in_video(state):
-        for idx, obj_id in enumerate(out_obj_ids):
-            prob = torch.sigmoid(out_logits[idx])
-            mask = (prob > 0.5).int().squeeze().cpu().numpy().astype(np.uint8)
 
-            MASK_STORE.save_mask(req.folder, out_frame_idx, int(obj_id), mask)
+    if req.mode in ("chunked", "preview"):
+        if req.chunk_overlap >= req.chunk_size:
+            raise HTTPException(400, "chunk_overlap must be smaller than chunk_size")
+        if req.preview_stride < 1:
+            raise HTTPException(400, "preview_stride must be at least 1")
+
+        try:
+            if req.mode == "preview":
+                stats = await propagate_preview(
+                    req.folder,
+                    str(folder_path),
+                    len(frame_files),
+                    req.preview_stride,
+                    req.chunk_size,
+                    req.chunk_overlap,
+                )
+            else:
+                stats = await propagate_chunked(
+                    req.folder,
+                    str(folder_path),
+                    list(range(len(frame_files))),
+                    req.chunk_size,
+                    req.chunk_overlap,
+                )
+        except NotImplementedError as e:
+            raise HTTPException(501, str(e))
+        return {
+            "status": "success",
+            "folder": req.folder,
+            "mode": req.mode,
+            **stats,
+        }
+
+    def propagate(engine):
+        for out_frame_idx, out_obj_ids, out_masks in engine.propagate(str(folder_path)):
+            for obj_id, mask in zip(out_obj_ids, out_masks):
+                MASK_STORE.save_mask(req.folder, out_frame_idx, obj_id, mask)
+            yield out_frame_idx
 
-    engine.predictor.reset_state(state)
+    try:
+        await scheduler.run(req.folder, propagate, priority=BULK)
+    except NotImplementedError as e:
+        raise HTTPException(501, str(e))
 
     return {
         "status": "success",
@@ -128,16 +159,42 @@ async def propagate_masks(req: PropagateRequest):
         "frames_updated": len(frame_files),
     }
 
+@router.post("/refine")
+async def refine_masks(req: RefineRequest):
+    folder_path = safe_folder_path(req.folder)
+    frame_files = list_frame_files(folder_path)
+
+    if not 0 <= req.start_frame <= req.end_frame < len(frame_files):
+        raise HTTPException(400, "Invalid frame range")
+
+    if req.chunk_overlap >= req.chunk_size:
+        raise HTTPException(400, "chunk_overlap must be smaller than chunk_size")
+
+    try:
+        stats = await refine_span(
+            req.folder,
+            str(folder_path),
+            req.start_frame,
+            req.end_frame,
+            req.chunk_size,
+            req.chunk_overlap,
+        )
+    except NotImplementedError as e:
+        raise HTTPException(501, str(e))
+
+    return {
+        "status": "success",
+        "folder": req.folder,
+        **stats,
+    }
+
 # May not use
 @router.get("/frame")
 async def get_frame(req: GetFrameRequest):
     folder_path = safe_folder_path(req.folder)
     frame_idx = req.frame_idx
     show_class = req.show_class
-    frame_files = sorted(
-        [p for p in folder_path.iterdir() if p.suffix.lower() in [".jpg", ".jpeg", ".png"]],
-        key=lambda x: int(''.join(filter(str.isdigit, x.name)) or -1)
-    )
+    frame_files = list_frame_files(folder_path)
 
     if frame_idx >= len(frame_files):
         raise HTTPException(400, "Invalid frame index")
@@ -173,6 +230,7 @@ async def get_masks(folder: str, frame_idx: int):
         encoded.append({
             "object_id": obj_id,
             "mask_png": encode_mask_png(mask),
+            "preview": MASK_STORE.is_preview(folder, frame_idx, obj_id),
         })
 
     return {
@@ -206,10 +264,68 @@ async def reset_masks(req: ResetMaskRequest):
 @router.post("/reset-masks-folder")
 async def reset_masks_folder(req: ResetMasksFolderRequest):
     MASK_STORE.delete_masks_folder(req.folder)
+    await release_folder(req.folder, str(safe_folder_path(req.folder)))
     return {
         "status": "success"
     }
 
+@router.post("/auto-label")
+async def auto_label(req: AutoLabelRequest):
+    if not safe_folder_path(req.folder).exists():
+        raise HTTPException(404, detail="Folder not found")
+
+    try:
+        model = svc.get_model(req.model_id)
+        checkpoint = next(c for c in svc.list_checkpoints(req.model_id) if c["id"] == req.checkpoint)
+    except (KeyError, StopIteration):
+        raise HTTPException(404, detail="Model or checkpoint not found")
+
+    if model["task"] != "segment":
+        raise HTTPException(400, "Only segmentation models are supported")
+
+    job_id = str(uuid.uuid4())
+
+    AUTO_LABEL_JOBS[job_id] = {
+        "model_id": req.model_id,
+        "checkpoint": req.checkpoint,
+        "format": checkpoint["format"],
+        "status": "running",
+        "processed": 0,
+        "total": 0,
+        "progress": 0.0,
+        "fps": None,
+        "error": None
+    }
+
+    submit_job(
+        AUTO_LABEL_THREAD, AUTO_LABEL_JOBS, job_id,
+        run_auto_label, req.folder, req, Path(checkpoint["path"]), checkpoint["format"], job_id,
+    )
+
+    return {
+        "job_id": job_id,
+        "status": "started"
+    }
+
+@router.get("/auto-label/progress")
+async def auto_label_progress(job_id: str):
+    job = AUTO_LABEL_JOBS.get(job_id)
+
+    if not job:
+        raise HTTPException(404, "Job not found")
+
+    return job
+
+@router.get("/auto-label/stream")
+async def auto_label_stream(job_id: str):
+    if job_id not in AUTO_LABEL_JOBS:
+        raise HTTPException(404, "Job not found")
+
+    return StreamingResponse(
+        stream_job(AUTO_LABEL_JOBS, job_id),
+        media_type="text/event-stream"
+    )
+
 @router.get("/debug/mask-store")
 def debug_mask_store():
     return {
@@ -217,6 +333,12 @@ def debug_mask_store():
         "objs": {folder: list(MASK_STORE.objects[folder].keys()) for folder in MASK_STORE.objects},
     }
 
+@router.get("/debug/scheduler")
+def debug_scheduler():
+    if SAM2_WORKERS > 0:
+        return {"workers": SAM2WorkerPool.get_instance().queue_depth()}
+    return {"workers": [SAM2Scheduler.get_instance().queue_depth()]}
+
 def encode_mask_png(mask: np.ndarray) -> str:
     h, w = mask.shape
     rgba = np.zeros((h, w, 4), dtype=np.uint8)
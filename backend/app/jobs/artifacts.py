@@ -4,11 +4,10 @@ from app.utils.paths import JOBS_DIR
 
 def index_artifact(job_id: str, name: str, path: Path, kind: str):
     artifacts_path = JOBS_DIR / job_id / "artifacts.json"
-    artifacts = []
-
-    if artifacts_path.exists():
-        artifacts = json.loads(artifacts_path.read_text())
+    artifacts = load_artifacts(job_id)
 
+    # re-exporting under the same name replaces the entry
+    artifacts = [a for a in artifacts if a["name"] != name]
     artifacts.append({
         "name": name,
         "path": str(path),
@@ -16,3 +15,9 @@ def index_artifact(job_id: str, name: str, path: Path, kind: str):
     })
 
     artifacts_path.write_text(json.dumps(artifacts, indent=2))
+
+def load_artifacts(job_id: str) -> list[dict]:
+    artifacts_path = JOBS_DIR / job_id / "artifacts.json"
+    if not artifacts_path.exists():
+        return []
+    return json.loads(artifacts_path.read_text())
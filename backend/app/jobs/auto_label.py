@@ -0,0 +1,174 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+import time
+import cv2
+import numpy as np
+from ultralytics import YOLO
+from app.jobs.export_pool import chunked, map_ordered
+from app.models.segmentation import AutoLabelRequest
+from app.services.job_store import AUTO_LABEL_JOBS, update_job
+from app.services.mask_store import MASK_STORE
+from app.services.yolo_onnx_engine import YOLOOnnxEngine
+from app.utils.paths import UPLOADS_DIR
+from app.utils.validation import list_frame_files
+
+# Auto-labelling writes into the MaskStore, so it runs in the API process,
+# one job at a time and apart from the export jobs.
+AUTO_LABEL_THREAD = ThreadPoolExecutor(max_workers=1, thread_name_prefix="auto-label")
+DECODE_WORKERS = 4
+DEFAULT_BATCH_SIZE = 8
+# a detection continues the previous frame's object of the same class when
+# their boxes overlap at least this much
+TRACK_IOU = 0.5
+
+def run_auto_label(folder: str, req: AutoLabelRequest, checkpoint: Path, fmt: str, job_id: str):
+    frame_files = list_frame_files(UPLOADS_DIR / folder)
+    if not frame_files:
+        raise RuntimeError(f"No frames found for {folder}")
+
+    # frames with masks hold annotators' work and are left alone by default
+    labelled = MASK_STORE.store.get(folder, {})
+    frames = [
+        frame_idx for frame_idx in range(len(frame_files))
+        if req.overwrite or not any(m is not None for m in labelled.get(frame_idx, {}).values())
+    ]
+    total = len(frames)
+    update_job(AUTO_LABEL_JOBS, job_id, total=total, skipped=len(frame_files) - total)
+
+    started = time.perf_counter()
+    predict, batch_size = load_predictor(checkpoint, fmt, req)
+    update_job(AUTO_LABEL_JOBS, job_id, load_seconds=time.perf_counter() - started)
+
+    next_id = max(MASK_STORE.get_global_object_ids(folder), default=0) + 1
+    created = []
+    tracks = []
+    prev_idx = None
+    instances = 0
+    processed = 0
+    started = time.perf_counter()
+
+    # Frames are decoded on a small thread pool while the model runs; at most
+    # two batches of decoded frames are in flight
+    with ThreadPoolExecutor(max_workers=DECODE_WORKERS, thread_name_prefix="auto-label-decode") as decoder:
+        images = map_ordered(decoder, read_frame, (frame_files[i] for i in frames), window=2 * batch_size)
+        for batch_frames, batch_images in batched(frames, images, batch_size):
+            results = predict(batch_images)
+            del batch_images
+
+            for frame_idx, detections in zip(batch_frames, results):
+                if req.overwrite:
+                    MASK_STORE.clear_frame(folder, frame_idx)
+                # objects only carry over between consecutive frames
+                if prev_idx is None or frame_idx != prev_idx + 1:
+                    tracks = []
+
+                obj_ids = match_tracks(tracks, detections)
+                tracks = []
+                for obj_id, det in zip(obj_ids, detections):
+                    if obj_id is None:
+                        obj_id = next_id
+                        next_id += 1
+                        MASK_STORE.create_obj_id(folder, obj_id, det["class_id"])
+                        created.append({"obj_id": obj_id, "class_id": det["class_id"]})
+                    MASK_STORE.save_mask(folder, frame_idx, obj_id, det["mask"])
+                    tracks.append((obj_id, det["class_id"], det["box"]))
+
+                instances += len(detections)
+                prev_idx = frame_idx
+
+            processed += len(batch_frames)
+            elapsed = time.perf_counter() - started
+            update_job(
+                AUTO_LABEL_JOBS,
+                job_id,
+                processed=processed,
+                progress=processed / total,
+                fps=processed / elapsed,
+                instances=instances,
+            )
+
+    update_job(
+        AUTO_LABEL_JOBS,
+        job_id,
+        status="completed",
+        progress=1.0,
+        elapsed_seconds=time.perf_counter() - started,
+        objects=created,
+    )
+
+def load_predictor(checkpoint: Path, fmt: str, req: AutoLabelRequest) -> tuple[Callable, int]:
+    # Returns predict(images) -> per-image detections and the batch size; both
+    # backends produce the same detections (YOLOOnnxEngine.predict)
+    if fmt == "onnx":
+        engine = YOLOOnnxEngine.get_instance(checkpoint)
+        engine.load()
+        return (
+            lambda images: engine.predict(images, conf=req.conf, iou=req.iou),
+            req.batch_size or engine.batch or DEFAULT_BATCH_SIZE,
+        )
+
+    model = YOLO(str(checkpoint))
+
+    def predict(images):
+        # retina masks come back at the frame's own resolution
+        results = model.predict(images, conf=req.conf, iou=req.iou, batch=len(images), retina_masks=True, verbose=False)
+        return [result_detections(r) for r in results]
+
+    return predict, req.batch_size or DEFAULT_BATCH_SIZE
+
+def result_detections(result) -> list[dict]:
+    if result.masks is None:
+        return []
+    return [
+        {
+            "class_id": int(class_id),
+            "class_name": result.names.get(int(class_id)),
+            "score": float(score),
+            "box": box.tolist(),
+            "mask": mask.astype(np.uint8),
+        }
+        for class_id, score, box, mask in zip(
+            result.boxes.cls.cpu().numpy(),
+            result.boxes.conf.cpu().numpy(),
+            result.boxes.xyxy.cpu().numpy(),
+            result.masks.data.cpu().numpy(),
+        )
+    ]
+
+def read_frame(path: Path) -> np.ndarray:
+    image = cv2.imread(str(path))
+    if image is None:
+        raise RuntimeError(f"Failed to load frame {path}")
+    return image
+
+def batched(frames: list[int], images: Iterable[np.ndarray], size: int) -> Iterator[tuple[list[int], list[np.ndarray]]]:
+    images = iter(images)
+    for chunk in chunked(frames, size):
+        yield chunk, [next(images) for _ in chunk]
+
+def match_tracks(tracks: list[tuple[int, int, list[float]]], detections: list[dict]) -> list[int | None]:
+    # Greedy matching in detection (score) order against the previous frame's
+    # objects; unmatched detections start new objects
+    obj_ids = []
+    free = list(tracks)
+    for det in detections:
+        best, best_iou = None, TRACK_IOU
+        for track in free:
+            if track[1] != det["class_id"]:
+                continue
+            iou = box_iou(track[2], det["box"])
+            if iou >= best_iou:
+                best, best_iou = track, iou
+        if best is not None:
+            free.remove(best)
+        obj_ids.append(best[0] if best else None)
+    return obj_ids
+
+def box_iou(a: list[float], b: list[float]) -> float:
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    inter = w * h
+    return inter / ((a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter)
@@ -0,0 +1,72 @@
+import threading
+import redis
+from app.jobs.progress import redis_client
+from app.jobs.store import is_cancel_requested
+from app.utils.paths import JOBS_DIR
+
+# The flag file stays the durable record of a cancel request; the pub/sub
+# message only makes running workers notice it immediately.
+CANCEL_POLL_SECONDS = 1.0
+
+class JobCancelled(Exception):
+    pass
+
+def cancel_channel(job_id: str) -> str:
+    return f"jobs:{job_id}:cancel"
+
+def request_cancel(job_id: str):
+    (JOBS_DIR / job_id / "cancel.flag").write_text("1")
+    try:
+        redis_client.publish(cancel_channel(job_id), "1")
+    except redis.RedisError as e:
+        print(f"Warning: cancel for {job_id} not published, worker will poll: {e}")
+
+class CancelWatcher:
+    # Background thread that turns a cancel request into an Event, so the
+    # per-batch check in the training loop is a flag read, not a syscall or a
+    # Redis round trip
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.cancelled = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=f"cancel-{job_id}", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        pubsub = None
+        try:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(cancel_channel(self.job_id))
+        except redis.RedisError:
+            pubsub = None
+
+        # the flag is checked after subscribing so a request made in between
+        # is not missed
+        while not self.stopped.is_set():
+            if is_cancel_requested(self.job_id):
+                self.cancelled.set()
+                break
+            if pubsub is None:
+                self.stopped.wait(CANCEL_POLL_SECONDS)
+                continue
+            try:
+                if pubsub.get_message(timeout=CANCEL_POLL_SECONDS):
+                    self.cancelled.set()
+                    break
+            except redis.RedisError:
+                pubsub = None
+
+        if pubsub is not None:
+            try:
+                pubsub.close()
+            except redis.RedisError:
+                pass
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise JobCancelled(self.job_id)
@@ -1,5 +1,9 @@
 from celery import Celery
 
+# sweep trials go to their own queue: the fine-tune task that dispatches them
+# waits for their results, so they need worker processes of their own
+TRIAL_QUEUE = "finetune.trials"
+
 celery_app = Celery(
     "finetune",
     broker="redis://localhost:6379/0",
@@ -11,4 +15,5 @@ celery_app.conf.update(
     result_expires=3600,
     worker_prefetch_multiplier=1,
     task_acks_late=True,
+    task_routes={"finetune.trial": {"queue": TRIAL_QUEUE}},
 )
\ No newline at end of file
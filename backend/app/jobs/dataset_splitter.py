@@ -1,21 +1,56 @@
 from pathlib import Path
+from uuid import uuid4
+import hashlib
+import json
 import random
+import shutil
 import yaml
 import os
 import warnings
 from typing import List, Tuple
 from collections import defaultdict
-from app.utils.paths import SEGMENTATIONS_DIR
+import numpy as np
+from app.jobs.file_placement import PLACEMENT_MODES, place_files
+from app.jobs.frame_dedup import drop_near_duplicates, load_frame_hashes
+from app.jobs.image_cache import resize_images
+from app.jobs.label_index import load_label_index, parse_label
+from app.jobs.shards import SHARDS_DIRNAME, ShardReader, has_shards
+from app.utils.paths import SEGMENTATIONS_DIR, TRAINING_VIEWS_DIR
+
+# Materialised views kept for reuse by later jobs, least recently used evicted.
+# A view stays while a job directory links to it as its dataset: running jobs
+# read it and finished fine-tunes are evaluated on it. Each link leaves a ref
+# file in the view naming the linking directory.
+VIEW_CACHE_SIZE = 16
+VIEW_REFS_DIRNAME = ".refs"
 
 def split_and_build_training_view(
     dataset_ids: List[str],
     job_dir: Path,
     train_ratio: float = 0.8,
     seed: int = 67,
-    use_symlinks: bool = True
+    use_symlinks: bool = True,
+    use_shards: bool = True,
+    cache_views: bool = True,
+    near_duplicate_threshold: int | None = None,
+    placement: str | None = None,
+    imgsz: int | None = None
 ):
     random.seed(seed)
-    
+
+    # use_symlinks=False predates the placement modes and meant "real files"
+    placement = placement or ("symlink" if use_symlinks else "auto")
+    if placement not in PLACEMENT_MODES:
+        raise ValueError(f"Unknown placement mode: {placement}")
+
+    # Shard-backed view when every selected dataset was exported with shards;
+    # samples are then (dataset position, shard record) pairs.
+    sharded = use_shards and all(has_shards(SEGMENTATIONS_DIR / d) for d in dataset_ids)
+    shard_dirs: List[str] = []
+    classes: set[int] = set()
+    # what the view's content depends on besides the sample list
+    stamps: list = []
+
     all_samples: List[Tuple[Path, Path]] = []
     report = {
         "datasets": [],
@@ -26,6 +61,7 @@ def split_and_build_training_view(
             "total_samples": 0,
             "used_samples": 0,
             "skipped_samples": 0,
+            "duplicates_removed": 0,
         },
         "warnings": [],
     }
@@ -44,7 +80,27 @@ def split_and_build_training_view(
             "issues": defaultdict(int),
         }
 
-        if not images_dir.exists() or not labels_dir.exists():
+        if sharded:
+            reader = ShardReader(dataset_root / SHARDS_DIRNAME)
+
+            dataset_report["total_samples"] = len(reader)
+            report["summary"]["total_samples"] += len(reader)
+
+            valid_pairs = []
+
+            for i in range(len(reader)):
+                entry = parse_label(reader.label_text(i))
+                if entry["status"]:
+                    dataset_report["issues"][entry["status"]] += 1
+                    continue
+                valid_pairs.append((len(shard_dirs), i))
+                classes.update(int(c) for c in entry["classes"])
+
+            shard_dirs.append(str(reader.shards_dir))
+            index_stat = (reader.shards_dir / "index.npy").stat()
+            stamps.append((str(reader.shards_dir), index_stat.st_mtime_ns, index_stat.st_size))
+
+        elif not images_dir.exists() or not labels_dir.exists():
             msg = f"Dataset {dataset_id} missing images/ or labels/ directory"
             warnings.warn(msg)
             report["warnings"].append(msg)
@@ -52,37 +108,55 @@ def split_and_build_training_view(
             report["summary"]["datasets_invalid"] += 1
             continue
 
-        images = sorted(
-            p for p in images_dir.iterdir()
-            if p.suffix.lower() in {".jpg", ".jpeg", ".png"}
-        )
+        else:
+            images = sorted(
+                p for p in images_dir.iterdir()
+                if p.suffix.lower() in {".jpg", ".jpeg", ".png"}
+            )
+
+            dataset_report["total_samples"] = len(images)
+            report["summary"]["total_samples"] += len(images)
 
-        dataset_report["total_samples"] = len(images)
-        report["summary"]["total_samples"] += len(images)
+            # status and classes come from the export's label index; only
+            # label files changed since it was written are read
+            entries, dataset_report["label_index"] = load_label_index(
+                dataset_root, labels_dir, [img.stem for img in images]
+            )
 
-        valid_pairs = []
+            valid_pairs = []
 
-        for img in images:
-            lbl = labels_dir / f"{img.stem}.txt"
+            for img in images:
+                entry = entries.get(img.stem)
 
-            if not lbl.exists():
-                dataset_report["issues"]["missing_label"] += 1
-                continue
+                if entry is None:
+                    dataset_report["issues"]["missing_label"] += 1
+                    continue
 
-            if lbl.stat().st_size == 0:
-                dataset_report["issues"]["empty_label"] += 1
-                continue
+                if entry["status"]:
+                    dataset_report["issues"][entry["status"]] += 1
+                    continue
 
-            try:
-                for line in lbl.read_text().splitlines():
-                    if not line.strip():
-                        continue
-                    int(line.split()[0])
-            except Exception:
-                dataset_report["issues"]["malformed_label"] += 1
-                continue
+                valid_pairs.append((img, labels_dir / f"{img.stem}.txt"))
+                classes.update(int(c) for c in entry["classes"])
+                stamps.append((entry["mtime_ns"], entry["size"]))
 
-            valid_pairs.append((img, lbl))
+        if near_duplicate_threshold is not None and valid_pairs:
+            if sharded:
+                images = [images_dir / f"{int(reader.index[i]['frame']):05d}.jpg" for _, i in valid_pairs]
+            else:
+                images = [img for img, _ in valid_pairs]
+            hashes = load_frame_hashes(dataset_root, images)
+            valid_pairs, removed = drop_near_duplicates(valid_pairs, images, hashes, near_duplicate_threshold)
+            dataset_report["issues"]["near_duplicate"] += removed
+            report["summary"]["duplicates_removed"] += removed
+
+        # Frames pre-resized to the training size, shared by every job that
+        # trains this dataset at imgsz; sharded views decode reduced instead
+        if imgsz and not sharded and valid_pairs:
+            resized, image_stamps = resize_images(dataset_id, [img for img, _ in valid_pairs], imgsz)
+            dataset_report["resized_images"] = sum(1 for src, (img, _) in zip(resized, valid_pairs) if src != img)
+            valid_pairs = [(src, lbl) for src, (_, lbl) in zip(resized, valid_pairs)]
+            stamps.extend(image_stamps)
 
         if not valid_pairs:
             msg = f"Dataset {dataset_id} contains no valid samples"
@@ -115,6 +189,108 @@ def split_and_build_training_view(
     val_samples = all_samples[split_idx:]
 
     dataset_dir = job_dir / "dataset"
+
+    def build(view_dir: Path, root: Path) -> Path:
+        if sharded:
+            return write_sharded_view(view_dir, shard_dirs, train_samples, val_samples, classes, root)
+        data_yaml_path, placed = write_file_view(view_dir, train_samples, val_samples, classes, placement, root)
+        report["placement"] = {"mode": placement, "files": placed}
+        return data_yaml_path
+
+    if not cache_views:
+        return build(dataset_dir, dataset_dir), report
+
+    # Views are content-addressed: identical datasets, split parameters and
+    # label files map to the same key, so sweeps reuse one materialised view.
+    key = view_key(
+        {
+            "seed": seed,
+            "train_ratio": train_ratio,
+            "placement": placement,
+            "sharded": sharded,
+            "near_duplicate_threshold": near_duplicate_threshold,
+            "imgsz": imgsz if not sharded else None,
+        },
+        all_samples,
+        stamps,
+    )
+    view_dir = TRAINING_VIEWS_DIR / key
+    cached = (view_dir / "data.yaml").exists()
+
+    if cached:
+        os.utime(view_dir)
+    else:
+        tmp_dir = TRAINING_VIEWS_DIR / f".{key}.{uuid4().hex}.tmp"
+        build(tmp_dir, view_dir)
+        try:
+            tmp_dir.rename(view_dir)
+        except OSError:
+            # another job materialised the same view first
+            shutil.rmtree(tmp_dir)
+
+    if dataset_dir.is_symlink() or dataset_dir.is_file():
+        dataset_dir.unlink()
+    elif dataset_dir.exists():
+        shutil.rmtree(dataset_dir)
+    dataset_dir.parent.mkdir(parents=True, exist_ok=True)
+    dataset_dir.symlink_to(view_dir, target_is_directory=True)
+    add_view_ref(view_dir, dataset_dir)
+    if not cached:
+        prune_training_views()
+
+    report["view"] = {"key": key, "cached": cached}
+    return dataset_dir / "data.yaml", report
+
+def view_key(params: dict, samples: list, stamps: list) -> str:
+    # samples are hashed in split order, which the seeded shuffle fixes
+    h = hashlib.sha256(json.dumps(params, sort_keys=True).encode())
+    for sample in samples:
+        h.update(repr(tuple(str(x) for x in sample)).encode())
+    for stamp in stamps:
+        h.update(repr(stamp).encode())
+    return h.hexdigest()[:32]
+
+def add_view_ref(view_dir: Path, dataset_dir: Path):
+    # after the link exists, so the ref is never mistaken for a stale one
+    refs = view_dir / VIEW_REFS_DIRNAME
+    refs.mkdir(exist_ok=True)
+    name = hashlib.sha256(str(dataset_dir.absolute()).encode()).hexdigest()[:32]
+    (refs / name).write_text(str(dataset_dir.absolute()))
+
+def view_referenced(view_dir: Path) -> bool:
+    # refs whose directory was deleted or now links elsewhere are dropped
+    refs = view_dir / VIEW_REFS_DIRNAME
+    referenced = False
+    for ref in refs.iterdir() if refs.is_dir() else []:
+        dataset_dir = Path(ref.read_text())
+        if dataset_dir.is_symlink() and dataset_dir.resolve() == view_dir.resolve():
+            referenced = True
+        else:
+            ref.unlink(missing_ok=True)
+    return referenced
+
+def prune_training_views(keep: int = VIEW_CACHE_SIZE):
+    # Only unreferenced views are evicted; a view is linked right after it is
+    # built or reused, and until then its fresh mtime keeps it
+    views = sorted(
+        (
+            d for d in TRAINING_VIEWS_DIR.iterdir()
+            if d.is_dir() and not d.name.startswith(".") and not view_referenced(d)
+        ),
+        key=lambda d: d.stat().st_mtime,
+        reverse=True,
+    )
+    for d in views[keep:]:
+        shutil.rmtree(d, ignore_errors=True)
+
+def write_file_view(
+    dataset_dir: Path,
+    train_samples: List[Tuple[Path, Path]],
+    val_samples: List[Tuple[Path, Path]],
+    classes: set[int],
+    placement: str,
+    root: Path
+) -> tuple[Path, dict[str, int]]:
     train_img_dir = dataset_dir / "train/images"
     train_lbl_dir = dataset_dir / "train/labels"
     val_img_dir = dataset_dir / "val/images"
@@ -123,26 +299,23 @@ def split_and_build_training_view(
     for d in [train_img_dir, train_lbl_dir, val_img_dir, val_lbl_dir]:
         d.mkdir(parents=True, exist_ok=True)
 
-    def place(src: Path, dst: Path):
-        if dst.exists():
-            return
-        if use_symlinks:
-            os.symlink(src, dst)
-        else:
-            dst.write_bytes(src.read_bytes())
-
-    for img, lbl in train_samples:
-        place(img, train_img_dir / img.name)
-        place(lbl, train_lbl_dir / lbl.name)
+    # Placed in parallel, so same-named frames from different datasets are
+    # resolved up front: the first sample wins, as with sequential placement.
+    pairs = {}
+    for img_dir, lbl_dir, samples in (
+        (train_img_dir, train_lbl_dir, train_samples),
+        (val_img_dir, val_lbl_dir, val_samples),
+    ):
+        for img, lbl in samples:
+            pairs.setdefault(img_dir / img.name, img)
+            pairs.setdefault(lbl_dir / lbl.name, lbl)
 
-    for img, lbl in val_samples:
-        place(img, val_img_dir / img.name)
-        place(lbl, val_lbl_dir / lbl.name)
+    placed = place_files([(src, dst) for dst, src in pairs.items()], placement)
 
-    nc, names = infer_classes_from_samples(all_samples)
+    nc, names = class_names(classes)
 
     data_yaml = {
-        "path": str(dataset_dir),
+        "path": str(root),
         "train": "train/images",
         "val": "val/images",
         "nc": nc,
@@ -151,17 +324,44 @@ def split_and_build_training_view(
 
     data_yaml_path = dataset_dir / "data.yaml"
     data_yaml_path.write_text(yaml.safe_dump(data_yaml))
+    return data_yaml_path, placed
 
-    return data_yaml_path, report
+def write_sharded_view(
+    dataset_dir: Path,
+    shard_dirs: List[str],
+    train_samples: List[Tuple[int, int]],
+    val_samples: List[Tuple[int, int]],
+    classes: set[int],
+    root: Path
+) -> Path:
+    # Each split is a small file naming the shard directories and the records
+    # to use; ShardedYOLODataset reads the samples straight from the shards.
+    dataset_dir.mkdir(parents=True, exist_ok=True)
+    record_dtype = np.dtype([("dataset", "<i4"), ("record", "<i4")])
 
+    for name, samples in (("train", train_samples), ("val", val_samples)):
+        np.savez(
+            dataset_dir / f"{name}.npz",
+            datasets=np.array(shard_dirs),
+            records=np.array(samples, dtype=record_dtype),
+        )
+
+    nc, names = class_names(classes)
 
-def infer_classes_from_samples(samples: List[Tuple[Path, Path]]):
-    classes = set()
-    for _, lbl in samples:
-        for line in lbl.read_text().splitlines():
-            if line.strip():
-                classes.add(int(line.split()[0]))
+    data_yaml = {
+        "path": str(root),
+        "train": "train.npz",
+        "val": "val.npz",
+        "nc": nc,
+        "names": names,
+        "format": "shards",
+    }
+
+    data_yaml_path = dataset_dir / "data.yaml"
+    data_yaml_path.write_text(yaml.safe_dump(data_yaml))
+    return data_yaml_path
 
+def class_names(classes: set[int]):
     nc = max(classes) + 1 if classes else 0
     names = [f"class_{i}" for i in range(nc)]
-    return nc, names
\ No newline at end of file
+    return nc, names
@@ -0,0 +1,324 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Iterable
+import hashlib
+import json
+import os
+import shutil
+import time
+import numpy as np
+import torch
+import yaml
+from torch.utils.data import DataLoader, Subset
+from ultralytics.cfg import get_cfg
+from ultralytics.data.build import build_yolo_dataset
+from ultralytics.data.utils import check_det_dataset
+from ultralytics.models.yolo.segment import SegmentationValidator
+from ultralytics.nn.autobackend import AutoBackend
+from app.jobs.dataset_splitter import split_and_build_training_view
+from app.jobs.export_pool import write_atomic
+from app.jobs.sharded_dataset import build_sharded_dataset, trainer_for
+from app.models.ml_models import EvaluateCheckpointsRequest
+from app.services.job_store import EVALUATION_JOBS, update_job
+from app.utils.paths import EVALUATION_CACHE_DIR
+
+# Checkpoints (PyTorch or ONNX) are scored on a training view's split with the
+# ultralytics segmentation metrics. The split is streamed once per job in
+# square letterboxed batches - static-batch ONNX exports cannot take rect
+# batches - and every checkpoint without cached predictions runs on each batch
+# as it is decoded, so only one batch is held at a time.
+METRICS = {
+    "metrics/precision(B)": "box_precision",
+    "metrics/recall(B)": "box_recall",
+    "metrics/mAP50(B)": "box_map50",
+    "metrics/mAP50-95(B)": "box_map",
+    "metrics/precision(M)": "mask_precision",
+    "metrics/recall(M)": "mask_recall",
+    "metrics/mAP50(M)": "mask_map50",
+    "metrics/mAP50-95(M)": "mask_map",
+    "fitness": "fitness",
+}
+# per-prediction match results the metrics are computed from
+STATS_KEYS = ("tp", "tp_m", "conf", "pred_cls", "target_cls", "target_img")
+EVAL_BATCH_SIZE = 8
+DEFAULT_IMGSZ = 640
+
+# Evaluation jobs run in the API process one at a time, like auto-labelling.
+# Predictions and metrics are cached on disk per split and checkpoint file,
+# least recently used splits evicted.
+EVALUATION_THREAD = ThreadPoolExecutor(max_workers=1, thread_name_prefix="evaluation")
+EVALUATION_CACHE_SIZE = 16
+
+def split_dataset(data_yaml: Path, split: str, imgsz: int):
+    # the split without augmentation, letterboxed to imgsz x imgsz
+    data = check_det_dataset(str(data_yaml))
+    cfg = get_cfg(overrides={"task": "segment", "imgsz": imgsz, "rect": False})
+    build = build_sharded_dataset if trainer_for(data_yaml) else build_yolo_dataset
+    return data, build(cfg, data[split], 1, data, mode="val")
+
+def split_batches(data_yaml: Path, split: str, imgsz: int, batch: int, limit: int | None = None) -> tuple[dict, DataLoader]:
+    # Every pass over the loader decodes the split again, a batch at a time;
+    # images stay uint8 until a checkpoint runs on them. With a limit only an
+    # even spread of that many images is used.
+    data, dataset = split_dataset(data_yaml, split, imgsz)
+    collate_fn = dataset.collate_fn
+    if limit and limit < len(dataset):
+        dataset = Subset(dataset, np.linspace(0, len(dataset), limit, endpoint=False).astype(int).tolist())
+    return data, DataLoader(dataset, batch_size=batch, shuffle=False, num_workers=0, collate_fn=collate_fn)
+
+def split_key(data_yaml: Path, split: str, imgsz: int) -> str:
+    # training views are content-addressed, so the resolved view directory
+    # identifies the samples
+    data_yaml = data_yaml.resolve()
+    key = f"{data_yaml}:{data_yaml.stat().st_mtime_ns}:{split}:{imgsz}"
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+def checkpoint_key(path: Path) -> str:
+    st = path.stat()
+    return hashlib.sha256(f"{path.resolve()}:{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()[:32]
+
+def validator_for(data: dict, model, work_dir: Path) -> SegmentationValidator:
+    validator = SegmentationValidator(save_dir=work_dir, args={"task": "segment", "plots": False, "verbose": False})
+    validator.data = data
+    validator.device = torch.device("cpu")
+    validator.init_metrics(model)
+    return validator
+
+class CheckpointRun:
+    # One checkpoint's forward passes and match statistics; several runs are
+    # fed the same decoded batches
+    def __init__(self, model_path: Path, data: dict, work_dir: Path):
+        self.name = model_path.name
+        self.model = AutoBackend(model=str(model_path), device=torch.device("cpu"), verbose=False)
+        self.imgsz = None if self.model.pt else self.model.metadata.get("imgsz")
+        self.validator = validator_for(data, self.model, work_dir)
+        # exports without a dynamic batch axis take exactly their export batch
+        self.step = None if self.model.pt or self.model.dynamic else self.model.metadata.get("batch", 1)
+        self.inference = 0.0
+
+    def update(self, batch: dict):
+        if self.imgsz and list(batch["img"].shape[2:]) != list(self.imgsz):
+            raise ValueError(f"{self.name} was exported for {self.imgsz[0]}x{self.imgsz[1]} inputs")
+        with torch.inference_mode():
+            # preprocess replaces the images, leaving the shared batch as it was
+            batch = self.validator.preprocess(dict(batch))
+            started = time.perf_counter()
+            preds = forward(self.model, batch["img"], self.step)
+            self.inference += time.perf_counter() - started
+            self.validator.update_metrics(postprocess(self.validator, self.model, preds), batch)
+
+    def predictions(self) -> dict:
+        seen = self.validator.seen
+        return {
+            "stats": {k: np.concatenate(self.validator.metrics.stats[k], 0) for k in STATS_KEYS},
+            "images": seen,
+            "inference_ms_per_image": self.inference * 1e3 / max(seen, 1),
+        }
+
+def predict_many(runs: dict, batches: Iterable[dict]) -> dict:
+    # One pass over the batches for all runs: each batch is decoded once and
+    # every run still going makes its predictions on it. Returns the errors of
+    # runs that failed, which stop taking batches.
+    errors = {}
+    for batch in batches:
+        for key, run in runs.items():
+            if key in errors:
+                continue
+            try:
+                run.update(batch)
+            except Exception as e:
+                errors[key] = e
+    return errors
+
+def predict(model_path: Path, data: dict, batches: Iterable[dict], work_dir: Path) -> dict:
+    # Runs the checkpoint over the batches; returns the match statistics of
+    # its predictions against the labels
+    run = CheckpointRun(model_path, data, work_dir)
+    errors = predict_many({model_path: run}, batches)
+    if errors:
+        raise errors[model_path]
+    return run.predictions()
+
+def score(predictions: dict, data: dict, work_dir: Path) -> dict:
+    validator = validator_for(data, SimpleNamespace(names=data["names"]), work_dir)
+    validator.metrics.stats = {k: [v] for k, v in predictions["stats"].items()}
+    stats = validator.get_stats()
+    return {
+        **{name: float(stats[key]) for key, name in METRICS.items()},
+        "images": predictions["images"],
+        "inference_ms_per_image": predictions["inference_ms_per_image"],
+    }
+
+def evaluate(model_path: Path, data: dict, batches: Iterable[dict], work_dir: Path) -> dict:
+    return score(predict(model_path, data, batches, work_dir), data, work_dir)
+
+def forward(model: AutoBackend, img: torch.Tensor, step: int | None):
+    if step is None:
+        return model(img)
+
+    outputs = []
+    for i in range(0, len(img), step):
+        chunk = img[i:i + step]
+        n = len(chunk)
+        if n < step:
+            chunk = torch.cat([chunk, chunk.new_zeros((step - n, *chunk.shape[1:]))])
+        outputs.append([y[:n] for y in model(chunk)])
+    return [torch.cat(parts) for parts in zip(*outputs)]
+
+def postprocess(validator: SegmentationValidator, model: AutoBackend, preds) -> list[dict]:
+    if model.pt:
+        return validator.postprocess(preds)
+    # ultralytics tells PyTorch outputs from exported ones by the length of
+    # the second output, which a batch of 3 prototype masks also has
+    return [validator.postprocess([y[i:i + 1] for y in preds])[0] for i in range(len(preds[0]))]
+
+def read_predictions(cache_dir: Path) -> dict | None:
+    path = cache_dir / "predictions.npz"
+    if not path.exists():
+        return None
+    with np.load(path) as f:
+        return {
+            "stats": {k: f[k] for k in STATS_KEYS},
+            "images": int(f["images"]),
+            "inference_ms_per_image": float(f["inference_ms_per_image"]),
+        }
+
+def write_predictions(cache_dir: Path, predictions: dict):
+    tmp = cache_dir / ".predictions.tmp.npz"
+    np.savez(
+        tmp,
+        images=predictions["images"],
+        inference_ms_per_image=predictions["inference_ms_per_image"],
+        **predictions["stats"],
+    )
+    tmp.replace(cache_dir / "predictions.npz")
+
+def read_metrics(cache_dir: Path) -> dict | None:
+    try:
+        return json.loads((cache_dir / "metrics.json").read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def cached_metrics(cache_dir: Path, data: dict) -> tuple[dict, str] | None:
+    # The metrics and which cache answered, "metrics" or "predictions"; None
+    # when the checkpoint has to run
+    metrics = read_metrics(cache_dir)
+    if metrics is not None:
+        return metrics, "metrics"
+    predictions = read_predictions(cache_dir)
+    if predictions is None:
+        return None
+    return store_metrics(cache_dir, predictions, data), "predictions"
+
+def store_metrics(cache_dir: Path, predictions: dict, data: dict) -> dict:
+    metrics = score(predictions, data, cache_dir)
+    write_atomic(cache_dir / "metrics.json", json.dumps(metrics, indent=2))
+    return metrics
+
+def default_imgsz(model: dict) -> int:
+    # fine-tuned models are compared at the size they were trained at
+    args = Path(model.get("run_dir") or "") / "args.yaml"
+    if model["source"] == "finetuned" and args.exists():
+        return int(yaml.safe_load(args.read_text())["imgsz"])
+    return DEFAULT_IMGSZ
+
+def finetune_data_yaml(model: dict) -> Path:
+    # The split the model was validated on while fine-tuning: the training
+    # view its run directory links to
+    data_yaml = (Path(model["run_dir"]) / "dataset").resolve() / "data.yaml"
+    if not data_yaml.exists():
+        raise FileNotFoundError(f"The fine-tuning dataset of {model['id']} no longer exists")
+    return data_yaml
+
+def run_evaluation(model: dict, checkpoints: list[dict], req: EvaluateCheckpointsRequest, job_id: str):
+    work_dir = EVALUATION_CACHE_DIR / ".jobs" / job_id
+    try:
+        if req.dataset_ids:
+            data_yaml, _ = split_and_build_training_view(
+                dataset_ids=req.dataset_ids,
+                job_dir=work_dir,
+                train_ratio=req.train_percentage,
+                seed=req.seed,
+            )
+        else:
+            data_yaml = finetune_data_yaml(model)
+
+        imgsz = req.img_size or default_imgsz(model)
+        data, batches = split_batches(data_yaml, "val", imgsz, EVAL_BATCH_SIZE)
+        split_dir = EVALUATION_CACHE_DIR / split_key(data_yaml, "val", imgsz)
+        split_dir.mkdir(parents=True, exist_ok=True)
+        os.utime(split_dir)
+        prune_evaluation_cache()
+
+        # Cached checkpoints answer straight away; the rest run together over
+        # one pass of the split, so each batch is decoded only once
+        results = [{"checkpoint": c["id"], "label": c["label"], "format": c["format"]} for c in checkpoints]
+        runs = {}
+        for i, c in enumerate(checkpoints):
+            started = time.perf_counter()
+            cache_dir = split_dir / checkpoint_key(Path(c["path"]))
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            try:
+                cached = cached_metrics(cache_dir, data)
+                if cached is None:
+                    runs[i] = (cache_dir, CheckpointRun(Path(c["path"]), data, cache_dir))
+                else:
+                    results[i]["metrics"], results[i]["cached"] = cached
+            except Exception as e:
+                print(f"Warning: evaluating checkpoint {c['id']} failed: {e}")
+                results[i]["error"] = str(e)
+            results[i]["seconds"] = time.perf_counter() - started
+
+        def report():
+            done = [r for r in results if "metrics" in r or "error" in r]
+            update_job(
+                EVALUATION_JOBS,
+                job_id,
+                processed=len(done),
+                progress=len(done) / len(checkpoints),
+                results=done,
+            )
+
+        report()
+        if runs:
+            started = time.perf_counter()
+            errors = predict_many({i: run for i, (_, run) in runs.items()}, batches)
+            # the pass is shared, so each run is charged an equal part of it
+            seconds = (time.perf_counter() - started) / len(runs)
+            for i, (cache_dir, run) in runs.items():
+                result = results[i]
+                result["seconds"] += seconds
+                try:
+                    if i in errors:
+                        # e.g. an ONNX export at another image size
+                        raise errors[i]
+                    predictions = run.predictions()
+                    write_predictions(cache_dir, predictions)
+                    result["metrics"], result["cached"] = store_metrics(cache_dir, predictions, data), None
+                except Exception as e:
+                    print(f"Warning: evaluating checkpoint {result['checkpoint']} failed: {e}")
+                    result["error"] = str(e)
+            report()
+
+        scored = [r for r in results if "metrics" in r]
+        update_job(
+            EVALUATION_JOBS,
+            job_id,
+            status="completed",
+            progress=1.0,
+            imgsz=imgsz,
+            images=scored[0]["metrics"]["images"] if scored else 0,
+            best=max(scored, key=lambda r: r["metrics"]["fitness"])["checkpoint"] if scored else None,
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def prune_evaluation_cache(keep: int = EVALUATION_CACHE_SIZE):
+    splits = sorted(
+        (d for d in EVALUATION_CACHE_DIR.iterdir() if d.is_dir() and not d.name.startswith(".")),
+        key=lambda d: d.stat().st_mtime,
+        reverse=True,
+    )
+    for d in splits[keep:]:
+        shutil.rmtree(d, ignore_errors=True)
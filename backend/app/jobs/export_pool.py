@@ -0,0 +1,166 @@
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+from uuid import uuid4
+import json
+import multiprocessing as mp
+import os
+import traceback
+from app.services.job_store import update_job
+from app.utils.masks import pack_mask
+
+EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", "0")) or (os.cpu_count() or 1)
+EXPORT_CHUNK_SIZE = 64
+DATASET_METADATA = "dataset.json"
+# dataset.json of a YOLO label export; a folder with only COCO-RLE or PNG mask
+# exports is typed "segmentation_masks" and has nothing to train on
+YOLO_DATASET_TYPE = "yolo_segmentation"
+
+# Export jobs are coordinated off the event loop and request path, one at a
+# time per kind on that kind's thread, so a quick YOLO label export does not
+# queue behind a long overlay video. The per-frame work fans out to
+# export_executor(); jobs of different kinds share the cores.
+EXPORT_KINDS = ("yolo", "overlay", "mask")
+EXPORT_THREADS = {
+    kind: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"export-{kind}")
+    for kind in EXPORT_KINDS
+}
+
+def export_executor(max_workers: int | None = None) -> ProcessPoolExecutor:
+    # spawn, not fork: the API process runs SAM2 and scheduler threads
+    return ProcessPoolExecutor(
+        max_workers=max_workers or EXPORT_WORKERS,
+        mp_context=mp.get_context("spawn"),
+    )
+
+def submit_export_job(kind: str, jobs: dict, job_id: str, fn: Callable, *args) -> Future:
+    return submit_job(EXPORT_THREADS[kind], jobs, job_id, fn, *args)
+
+def submit_job(executor: ThreadPoolExecutor, jobs: dict, job_id: str, fn: Callable, *args) -> Future:
+    def run():
+        try:
+            fn(*args)
+        except Exception as e:
+            traceback.print_exc()
+            update_job(jobs, job_id, status="failed", error=str(e))
+    return executor.submit(run)
+
+def map_ordered(executor, fn: Callable, items: Iterable, window: int | None = None) -> Iterator:
+    # Like executor.map, but pulls items lazily so at most `window` chunks of
+    # masks are in flight at once, and yields results in submission order.
+    window = window or 2 * EXPORT_WORKERS
+    in_flight = deque()
+    for item in items:
+        in_flight.append(executor.submit(fn, item))
+        if len(in_flight) >= window:
+            yield in_flight.popleft().result()
+    while in_flight:
+        yield in_flight.popleft().result()
+
+def chunked(items: list, size: int = EXPORT_CHUNK_SIZE) -> Iterator[list]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def map_chunks(fn: Callable, chunk_args: Callable[[bool], Iterable], total: int, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator:
+    # chunk_args(pack) yields the work items; masks are packed only when they
+    # cross a process boundary. A single chunk or a single core is not worth
+    # starting worker processes for.
+    if total <= chunk_size or EXPORT_WORKERS == 1:
+        yield from map(fn, chunk_args(False))
+    elif total:
+        with export_executor() as executor:
+            yield from map_ordered(executor, fn, chunk_args(True))
+
+def frame_chunks(frame_objects: dict[int, dict[int, tuple]], frames: list[int], settings: dict, pack: bool) -> Iterator:
+    # frame_objects holds each object's (class_id, mask) as it was when the
+    # export started. Masks are packed per chunk just before submission so
+    # only the in-flight chunks are held in memory twice.
+    for chunk in chunked(frames):
+        items = []
+        for frame_idx in chunk:
+            objects = [
+                (obj_id, class_id, pack_mask(mask) if pack else mask)
+                for obj_id, (class_id, mask) in frame_objects[frame_idx].items()
+            ]
+            items.append((frame_idx, objects))
+        yield settings, items
+
+def link_frame_image(src_images_dir: Path, images_dir: Path, frame_idx: int):
+    src_img = src_images_dir / f"{frame_idx:05d}.jpg"
+    dst_img = images_dir / f"{frame_idx:05d}.jpg"
+
+    if src_img.exists() and not dst_img.exists():
+        os.symlink(src_img, dst_img)
+
+def write_atomic(path: Path, data: str | bytes):
+    # a temp name of its own, so jobs writing the same file at once never
+    # rename each other's half-written data
+    tmp = path.with_name(f".{path.name}.{uuid4().hex}.tmp")
+    try:
+        if isinstance(data, str):
+            tmp.write_text(data)
+        else:
+            tmp.write_bytes(data)
+        tmp.replace(path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+def read_dataset_metadata(save_dir: Path) -> dict | None:
+    path = save_dir / DATASET_METADATA
+    if not path.exists():
+        return None
+    try:
+        return json.loads(path.read_text())
+    except json.JSONDecodeError:
+        return None
+
+def is_yolo_dataset(save_dir: Path) -> bool:
+    meta = read_dataset_metadata(save_dir)
+    return meta is not None and meta.get("type") == YOLO_DATASET_TYPE
+
+def write_dataset_metadata(save_dir: Path, meta: dict):
+    write_atomic(save_dir / DATASET_METADATA, json.dumps(meta, indent=2))
+
+class LabelWriter:
+    # Buffers label files and writes each as pre-encoded bytes with os.write to
+    # a temp file renamed over the target, skipping the text-file machinery.
+    # The buffer is kept small so it stays cache-resident.
+    def __init__(self, directory: Path, flush_bytes: int = 64 << 10):
+        self.directory = directory
+        self.flush_bytes = flush_bytes
+        self.pending = []
+        self.pending_bytes = 0
+        # name -> (mtime_ns, size) of every file written, for the label index
+        self.stats = {}
+
+    def add(self, name: str, text: str):
+        data = text.encode()
+        self.pending.append((name, data))
+        self.pending_bytes += len(data)
+        if self.pending_bytes >= self.flush_bytes:
+            self.flush()
+
+    def flush(self):
+        directory = str(self.directory)
+        for name, data in self.pending:
+            path = os.path.join(directory, name)
+            tmp = os.path.join(directory, f".{name}.{uuid4().hex}.tmp")
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            try:
+                try:
+                    # os.write may write only part of the buffer
+                    view = memoryview(data)
+                    while view:
+                        view = view[os.write(fd, view):]
+                    st = os.fstat(fd)
+                    self.stats[name] = (st.st_mtime_ns, st.st_size)
+                finally:
+                    os.close(fd)
+                os.replace(tmp, path)
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+        self.pending = []
+        self.pending_bytes = 0
@@ -0,0 +1,86 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import errno
+import os
+import shutil
+from app.jobs.export_pool import map_ordered
+
+# How training views materialise dataset files. "auto" takes the cheapest
+# placement the filesystem allows: a copy-on-write clone, then a hardlink,
+# then a kernel-side copy. Only clones and copies are independent of the
+# export; a hardlink is the same file, so edits through either path show in
+# both.
+PLACEMENT_MODES = ("symlink", "hardlink", "reflink", "copy", "auto")
+PLACE_WORKERS = 16
+
+FICLONE = 0x40049409
+# errors meaning "not possible here", as opposed to real I/O failures
+UNSUPPORTED = {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.ENOSYS, errno.EPERM, errno.EMLINK}
+
+def reflink(src: Path, dst: Path):
+    import fcntl
+
+    with open(src, "rb") as fs, open(dst, "wb") as fd:
+        try:
+            fcntl.ioctl(fd.fileno(), FICLONE, fs.fileno())
+        except OSError:
+            fd.close()
+            os.unlink(dst)
+            raise
+
+def kernel_copy(src: Path, dst: Path):
+    # copy_file_range keeps the data in the kernel and lets NFS 4.2/XFS/btrfs
+    # do server-side copies or clones; shutil falls back to sendfile/fcopyfile
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fs, open(dst, "wb") as fd:
+                remaining = os.fstat(fs.fileno()).st_size
+                while remaining > 0:
+                    n = os.copy_file_range(fs.fileno(), fd.fileno(), remaining)
+                    if n == 0:
+                        break
+                    remaining -= n
+            # a 0 before the end (e.g. the file shrank, or a filesystem that
+            # gives up) would leave dst truncated; copy it again in userspace
+            if remaining <= 0:
+                return
+        except OSError as e:
+            if e.errno not in UNSUPPORTED:
+                raise
+    shutil.copyfile(src, dst)
+
+def place_file(src: Path, dst: Path, mode: str) -> str | None:
+    # Returns the method used, or None if dst already existed
+    if dst.exists():
+        return None
+
+    if mode == "symlink":
+        os.symlink(src, dst)
+        return "symlink"
+
+    # links and clones need the real file, not the export's symlink to it
+    src = Path(os.path.realpath(src))
+    chain = {"hardlink": ["hardlink"], "reflink": ["reflink"], "copy": [], "auto": ["reflink", "hardlink"]}[mode]
+    for method in chain:
+        try:
+            if method == "hardlink":
+                os.link(src, dst)
+            else:
+                reflink(src, dst)
+            return method
+        except OSError as e:
+            if e.errno not in UNSUPPORTED:
+                raise
+
+    kernel_copy(src, dst)
+    return "copy"
+
+def place_files(pairs: list[tuple[Path, Path]], mode: str, workers: int = PLACE_WORKERS) -> dict[str, int]:
+    # Bounded thread pool: the syscalls release the GIL, and at most a few
+    # placements per worker are queued at any time.
+    counts = Counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for method in map_ordered(pool, lambda pair: place_file(pair[0], pair[1], mode), pairs, window=4 * workers):
+            counts[method or "existing"] += 1
+    return dict(counts)
@@ -1,29 +1,55 @@
 from datetime import datetime
 from ultralytics import YOLO
 from pathlib import Path
+import gc
 import json
 
 from app.services.model_service import ModelService
 from app.jobs.progress import publish_event
 from app.jobs.store import (
     mark_job_running,
+    mark_job_resumed,
     mark_job_failed,
     mark_job_completed,
+    mark_job_cancelled,
     is_cancel_requested,
 )
+from app.jobs.cancel import CancelWatcher, JobCancelled
 from app.models.finetune import TrainingConfig
 from app.jobs.dataset_splitter import split_and_build_training_view
+from app.jobs.resume import RESUME_CHECKPOINT, adopt_checkpoint, clear_resume_state, read_resume_state, snapshot_checkpoint, write_resume_state
+from app.jobs.sharded_dataset import trainer_for
+from app.jobs.artifacts import index_artifact
+from app.jobs.throughput_tuning import tune_throughput, tuned_trainer
+from app.jobs.hparam_search import read_sweep, run_sweep
+from app.jobs.quantization import quantize_export
 from app.utils.paths import ML_MODELS_DIR
 
 def run_finetune_job(job_id: str, payload: dict):
     svc = ModelService()
-    job_dir = ML_MODELS_DIR / job_id
+    # ultralytics writes weights/ straight into the run directory that
+    # ModelService lists fine-tuned models from
+    job_dir = ML_MODELS_DIR / "finetuned" / job_id
     job_dir.mkdir(parents=True, exist_ok=True)
     cfg = TrainingConfig.model_validate(payload["training_config"])
+    cancel = CancelWatcher(job_id)
+    cancel.start()
+    yolo = None
 
     try:
-        mark_job_running(job_id)
-        publish_event(job_id, "starting", {})
+        # a job cancelled while queued never starts
+        if is_cancel_requested(job_id):
+            raise JobCancelled(job_id)
+
+        # Resume state is written after every epoch; finding it means this is
+        # a retry of a run whose worker died
+        resume_state = read_resume_state(job_id)
+        if resume_state:
+            mark_job_resumed(job_id, resume_state["epoch"])
+            publish_event(job_id, "resumed", {"epoch": resume_state["epoch"]})
+        else:
+            mark_job_running(job_id)
+            publish_event(job_id, "starting", {})
 
         base_model_id = payload["base_model_id"]
         checkpoint = payload.get("checkpoint", "best")
@@ -36,28 +62,92 @@ def run_finetune_job(job_id: str, payload: dict):
         })
 
         dataset_yaml, dataset_report = split_and_build_training_view(
-            dataset_id=payload["dataset_ids"],
+            dataset_ids=payload["dataset_ids"],
             job_dir=job_dir,
             train_ratio=cfg.dataset.train_percentage,
-            seed=payload.get("seed", 42)
+            seed=payload.get("seed", 42),
+            near_duplicate_threshold=(
+                cfg.dataset.near_duplicate_threshold if cfg.dataset.drop_near_duplicates else None
+            ),
+            placement=cfg.dataset.placement,
+            imgsz=cfg.img_size if cfg.dataset.resize_images else None
         )
 
         publish_event(job_id, "dataset_ready", dataset_report)
+        cancel.check()
 
         (job_dir / "dataset_report.json").write_text(
             json.dumps(dataset_report, indent=2)
         )
 
-        yolo = YOLO(str(ckpt_path))
+        resume_from = None
+        if resume_state:
+            resume_from = Path(resume_state["checkpoint"])
+        elif cfg.model_init.resume:
+            resume_from = adopt_checkpoint(
+                svc.resolve_checkpoint(base_model_id, cfg.model_init.resume_checkpoint or "last"),
+                job_dir,
+                dataset_yaml,
+            )
+
+        # A resumed run takes its hyper-parameters from the checkpoint; a
+        # retry before that reuses the finished sweep
+        sweep = read_sweep(job_dir) if cfg.tuning.enabled else None
+        if cfg.tuning.enabled and sweep is None and resume_from is None:
+            publish_event(job_id, "sweep_started", {"trials": cfg.tuning.iterations})
+            sweep = run_sweep(
+                job_dir,
+                ckpt_path,
+                dataset_yaml,
+                cfg,
+                payload.get("seed", 42),
+                cancel,
+                on_trial=lambda result: publish_event(job_id, "trial_completed", result),
+            )
+            publish_event(job_id, "sweep_completed", {
+                "best": sweep["best"],
+                "duration_seconds": sweep["duration_seconds"],
+                "trial_seconds_total": sweep["trial_seconds_total"],
+            })
+            cancel.check()
+
+        hyperparams = {"lr0": cfg.learning_rate}
+        if sweep:
+            hyperparams.update(sweep["best"]["params"])
+
+        trainer = trainer_for(dataset_yaml)
+        train_args = {"batch": cfg.batch_size}
+        # a resumed run keeps the settings it was tuned with
+        autotune = resume_state and resume_state["autotune"]
+        if autotune:
+            settings = autotune["settings"]
+            trainer = tuned_trainer(trainer, settings["workers"], settings["threads"])
+            train_args = {"batch": settings["batch"], "workers": settings["workers"], "cache": settings["cache"] or False}
+        elif cfg.auto_tune:
+            publish_event(job_id, "autotune_started", {})
+            autotune = tune_throughput(
+                ckpt_path,
+                dataset_yaml,
+                cfg,
+                int(dataset_report["summary"]["used_samples"] * cfg.dataset.train_percentage),
+                job_dir,
+            )
+            settings = autotune["settings"]
+            trainer = tuned_trainer(trainer, settings["workers"], settings["threads"])
+            train_args = {"batch": settings["batch"], "workers": settings["workers"], "cache": settings["cache"] or False}
+            publish_event(job_id, "autotune_completed", autotune)
+            cancel.check()
+
+        yolo = YOLO(str(resume_from or ckpt_path))
 
         start_time = datetime.now()
 
-        def on_train_epoch_end(trainer):
-            if is_cancel_requested(job_id):
-                trainer.stop = True
-                publish_event(job_id, "cancelled", {})
-                raise RuntimeError("Job cancelled")
+        def check_cancel(_):
+            # raised out of yolo.train between batches; the loaders are shut
+            # down in the handler below
+            cancel.check()
 
+        def on_train_epoch_end(trainer):
             metrics = trainer.metrics
             epoch = trainer.epoch
 
@@ -66,42 +156,140 @@ def run_finetune_job(job_id: str, payload: dict):
                 "metrics": metrics
             })
 
+        def on_model_save(trainer):
+            write_resume_state(job_id, trainer.epoch, str(snapshot_checkpoint(trainer.last)), autotune)
+
         yolo.add_callback("on_train_epoch_end", on_train_epoch_end)
+        yolo.add_callback("on_model_save", on_model_save)
+        yolo.add_callback("on_train_batch_end", check_cancel)
+        yolo.add_callback("on_val_batch_end", check_cancel)
 
         yolo.train(
+            trainer=trainer,
+            # optimizer, EMA and epoch come from the checkpoint; of the
+            # settings below only batch, workers, cache, patience and freeze
+            # apply to a resumed run
+            resume=resume_from is not None,
             data=str(dataset_yaml),
             epochs=cfg.epochs,
             imgsz=cfg.img_size,
-            batch=cfg.batch_size,
-            lr0=cfg.learning_rate,
+            **train_args,
+            **hyperparams,
             patience=cfg.patience,
             freeze=cfg.layer_freeze,
-            project=str(job_dir),
-            name="",
+            project=str(job_dir.parent),
+            name=job_dir.name,
             exist_ok=True,
         )
 
         end_time = datetime.now()
 
-        write_metadata(job_dir, payload)
+        # training is over; a retry from here would have nothing to resume
+        clear_resume_state(job_id)
+        (job_dir / RESUME_CHECKPOINT).unlink(missing_ok=True)
+
+        write_metadata(job_dir, payload, autotune, sweep)
         write_training_summary(job_dir, start_time, end_time)
 
+        if cfg.export.export_onnx:
+            onnx_path = export_onnx(job_id, job_dir / "weights" / "best.pt", cfg)
+            if onnx_path and cfg.export.quantize_int8:
+                quantize_int8(job_id, job_dir, onnx_path, dataset_yaml, cfg)
+
         mark_job_completed(job_id)
         publish_event(job_id, "completed", {})
 
+    except JobCancelled:
+        release_trainer(yolo)
+        # a cancelled run is not picked up again by a retry
+        clear_resume_state(job_id)
+        (job_dir / RESUME_CHECKPOINT).unlink(missing_ok=True)
+        mark_job_cancelled(job_id)
+        publish_event(job_id, "cancelled", {})
+
     except Exception as e:
         mark_job_failed(job_id, str(e))
         publish_event(job_id, "failed", {"error": str(e)})
         raise
 
+    finally:
+        cancel.stop()
+
+
+def release_trainer(yolo: YOLO | None):
+    # Terminates dataloader worker processes now instead of whenever the
+    # trainer is garbage collected, so the node's cores and memory free up
+    trainer = yolo and yolo.trainer
+    if trainer is not None:
+        for loader in (getattr(trainer, "train_loader", None), getattr(trainer, "test_loader", None)):
+            iterator = getattr(loader, "iterator", None)
+            for w in getattr(iterator, "_workers", []):
+                if w.is_alive():
+                    w.terminate()
+            if hasattr(iterator, "_shutdown_workers"):
+                iterator._shutdown_workers()
+        yolo.trainer = None
+    gc.collect()
+
+
+def export_onnx(job_id: str, weights: Path, cfg: TrainingConfig) -> Path | None:
+    # A failed export leaves the trained weights usable, so it is reported
+    # without failing the job
+    publish_event(job_id, "export_started", {"format": "onnx"})
+    try:
+        path = Path(YOLO(str(weights)).export(
+            format="onnx",
+            imgsz=cfg.img_size,
+            batch=cfg.export.onnx_batch_size,
+            device="cpu",
+            # onnxslim is not a dependency; ORT applies its own graph
+            # optimisations when the session is created
+            simplify=False,
+        ))
+    except Exception as e:
+        print(f"Warning: ONNX export failed for job {job_id}: {e}")
+        publish_event(job_id, "export_failed", {"format": "onnx", "error": str(e)})
+        return None
+
+    index_artifact(job_id, path.name, path, "onnx")
+    publish_event(job_id, "export_completed", {"format": "onnx", "path": str(path)})
+    return path
+
+
+def quantize_int8(job_id: str, job_dir: Path, onnx_path: Path, dataset_yaml: Path, cfg: TrainingConfig):
+    # like the export, a failure here leaves the job completed
+    publish_event(job_id, "quantization_started", {"format": "onnx_int8"})
+    try:
+        path, report = quantize_export(onnx_path, dataset_yaml, cfg.img_size, cfg.export.calibration_images)
+    except Exception as e:
+        print(f"Warning: INT8 quantization failed for job {job_id}: {e}")
+        publish_event(job_id, "quantization_failed", {"format": "onnx_int8", "error": str(e)})
+        return
+
+    index_artifact(job_id, path.name, path, "onnx_int8")
+    # the accuracy delta is shown next to the INT8 checkpoint
+    meta = json.loads((job_dir / "metadata.json").read_text())
+    meta["quantization"] = report
+    (job_dir / "metadata.json").write_text(json.dumps(meta, indent=2))
+    publish_event(job_id, "quantization_completed", {"format": "onnx_int8", "path": str(path), **report})
+
 
-def write_metadata(job_dir: Path, payload: dict):
+def write_metadata(job_dir: Path, payload: dict, autotune: dict | None = None, sweep: dict | None = None):
     meta = {
         "parent_model_id": payload["base_model_id"],
         "checkpoint_used": payload.get("checkpoint", "best"),
         "datasets": payload["dataset_ids"],
         "created_at": datetime.now().isoformat(),
     }
+    if autotune:
+        meta["autotune"] = autotune
+    if sweep:
+        meta["sweep"] = {
+            "best_params": sweep["best"]["params"],
+            "best_fitness": sweep["best"]["fitness"],
+            "trials": len(sweep["trials"]),
+            "duration_seconds": sweep["duration_seconds"],
+        }
 
     with open(job_dir / "metadata.json", "w") as f:
         json.dump(meta, f, indent=2)
@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import json
+import os
+import cv2
+import numpy as np
+from app.jobs.export_pool import write_atomic
+
+# 64-bit difference hashes of dataset frames, cached per dataset and keyed
+# by the image's mtime and size.
+FRAME_HASHES = "frame_hashes.json"
+HASH_WORKERS = 16
+
+def dhash(path: Path) -> int | None:
+    # JPEGs decode at 1/8 scale, which is all a 9x8 signature needs
+    img = cv2.imread(str(path), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if img is None:
+        return None
+    small = cv2.resize(img, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int(np.packbits(bits).view(">u8")[0])
+
+def load_frame_hashes(dataset_root: Path, images: list[Path]) -> dict[str, int | None]:
+    path = dataset_root / FRAME_HASHES
+    try:
+        cache = json.loads(path.read_text())["hashes"] if path.exists() else {}
+    except (json.JSONDecodeError, KeyError):
+        cache = {}
+
+    hashes = {}
+    stale = []
+    for img in images:
+        try:
+            st = os.stat(img)
+        except FileNotFoundError:
+            hashes[img.name] = None
+            continue
+        entry = cache.get(img.name)
+        if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            hashes[img.name] = entry[2]
+        else:
+            stale.append((img, st))
+
+    if stale:
+        with ThreadPoolExecutor(max_workers=HASH_WORKERS) as pool:
+            for (img, st), h in zip(stale, pool.map(dhash, [img for img, _ in stale])):
+                hashes[img.name] = h
+                cache[img.name] = [st.st_mtime_ns, st.st_size, h]
+        write_atomic(path, json.dumps({"hashes": cache}))
+
+    return hashes
+
+def drop_near_duplicates(samples: list, images: list[Path], hashes: dict[str, int | None], threshold: int) -> tuple[list, int]:
+    # Walks samples in frame order and keeps a frame only if its hash is more
+    # than `threshold` bits away from the last kept frame, so a static shot
+    # collapses to one sample while slow motion still yields a frame whenever
+    # the view has drifted far enough.
+    kept = []
+    last = None
+    for sample, img in zip(samples, images):
+        h = hashes.get(img.name)
+        if h is not None and last is not None and (h ^ last).bit_count() <= threshold:
+            continue
+        kept.append(sample)
+        if h is not None:
+            last = h
+    return kept, len(samples) - len(kept)
@@ -0,0 +1,324 @@
+from pathlib import Path
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import time
+import numpy as np
+import psutil
+from app.jobs.export_pool import write_atomic
+from app.jobs.throughput_tuning import MEMORY_FRACTION
+from app.models.finetune import TrainingConfig
+from app.utils.paths import BACKEND_DIR
+
+# Hyper-parameter sweep run before a fine-tune: short trials train
+# concurrently on the job's training view, trials that fall behind at a rung
+# are stopped early (asynchronous successive halving), and the best
+# configuration is promoted to the full run.
+SWEEP_FILENAME = "sweep.json"
+# trials are compared after GRACE_EPOCHS * REDUCTION_FACTOR**k epochs; at each
+# rung only the top 1 / REDUCTION_FACTOR keep training
+GRACE_EPOCHS = 2
+REDUCTION_FACTOR = 3
+POLL_SECONDS = 1.0
+# subset of the ultralytics Tuner space: (low, high, log scale)
+SEARCH_SPACE = {
+    "lr0": (1e-4, 1e-2, True),
+    "momentum": (0.7, 0.98, False),
+    "weight_decay": (0.0, 0.001, False),
+    "warmup_epochs": (0.0, 5.0, False),
+    "hsv_h": (0.0, 0.1, False),
+    "hsv_s": (0.0, 0.9, False),
+    "hsv_v": (0.0, 0.9, False),
+    "degrees": (0.0, 45.0, False),
+    "translate": (0.0, 0.9, False),
+    "scale": (0.0, 0.95, False),
+    "fliplr": (0.0, 1.0, False),
+    "mosaic": (0.0, 1.0, False),
+    "mixup": (0.0, 1.0, False),
+    "copy_paste": (0.0, 1.0, False),
+}
+
+def read_sweep(job_dir: Path) -> dict | None:
+    p = job_dir / SWEEP_FILENAME
+    if not p.exists():
+        return None
+    try:
+        return json.loads(p.read_text())
+    except json.JSONDecodeError:
+        return None
+
+def sample_params(iterations: int, seed: int) -> list[dict]:
+    # Trial 0 is the untuned run. optimizer="auto" ignores lr0, so sampled
+    # trials pin the optimizer it picks for short fine-tunes.
+    rng = np.random.default_rng(seed)
+    trials = [{}]
+    for _ in range(iterations - 1):
+        params = {"optimizer": "AdamW"}
+        for name, (low, high, log) in SEARCH_SPACE.items():
+            if log:
+                params[name] = float(math.exp(rng.uniform(math.log(low), math.log(high))))
+            else:
+                params[name] = round(float(rng.uniform(low, high)), 5)
+        trials.append(params)
+    return trials
+
+def rungs(trial_epochs: int) -> list[int]:
+    out = []
+    r = GRACE_EPOCHS
+    while r < trial_epochs:
+        out.append(r)
+        r *= REDUCTION_FACTOR
+    return out
+
+def trial_budget(cfg: TrainingConfig) -> tuple[int, int]:
+    # concurrent trials and torch threads per trial
+    cores = os.cpu_count() or 1
+    concurrency = cfg.tuning.max_concurrent_trials or max(1, cores // 2)
+    concurrency = max(1, min(concurrency, cfg.tuning.iterations))
+    return concurrency, max(1, cores // concurrency)
+
+def read_progress(trial_dir: Path) -> list[float]:
+    try:
+        return json.loads((trial_dir / "progress.json").read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+def should_stop(trials_dir: Path, trial_dir: Path, epoch: int, fitness: float) -> bool:
+    # Compared with every trial that has reached this rung so far, finished or
+    # still running; the first trials to get here always continue
+    recorded = [fitness]
+    for d in trials_dir.iterdir():
+        if d == trial_dir or not d.is_dir():
+            continue
+        history = read_progress(d)
+        if len(history) >= epoch:
+            recorded.append(history[epoch - 1])
+    cutoff = np.percentile(recorded, (1 - 1 / REDUCTION_FACTOR) * 100)
+    return fitness < cutoff
+
+def run_trial(spec: dict) -> dict:
+    # Runs in a trial process (local subprocess or Celery worker); progress and
+    # the result go to files in the shared trial directory
+    import torch
+    from app.jobs.sharded_dataset import trainer_for
+    from app.jobs.throughput_tuning import tuned_trainer
+
+    torch.set_num_threads(spec["threads"])
+    trial_dir = Path(spec["trial_dir"])
+    trial_dir.mkdir(parents=True, exist_ok=True)
+    checkpoints = set(rungs(spec["epochs"]))
+    result = {
+        "trial": spec["trial"],
+        "params": spec["params"],
+        "status": "completed",
+        "epochs": 0,
+        "fitness": None,
+        "history": [],
+    }
+    started = time.perf_counter()
+
+    def on_fit_epoch_end(trainer):
+        # also fires for the final validation, after the last epoch
+        if trainer.epoch < len(result["history"]):
+            return
+        fitness = float(trainer.fitness or 0.0)
+        result["history"].append(fitness)
+        result["epochs"] = len(result["history"])
+        write_atomic(trial_dir / "progress.json", json.dumps(result["history"]))
+        if result["epochs"] in checkpoints and should_stop(trial_dir.parent, trial_dir, result["epochs"], fitness):
+            result["status"] = "stopped"
+            trainer.stop = True
+
+    try:
+        # The trainer is driven directly: YOLO.train reloads last.pt afterwards,
+        # which a stopped trial never writes. select_device would reset the
+        # thread count.
+        trainer = tuned_trainer(trainer_for(Path(spec["data"])), 0, spec["threads"])(overrides={
+            "model": spec["model"],
+            "data": spec["data"],
+            "epochs": spec["epochs"],
+            "imgsz": spec["imgsz"],
+            "batch": spec["batch"],
+            "freeze": spec["freeze"],
+            "project": str(trial_dir.parent),
+            "name": trial_dir.name,
+            "exist_ok": True,
+            "save": False,
+            "plots": False,
+            "verbose": False,
+            **spec["params"],
+        })
+        trainer.add_callback("on_fit_epoch_end", on_fit_epoch_end)
+        trainer.train()
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+    # the final epoch is saved even with save=False
+    shutil.rmtree(trial_dir / "weights", ignore_errors=True)
+
+    result["fitness"] = result["history"][-1] if result["history"] else None
+    result["duration_seconds"] = time.perf_counter() - started
+    write_atomic(trial_dir / "result.json", json.dumps(result, indent=2))
+    return result
+
+class LocalTrial:
+    # one trial in a child interpreter; Celery's prefork workers are daemonic
+    # and cannot use multiprocessing for this
+    def __init__(self, spec_path: Path, threads: int):
+        env = dict(os.environ, OMP_NUM_THREADS=str(threads))
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "app.jobs.hparam_search", str(spec_path)],
+            cwd=BACKEND_DIR,
+            env=env,
+        )
+
+    def done(self) -> bool:
+        return self.proc.poll() is not None
+
+    def stop(self):
+        self.proc.terminate()
+        self.proc.wait()
+
+def celery_trial_slots() -> int:
+    # Worker processes consuming the trial queue. The fine-tune task running
+    # the sweep blocks on its trials, so its own process is not a free slot.
+    from celery import current_task
+    from app.jobs.celery_app import TRIAL_QUEUE, celery_app
+
+    inspect = celery_app.control.inspect(timeout=1.0)
+    queues = inspect.active_queues() or {}
+    stats = inspect.stats() or {}
+    own = current_task.request.hostname if current_task else None
+    slots = 0
+    for node, consumed in queues.items():
+        if any(q["name"] == TRIAL_QUEUE for q in consumed):
+            slots += stats.get(node, {}).get("pool", {}).get("max-concurrency", 1) - (node == own)
+    return slots
+
+class CeleryTrial:
+    def __init__(self, spec: dict):
+        from app.workers.finetune import run_trial_task
+        self.result = run_trial_task.delay(spec)
+
+    def done(self) -> bool:
+        return self.result.ready()
+
+    def stop(self):
+        self.result.revoke(terminate=True)
+
+def run_sweep(job_dir: Path, model_path: Path, data_yaml: Path, cfg: TrainingConfig, seed: int, cancel, on_trial=None) -> dict:
+    # Returns the sweep summary; "best" holds the promoted trial's params
+    started = time.perf_counter()
+    sweep_dir = job_dir / "sweep"
+    trials_dir = sweep_dir / "trials"
+    trials_dir.mkdir(parents=True, exist_ok=True)
+    concurrency, threads = trial_budget(cfg)
+    budget = cfg.tuning.time_budget_minutes
+    deadline = started + budget * 60 if budget else None
+
+    # without a free worker on the trial queue the dispatched trials would wait
+    # forever behind this task
+    celery_trials = cfg.tuning.celery_trials and celery_trial_slots() > 0
+    if cfg.tuning.celery_trials and not celery_trials:
+        print("Warning: no free Celery worker consumes the trial queue, running trials locally")
+
+    pending = []
+    for i, params in enumerate(sample_params(cfg.tuning.iterations, seed)):
+        spec = {
+            "trial": i,
+            "params": {"lr0": cfg.learning_rate, **params},
+            "model": str(model_path),
+            "data": str(data_yaml),
+            "epochs": cfg.tuning.trial_epochs,
+            "imgsz": cfg.img_size,
+            "batch": cfg.batch_size,
+            "freeze": cfg.layer_freeze,
+            "threads": threads,
+            "trial_dir": str(trials_dir / f"{i:03d}"),
+        }
+        pending.append(spec)
+
+    running = {}
+    results = []
+
+    def collect(spec: dict, status: str | None = None):
+        path = Path(spec["trial_dir"]) / "result.json"
+        if status is None and path.exists():
+            result = json.loads(path.read_text())
+        else:
+            history = read_progress(Path(spec["trial_dir"]))
+            result = {
+                "trial": spec["trial"],
+                "params": spec["params"],
+                "status": status or "failed",
+                "epochs": len(history),
+                "fitness": history[-1] if history else None,
+                "history": history,
+            }
+        results.append(result)
+        if on_trial:
+            on_trial(result)
+
+    try:
+        while pending or running:
+            cancel.check()
+
+            if deadline and time.perf_counter() > deadline:
+                for spec, trial in running.values():
+                    trial.stop()
+                    collect(spec, "out_of_budget")
+                for spec in pending:
+                    collect(spec, "skipped")
+                running, pending = {}, []
+                break
+
+            for key, (spec, trial) in list(running.items()):
+                if trial.done():
+                    collect(spec)
+                    del running[key]
+
+            # new trials start only while memory stays within the budget
+            while pending and len(running) < concurrency and (
+                not running or psutil.virtual_memory().percent < MEMORY_FRACTION * 100
+            ):
+                spec = pending.pop(0)
+                if celery_trials:
+                    trial = CeleryTrial(spec)
+                else:
+                    spec_path = Path(spec["trial_dir"]) / "spec.json"
+                    spec_path.parent.mkdir(parents=True, exist_ok=True)
+                    write_atomic(spec_path, json.dumps(spec))
+                    trial = LocalTrial(spec_path, threads)
+                running[spec["trial"]] = (spec, trial)
+
+            time.sleep(POLL_SECONDS)
+    finally:
+        for spec, trial in running.values():
+            trial.stop()
+
+    ranked = [r for r in results if r["status"] == "completed" and r["fitness"] is not None]
+    if not ranked:
+        # nothing ran the full trial length; fall back to the furthest trials
+        ranked = [r for r in results if r["fitness"] is not None]
+    if not ranked:
+        raise RuntimeError("No hyper-parameter trial produced a result")
+    best = max(ranked, key=lambda r: (r["epochs"], r["fitness"]))
+
+    summary = {
+        "best": best,
+        "trials": sorted(results, key=lambda r: r["trial"]),
+        "concurrency": concurrency,
+        "threads_per_trial": threads,
+        "celery_trials": celery_trials,
+        # what the same trials would have taken one after another
+        "trial_seconds_total": sum(r.get("duration_seconds", 0.0) for r in results),
+        "duration_seconds": time.perf_counter() - started,
+    }
+    write_atomic(job_dir / SWEEP_FILENAME, json.dumps(summary, indent=2))
+    return summary
+
+if __name__ == "__main__":
+    run_trial(json.loads(Path(sys.argv[1]).read_text()))
@@ -0,0 +1,92 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import json
+import math
+import os
+import cv2
+from app.jobs.export_pool import EXPORT_WORKERS, chunked, map_ordered, write_atomic
+from app.utils.paths import RESIZED_IMAGES_DIR
+
+RESIZED_INDEX = "index.json"
+RESIZED_QUALITY = 95
+
+def resized_dims(w0: int, h0: int, imgsz: int) -> tuple[int, int]:
+    # Same rounding as the ultralytics rect-mode resize, so cached frames are
+    # loaded at ratio 1 and never resized again
+    r = imgsz / max(h0, w0)
+    return min(math.ceil(w0 * r), imgsz), min(math.ceil(h0 * r), imgsz)
+
+def resize_chunk(args) -> list[bool | None]:
+    # Runs on a resize thread. Frames already within imgsz are left alone:
+    # ultralytics upsamples them from the source as before.
+    imgsz, items = args
+    results = []
+    for src, dst in items:
+        im = cv2.imread(src, cv2.IMREAD_COLOR)
+        if im is None:
+            results.append(None)
+            continue
+        h0, w0 = im.shape[:2]
+        if max(h0, w0) <= imgsz:
+            results.append(False)
+            continue
+        im = cv2.resize(im, resized_dims(w0, h0, imgsz), interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode(".jpg", im, [cv2.IMWRITE_JPEG_QUALITY, RESIZED_QUALITY])
+        if not ok:
+            results.append(None)
+            continue
+        write_atomic(Path(dst), buf.tobytes())
+        results.append(True)
+    return results
+
+def resize_images(dataset_id: str, images: list[Path], imgsz: int) -> tuple[list[Path], list[tuple]]:
+    # Returns the path to train on for each image and the source stamps the
+    # cache was checked against. Entries are keyed by the source's mtime and
+    # size, so edited or replaced frames are resized again; YOLO labels are
+    # normalised and stay valid for the resized frames as they are.
+    cache_dir = RESIZED_IMAGES_DIR / dataset_id / str(imgsz)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    index_path = cache_dir / RESIZED_INDEX
+    try:
+        index = json.loads(index_path.read_text())
+    except (OSError, json.JSONDecodeError):
+        index = {}
+
+    stamps = {}
+    todo = []
+    for img in images:
+        st = os.stat(img)
+        stamps[img.name] = (st.st_mtime_ns, st.st_size)
+        entry = index.get(img.name)
+        if entry is None or (entry["mtime_ns"], entry["size"]) != stamps[img.name]:
+            todo.append(img)
+
+    chunk_args = (
+        (imgsz, [(str(img), str(cache_dir / img.name)) for img in chunk])
+        for chunk in chunked(todo)
+    )
+
+    # Threads rather than export_executor(): this runs inside the Celery
+    # fine-tune task, whose prefork children are daemonic and cannot start
+    # processes. cv2 decodes, resizes and encodes without holding the GIL.
+    done = iter(todo)
+    with ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="resize") as pool:
+        for results in map_ordered(pool, resize_chunk, chunk_args):
+            for resized in results:
+                img = next(done)
+                if resized is None:
+                    index.pop(img.name, None)
+                    continue
+                mtime_ns, size = stamps[img.name]
+                index[img.name] = {"mtime_ns": mtime_ns, "size": size, "resized": resized}
+                if not resized:
+                    (cache_dir / img.name).unlink(missing_ok=True)
+
+    if todo:
+        write_atomic(index_path, json.dumps(index))
+
+    paths = [
+        cache_dir / img.name if index.get(img.name, {}).get("resized") else img
+        for img in images
+    ]
+    return paths, [stamps[img.name] for img in images]
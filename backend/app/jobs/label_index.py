@@ -0,0 +1,85 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import json
+import os
+from app.jobs.export_pool import write_atomic
+
+# Per-dataset summary of labels/*.txt written by the YOLO export: status,
+# instance count and class histogram per label file, keyed by the file's
+# mtime and size so readers can trust an entry without opening the file.
+LABEL_INDEX = "label_index.json"
+SCAN_WORKERS = 16
+
+def label_issue(text: str) -> str | None:
+    if not text:
+        return "empty_label"
+
+    try:
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            int(line.split()[0])
+    except Exception:
+        return "malformed_label"
+
+    return None
+
+def parse_label(text: str) -> dict:
+    status = label_issue(text)
+    classes = Counter()
+    if status is None:
+        classes.update(int(line.split()[0]) for line in text.splitlines() if line.strip())
+    return {
+        "status": status,
+        "instances": sum(classes.values()),
+        "classes": {str(c): n for c, n in classes.items()},
+    }
+
+def scan_label(path: Path) -> dict:
+    st = os.stat(path)
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size, **parse_label(path.read_text())}
+
+def write_label_index(dataset_root: Path, entries: dict[str, dict]):
+    write_atomic(dataset_root / LABEL_INDEX, json.dumps({"labels": entries}))
+
+def read_label_index(dataset_root: Path) -> dict[str, dict]:
+    path = dataset_root / LABEL_INDEX
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text())["labels"]
+    except (json.JSONDecodeError, KeyError):
+        return {}
+
+def load_label_index(dataset_root: Path, labels_dir: Path, stems: list[str]) -> tuple[dict[str, dict], dict]:
+    # Returns an entry per stem that has a label file. Entries whose mtime or
+    # size no longer match are re-scanned in parallel and written back.
+    index = read_label_index(dataset_root)
+    files = {
+        entry.name[:-4]: entry.stat()
+        for entry in os.scandir(labels_dir)
+        if entry.name.endswith(".txt") and not entry.name.startswith(".")
+    }
+
+    entries = {}
+    stale = []
+    for stem in stems:
+        st = files.get(stem)
+        if st is None:
+            continue
+        entry = index.get(stem)
+        if entry and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+            entries[stem] = entry
+        else:
+            stale.append(stem)
+
+    if stale:
+        with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+            scanned = pool.map(scan_label, [labels_dir / f"{stem}.txt" for stem in stale])
+            for stem, entry in zip(stale, scanned):
+                entries[stem] = entry
+                index[stem] = entry
+        write_label_index(dataset_root, {stem: e for stem, e in index.items() if stem in files})
+
+    return entries, {"indexed": len(entries) - len(stale), "rescanned": len(stale)}
@@ -0,0 +1,269 @@
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable
+import json
+import numpy as np
+from PIL import Image
+from app.jobs.export_pool import frame_chunks, link_frame_image, map_chunks, read_dataset_metadata, write_dataset_metadata
+from app.jobs.yolo_export import export_objects, frame_classes_of
+from app.services.job_store import EXPORT_JOBS, update_job
+from app.services.mask_store import MASK_STORE
+from app.utils.cocos import COCO_LABELS
+from app.utils.masks import unpack_mask
+from app.utils.paths import SEGMENTATIONS_DIR, UPLOADS_DIR
+from app.utils.validation import list_frame_files
+
+COCO_FILENAME = "annotations.json"
+MASKS_DIRNAME = "masks"
+
+def run_mask_export(folder: str, fmt: str, save_negatives: bool, job_id: str):
+    store = MASK_STORE.store[folder]
+    obj_meta = MASK_STORE.objects.get(folder, {})
+
+    save_dir = SEGMENTATIONS_DIR / folder
+    images_dir = save_dir / "images"
+    masks_dir = save_dir / MASKS_DIRNAME
+    images_dir.mkdir(parents=True, exist_ok=True)
+    if fmt == "png":
+        masks_dir.mkdir(parents=True, exist_ok=True)
+
+    frame_objects = {frame_idx: export_objects(folder, frame_idx, obj_meta) for frame_idx in sorted(store.keys())}
+    frame_classes = frame_classes_of(frame_objects)
+    frames = list(frame_classes)
+    total = len(frames)
+    update_job(EXPORT_JOBS, job_id, total=total)
+
+    # frames without objects take their size from the source image
+    frame_files = list_frame_files(UPLOADS_DIR / folder)
+    settings = {
+        "format": fmt,
+        "src_images_dir": str(UPLOADS_DIR / folder),
+        "frame_names": {i: frame_files[i].name for i in frames if not frame_classes[i]},
+        "images_dir": str(images_dir),
+        "masks_dir": str(masks_dir),
+        "save_negatives": save_negatives,
+    }
+
+    def chunk_args(pack: bool):
+        return frame_chunks(frame_objects, frames, settings, pack)
+
+    def progress(results: Iterable[list[dict]]):
+        processed = 0
+        for chunk_results in results:
+            yield chunk_results
+            processed += len(chunk_results)
+            update_job(EXPORT_JOBS, job_id, processed=processed, progress=processed / total)
+
+    results = progress(map_chunks(export_mask_chunk, chunk_args, total))
+    if fmt == "coco_rle":
+        stats = write_coco(save_dir / COCO_FILENAME, results, save_negatives)
+    else:
+        stats = collect_png_stats(results)
+        remove_stale_masks(masks_dir, set(frames))
+
+    stats["job_id"] = job_id
+    stats["created_at"] = datetime.now().isoformat()
+    stats["save_negatives"] = save_negatives
+
+    meta = read_dataset_metadata(save_dir) or {
+        "dataset_id": folder,
+        "created_at": stats["created_at"],
+        "job_id": job_id,
+        "type": "segmentation_masks",
+        "counts": {"frames_total": total, "frames_written": 0, "frames_empty": 0, "labels_total": 0},
+        "objects": [],
+        "classes": [],
+    }
+    meta.setdefault("exports", {})[fmt] = stats
+    write_dataset_metadata(save_dir, meta)
+
+    update_job(EXPORT_JOBS, job_id, status="completed", progress=1.0)
+
+def write_coco(path: Path, results: Iterable[list[dict]], save_negatives: bool) -> dict:
+    # Annotations are streamed to disk as chunks arrive; only the small image
+    # records are kept until the end. Keys are written annotations-first so
+    # the file never has to be rewritten.
+    tmp = path.with_name(f".{path.name}.tmp")
+    images = []
+    per_class = Counter()
+    frames_empty = 0
+    ann_id = 0
+
+    with open(tmp, "w") as f:
+        f.write('{"annotations": [')
+        for chunk_results in results:
+            for frame in chunk_results:
+                if not frame["annotations"]:
+                    frames_empty += 1
+                    if not save_negatives:
+                        continue
+                images.append({
+                    "id": frame["frame_idx"],
+                    "file_name": f"{frame['frame_idx']:05d}.jpg",
+                    "height": frame["height"],
+                    "width": frame["width"],
+                })
+                for ann in frame["annotations"]:
+                    ann_id += 1
+                    f.write("," if ann_id > 1 else "")
+                    f.write(json.dumps({"id": ann_id, "image_id": frame["frame_idx"], "iscrowd": 0, **ann}))
+                    per_class[ann["category_id"]] += 1
+
+        categories = [{"id": cid, "name": name} for cid, name in COCO_LABELS.items()]
+        f.write('], "images": ')
+        f.write(json.dumps(images))
+        f.write(', "categories": ')
+        f.write(json.dumps(categories))
+        f.write("}")
+    tmp.replace(path)
+
+    return {
+        "path": path.name,
+        "frames_written": len(images),
+        "frames_empty": frames_empty,
+        "annotations_total": ann_id,
+        "classes": class_stats(per_class, "annotations"),
+    }
+
+def collect_png_stats(results: Iterable[list[dict]]) -> dict:
+    per_class = Counter()
+    frames_written = 0
+    frames_empty = 0
+    for chunk_results in results:
+        for frame in chunk_results:
+            frames_written += frame["written"]
+            frames_empty += not frame["pixels"]
+            per_class.update(frame["pixels"])
+
+    return {
+        "path": MASKS_DIRNAME,
+        "frames_written": frames_written,
+        "frames_empty": frames_empty,
+        "encoding": "class_id + 1, 0 = background",
+        "classes": class_stats(per_class, "pixels"),
+    }
+
+def remove_stale_masks(masks_dir: Path, frames: set[int]):
+    # frames whose masks were all deleted are no longer in the store
+    for path in masks_dir.glob("*.png"):
+        if path.stem.isdigit() and int(path.stem) not in frames:
+            path.unlink(missing_ok=True)
+
+def class_stats(per_class: Counter, key: str) -> list[dict]:
+    return [
+        {"id": cid, "name": COCO_LABELS.get(cid), key: count}
+        for cid, count in sorted(per_class.items())
+    ]
+
+def export_mask_chunk(args) -> list[dict]:
+    # Runs in an export worker process
+    settings, frames = args
+    src_images_dir = Path(settings["src_images_dir"])
+    images_dir = Path(settings["images_dir"])
+    masks_dir = Path(settings["masks_dir"])
+
+    results = []
+    for frame_idx, objects in frames:
+        link_frame_image(src_images_dir, images_dir, frame_idx)
+        objects = [
+            (obj_id, class_id, unpack_mask(mask) if isinstance(mask, tuple) else mask)
+            for obj_id, class_id, mask in objects
+        ]
+        if objects:
+            height, width = objects[0][2].shape
+        else:
+            with Image.open(src_images_dir / settings["frame_names"][frame_idx]) as img:
+                width, height = img.size
+
+        if settings["format"] == "coco_rle":
+            results.append(encode_coco_frame(frame_idx, objects, height, width))
+        else:
+            results.append(write_png_frame(masks_dir, frame_idx, objects, height, width, settings["save_negatives"]))
+    return results
+
+def encode_coco_frame(frame_idx: int, objects: list, height: int, width: int) -> dict:
+    annotations = []
+    for obj_id, class_id, mask in objects:
+        mask = mask.astype(bool)
+        area = int(np.count_nonzero(mask))
+        if not area:
+            continue
+        annotations.append({
+            "category_id": class_id,
+            "object_id": obj_id,
+            "segmentation": rle_encode(mask),
+            "area": area,
+            "bbox": mask_bbox(mask),
+        })
+    return {"frame_idx": frame_idx, "height": height, "width": width, "annotations": annotations}
+
+def write_png_frame(masks_dir: Path, frame_idx: int, objects: list, height: int, width: int, save_negatives: bool) -> dict:
+    # Palette PNG holding class_id + 1 per pixel; later objects win overlaps
+    index = np.zeros((height, width), dtype=np.uint8)
+    for _, class_id, mask in objects:
+        index[mask.astype(bool)] = class_id + 1
+
+    values, counts = np.unique(index, return_counts=True)
+    pixels = {int(v) - 1: int(c) for v, c in zip(values, counts) if v}
+
+    path = masks_dir / f"{frame_idx:05d}.png"
+    if not pixels and not save_negatives:
+        path.unlink(missing_ok=True)
+        return {"frame_idx": frame_idx, "written": False, "pixels": pixels}
+
+    img = Image.fromarray(index)
+    img.putpalette(PALETTE)
+    tmp = path.with_name(f".{path.name}.tmp")
+    img.save(tmp, format="PNG")
+    tmp.replace(path)
+    return {"frame_idx": frame_idx, "written": True, "pixels": pixels}
+
+def rle_encode(mask: np.ndarray) -> dict:
+    # COCO compressed RLE: run lengths over the column-major flattened mask,
+    # starting with a (possibly empty) run of zeros
+    h, w = mask.shape
+    flat = mask.ravel(order="F")
+    bounds = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    runs = np.diff(np.concatenate(([0], bounds, [flat.size])))
+    if flat[0]:
+        runs = np.concatenate(([0], runs))
+    return {"size": [h, w], "counts": rle_to_string(runs.tolist())}
+
+def rle_to_string(counts: list[int]) -> str:
+    # Same encoding as pycocotools' rleToString: each count (delta-coded
+    # against the count two back) as 5-bit groups with a continuation bit,
+    # offset into printable ASCII
+    out = bytearray()
+    for i, x in enumerate(counts):
+        if i > 2:
+            x -= counts[i - 2]
+        more = True
+        while more:
+            c = x & 0x1f
+            x >>= 5
+            more = x != -1 if c & 0x10 else x != 0
+            if more:
+                c |= 0x20
+            out.append(c + 48)
+    return out.decode("ascii")
+
+def mask_bbox(mask: np.ndarray) -> list[int]:
+    ys = np.flatnonzero(mask.any(axis=1))
+    xs = np.flatnonzero(mask.any(axis=0))
+    return [int(xs[0]), int(ys[0]), int(xs[-1] - xs[0] + 1), int(ys[-1] - ys[0] + 1)]
+
+def voc_palette() -> list[int]:
+    palette = []
+    for i in range(256):
+        r = g = b = 0
+        c = i
+        for j in range(8):
+            r |= (c & 1) << (7 - j)
+            g |= ((c >> 1) & 1) << (7 - j)
+            b |= ((c >> 2) & 1) << (7 - j)
+            c >>= 3
+        palette += [r, g, b]
+    return palette
+
+PALETTE = voc_palette()
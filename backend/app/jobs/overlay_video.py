@@ -0,0 +1,154 @@
+from pathlib import Path
+import queue
+import threading
+import cv2
+from app.jobs.export_pool import chunked, map_chunks
+from app.models.save import SaveOverlayVideoRequest
+from app.services.job_store import EXPORT_JOBS, update_job
+from app.services.mask_store import MASK_STORE
+from app.utils.masks import pack_mask, unpack_mask
+from app.utils.overlay import make_overlay
+from app.utils.paths import SEGMENTATIONS_DIR, UPLOADS_DIR
+from app.utils.validation import list_frame_files
+
+# Rendered frames are much larger than masks, so chunks are kept small to
+# bound the frames held between the render workers and the encoder.
+VIDEO_CHUNK_SIZE = 8
+VIDEO_EXTENSIONS = {"mp4": ".mp4", "mjpeg": ".mjpeg"}
+
+def overlay_video_path(folder: str, fmt: str) -> Path:
+    return SEGMENTATIONS_DIR / folder / f"overlay{VIDEO_EXTENSIONS[fmt]}"
+
+def run_overlay_export(folder: str, req: SaveOverlayVideoRequest, job_id: str):
+    # Pipeline: export workers decode and composite frames (and JPEG-encode
+    # them for MJPEG); a writer thread muxes/encodes in order while the next
+    # chunks are rendered.
+    frame_files = list_frame_files(UPLOADS_DIR / folder)
+    store = MASK_STORE.store.get(folder, {})
+    obj_meta = MASK_STORE.objects.get(folder, {})
+
+    total = len(frame_files)
+    if not total:
+        raise RuntimeError(f"No frames found for {folder}")
+    update_job(EXPORT_JOBS, job_id, total=total)
+
+    out_path = overlay_video_path(folder, req.format)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_name(f".{out_path.stem}.tmp{out_path.suffix}")
+
+    settings = {
+        "format": req.format,
+        "scale": req.scale,
+        "quality": req.quality,
+        "show_class": req.show_class,
+        "obj_meta": {obj_id: dict(meta) for obj_id, meta in obj_meta.items()},
+    }
+
+    def chunk_args(pack: bool):
+        for chunk in chunked(list(range(total)), VIDEO_CHUNK_SIZE):
+            frames = []
+            for frame_idx in chunk:
+                masks = store.get(frame_idx, {})
+                objects = [
+                    (obj_id, pack_mask(mask) if pack else mask)
+                    for obj_id, mask in list(masks.items())
+                    if mask is not None
+                ]
+                frames.append((str(frame_files[frame_idx]), objects))
+            yield settings, frames
+
+    writer = VideoWriterThread(tmp_path, req.format, req.fps)
+    writer.start()
+    processed = 0
+    try:
+        for rendered in map_chunks(render_overlay_chunk, chunk_args, total, VIDEO_CHUNK_SIZE):
+            for frame in rendered:
+                writer.put(frame)
+            processed += len(rendered)
+            update_job(EXPORT_JOBS, job_id, processed=processed, progress=processed / total)
+    finally:
+        writer.close()
+    tmp_path.replace(out_path)
+
+    update_job(EXPORT_JOBS, job_id, status="completed", progress=1.0, path=str(out_path))
+
+def render_overlay_chunk(args) -> list:
+    # Runs in an export worker process
+    settings, frames = args
+    scale = settings["scale"]
+    rendered = []
+    for image_path, objects in frames:
+        image = cv2.imread(image_path)
+        if image is None:
+            raise RuntimeError(f"Failed to load frame {image_path}")
+
+        masks = {obj_id: unpack_mask(mask) if isinstance(mask, tuple) else mask for obj_id, mask in objects}
+        if scale != 1.0:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            size = (image.shape[1], image.shape[0])
+            masks = {obj_id: cv2.resize(mask, size, interpolation=cv2.INTER_NEAREST) for obj_id, mask in masks.items()}
+
+        frame = make_overlay(image, masks, obj_meta=settings["obj_meta"], show_class=settings["show_class"])
+        if settings["format"] == "mjpeg":
+            ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, settings["quality"]])
+            if not ok:
+                raise RuntimeError(f"Failed to encode frame {image_path}")
+            frame = buffer.tobytes()
+        rendered.append(frame)
+    return rendered
+
+class VideoWriterThread(threading.Thread):
+    # Last pipeline stage. MP4 frames go through cv2.VideoWriter (which
+    # releases the GIL while encoding); MJPEG frames arrive encoded and are
+    # appended as a raw MJPEG stream.
+    def __init__(self, path: Path, fmt: str, fps: float, max_pending: int = 4 * VIDEO_CHUNK_SIZE):
+        super().__init__(daemon=True)
+        self.path = path
+        self.fmt = fmt
+        self.fps = fps
+        self.frames = queue.Queue(maxsize=max_pending)
+        self.error = None
+
+    def put(self, frame):
+        if self.error:
+            raise self.error
+        self.frames.put(frame)
+
+    def close(self):
+        self.frames.put(None)
+        self.join()
+        if self.error:
+            raise self.error
+
+    def run(self):
+        # Always drain until the sentinel so the producer never blocks on a
+        # failed writer; the first error is re-raised from close().
+        sink = None
+        while (frame := self.frames.get()) is not None:
+            if self.error:
+                continue
+            try:
+                if sink is None:
+                    sink = self.open(frame)
+                sink.write(frame)
+            except Exception as e:
+                self.error = e
+
+        if sink is not None:
+            try:
+                if self.fmt == "mjpeg":
+                    sink.close()
+                else:
+                    sink.release()
+            except Exception as e:
+                self.error = self.error or e
+
+    def open(self, frame):
+        if self.fmt == "mjpeg":
+            return open(self.path, "wb")
+
+        h, w = frame.shape[:2]
+        writer = cv2.VideoWriter(str(self.path), cv2.VideoWriter_fourcc(*"mp4v"), self.fps, (w, h))
+        if not writer.isOpened():
+            raise RuntimeError(f"Failed to open video writer for {self.path}")
+        return writer
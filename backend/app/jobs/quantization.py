@@ -0,0 +1,107 @@
+from pathlib import Path
+import time
+import numpy as np
+from torch.utils.data import DataLoader, Subset
+from app.jobs.evaluation import evaluate, split_batches, split_dataset
+
+# Post-training INT8 quantization of a fine-tune's ONNX export with ONNX
+# Runtime's static quantizer. Activation ranges are calibrated on a spread of
+# training-split images, weights are quantized per channel, and only the
+# convolutions are quantized: the box decoding and mask coefficients at the end
+# of the head keep float precision.
+QUANTIZED_OPS = ["Conv"]
+# Calibration and the FP32 / INT8 comparison each decode at most this many
+# images, one batch at a time
+MAX_CALIBRATION_IMAGES = 300
+COMPARISON_IMAGES = 200
+
+class CalibrationReader:
+    # feeds the quantizer's calibration one export-sized batch at a time,
+    # decoded when the quantizer asks for it
+    def __init__(self, loader: DataLoader):
+        self.loader = loader
+        self.batches = iter(loader)
+
+    def get_next(self) -> dict | None:
+        batch = next(self.batches, None)
+        if batch is None:
+            return None
+        return {"images": batch["img"].numpy().astype(np.float32) / 255.0}
+
+    def rewind(self):
+        self.batches = iter(self.loader)
+
+def export_batch(model) -> int:
+    # 0 for a dynamic batch axis
+    return model.graph.input[0].type.tensor_type.shape.dim[0].dim_value or 1
+
+def calibration_indices(size: int, count: int, batch: int) -> list[int]:
+    # evenly spaced over the split, in whole batches; small splits repeat
+    count = max(batch, count // batch * batch)
+    return [int(i) % size for i in np.linspace(0, max(size, count), count, endpoint=False)]
+
+def quantize_onnx(onnx_path: Path, output: Path, data_yaml: Path, imgsz: int, calibration_images: int) -> Path:
+    import onnx
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    model = onnx.load(str(onnx_path))
+    batch = export_batch(model)
+    _, dataset = split_dataset(data_yaml, "train", imgsz)
+    indices = calibration_indices(len(dataset), calibration_images, batch)
+    reader = CalibrationReader(DataLoader(Subset(dataset, indices), batch_size=batch, shuffle=False, num_workers=0, collate_fn=dataset.collate_fn))
+
+    # shape inference and graph clean-up the quantizer expects
+    prepared = output.with_name(f"{output.stem}.prep.onnx")
+    try:
+        quant_pre_process(str(onnx_path), str(prepared), skip_symbolic_shape=True)
+        quantize_static(
+            str(prepared),
+            str(output),
+            reader,
+            quant_format=QuantFormat.QDQ,
+            op_types_to_quantize=QUANTIZED_OPS,
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            calibrate_method=CalibrationMethod.MinMax,
+        )
+    finally:
+        prepared.unlink(missing_ok=True)
+
+    # the exporter's metadata (names, stride, imgsz, batch, task) is what
+    # YOLOOnnxEngine and AutoBackend read the model's setup from
+    quantized = onnx.load(str(output))
+    if not quantized.metadata_props:
+        quantized.metadata_props.extend(model.metadata_props)
+        onnx.save(quantized, str(output))
+    return output
+
+def quantize_export(onnx_path: Path, data_yaml: Path, imgsz: int, calibration_images: int) -> tuple[Path, dict]:
+    # Returns the INT8 model and a report comparing it with the FP32 export on
+    # a spread of the validation split
+    import onnx
+
+    calibration_images = min(calibration_images, MAX_CALIBRATION_IMAGES)
+    started = time.perf_counter()
+    output = onnx_path.with_name(f"{onnx_path.stem}.int8.onnx")
+    quantize_onnx(onnx_path, output, data_yaml, imgsz, calibration_images)
+    quantize_seconds = time.perf_counter() - started
+
+    data, batches = split_batches(data_yaml, "val", imgsz, export_batch(onnx.load(str(onnx_path))), COMPARISON_IMAGES)
+    fp32 = evaluate(onnx_path, data, batches, onnx_path.parent)
+    int8 = evaluate(output, data, batches, onnx_path.parent)
+
+    report = {
+        "calibration_images": calibration_images,
+        "fp32": fp32,
+        "int8": int8,
+        "delta": {k: int8[k] - fp32[k] for k in fp32 if k != "images"},
+        "size_mb": {
+            "fp32": onnx_path.stat().st_size / 2**20,
+            "int8": output.stat().st_size / 2**20,
+        },
+        "quantize_seconds": quantize_seconds,
+        "duration_seconds": time.perf_counter() - started,
+    }
+    return output, report
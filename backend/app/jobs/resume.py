@@ -1,10 +1,59 @@
 from pathlib import Path
 import json
+import os
+import torch
+from app.jobs.file_placement import kernel_copy
 from app.utils.paths import JOBS_DIR
 
-def write_resume_state(job_id: str, epoch: int, checkpoint: str):
+RESUME_CHECKPOINT = "resume.pt"
+
+def write_resume_state(job_id: str, epoch: int, checkpoint: str, autotune: dict | None = None):
     p = JOBS_DIR / job_id / "resume.json"
-    p.write_text(json.dumps({
+    tmp = p.with_name(f".{p.name}.tmp")
+    tmp.write_text(json.dumps({
         "epoch": epoch,
         "checkpoint": checkpoint,
+        "autotune": autotune,
     }))
+    tmp.replace(p)
+
+def read_resume_state(job_id: str) -> dict | None:
+    p = JOBS_DIR / job_id / "resume.json"
+    if not p.exists():
+        return None
+    try:
+        state = json.loads(p.read_text())
+    except json.JSONDecodeError:
+        return None
+    if not Path(state["checkpoint"]).exists():
+        return None
+    return state
+
+def clear_resume_state(job_id: str):
+    state = read_resume_state(job_id)
+    if state:
+        Path(state["checkpoint"]).unlink(missing_ok=True)
+    (JOBS_DIR / job_id / "resume.json").unlink(missing_ok=True)
+
+def snapshot_checkpoint(last: Path) -> Path:
+    # ultralytics rewrites last.pt in place, so a crash mid-save can leave it
+    # truncated; resumes start from a copy that is replaced atomically
+    dst = last.with_name(RESUME_CHECKPOINT)
+    tmp = last.with_name(f".{RESUME_CHECKPOINT}.tmp")
+    tmp.unlink(missing_ok=True)
+    kernel_copy(last, tmp)
+    os.replace(tmp, dst)
+    return dst
+
+def adopt_checkpoint(src: Path, job_dir: Path, dataset_yaml: Path) -> Path:
+    # Continues another run's interrupted checkpoint in this job: the copy
+    # trains into this job's directory and dataset view
+    ckpt = torch.load(src, map_location="cpu", weights_only=False)
+    if ckpt.get("epoch", -1) < 0 or ckpt.get("optimizer") is None:
+        raise ValueError(f"Checkpoint {src.name} finished training, nothing to resume")
+    ckpt["train_args"].update(project=str(job_dir.parent), name=job_dir.name, data=str(dataset_yaml))
+    ckpt["train_args"].pop("save_dir", None)
+
+    dst = job_dir / RESUME_CHECKPOINT
+    torch.save(ckpt, dst)
+    return dst
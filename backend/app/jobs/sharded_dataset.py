@@ -0,0 +1,121 @@
+from pathlib import Path
+import math
+import cv2
+import numpy as np
+import yaml
+from ultralytics.data.dataset import YOLODataset
+from ultralytics.models.yolo.segment import SegmentationTrainer
+from ultralytics.utils import colorstr
+from ultralytics.utils.ops import segments2boxes
+from ultralytics.utils.torch_utils import unwrap_model
+from app.jobs.shards import ShardReader
+
+class ShardedYOLODataset(YOLODataset):
+    # img_path is a split file written by split_and_build_training_view: the
+    # shard directories plus (dataset, record) pairs. Labels are parsed from
+    # the shards up front and images are decoded straight from the mapped
+    # shards, so an epoch opens a handful of files instead of one per sample.
+    def get_img_files(self, img_path):
+        split = np.load(img_path)
+        self.readers = [ShardReader(Path(d)) for d in split["datasets"]]
+        self.records = split["records"]
+        if self.fraction < 1:
+            self.records = self.records[:round(len(self.records) * self.fraction)]
+        return [self.readers[d].image_name(r) for d, r in self.records]
+
+    def get_labels(self):
+        labels = []
+        for im_file, (d, r) in zip(self.im_files, self.records):
+            reader = self.readers[d]
+            rows = [line.split() for line in reader.label_text(r).splitlines() if line.strip()]
+            cls = np.array([row[0] for row in rows], dtype=np.float32).reshape(-1, 1)
+            segments = [np.array(row[1:], dtype=np.float32).reshape(-1, 2) for row in rows]
+            bboxes = segments2boxes(segments) if segments else np.zeros((0, 4), dtype=np.float32)
+            labels.append({
+                "im_file": im_file,
+                "shape": reader.image_shape(r),
+                "cls": cls,
+                "bboxes": bboxes.astype(np.float32),
+                "segments": segments,
+                "keypoints": None,
+                "normalized": True,
+                "bbox_format": "xywh",
+            })
+        return labels
+
+    def load_image(self, i, rect_mode=True):
+        # BaseDataset.load_image with the file read swapped for a shard decode
+        if self.ims[i] is not None:
+            return self.ims[i], self.im_hw0[i], self.im_hw[i]
+
+        d, r = self.records[i]
+        reader = self.readers[d]
+        h0, w0 = reader.image_shape(r)
+        im = reader.read_image(r, reduced_flag(self.cv2_flag, max(h0, w0) if rect_mode else min(h0, w0), self.imgsz))
+        if im is None:
+            raise FileNotFoundError(f"Image Not Found {self.im_files[i]}")
+
+        if rect_mode:
+            ratio = self.imgsz / max(h0, w0)
+            w, h = (min(math.ceil(w0 * ratio), self.imgsz), min(math.ceil(h0 * ratio), self.imgsz))
+            if im.shape[:2] != (h, w):
+                im = cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
+        elif im.shape[:2] != (self.imgsz, self.imgsz):
+            im = cv2.resize(im, (self.imgsz, self.imgsz), interpolation=cv2.INTER_LINEAR)
+        if im.ndim == 2:
+            im = im[..., None]
+
+        if self.augment:
+            self.ims[i], self.im_hw0[i], self.im_hw[i] = im, (h0, w0), im.shape[:2]
+            self.buffer.append(i)
+            if 1 < len(self.buffer) >= self.max_buffer_length:
+                j = self.buffer.pop(0)
+                if self.cache != "ram":
+                    self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
+
+        return im, (h0, w0), im.shape[:2]
+
+# libjpeg can decode at 1/2, 1/4 or 1/8 scale for a fraction of the cost of a
+# full decode followed by a downscale
+REDUCED_FLAGS = {
+    cv2.IMREAD_COLOR: {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8},
+    cv2.IMREAD_GRAYSCALE: {2: cv2.IMREAD_REDUCED_GRAYSCALE_2, 4: cv2.IMREAD_REDUCED_GRAYSCALE_4, 8: cv2.IMREAD_REDUCED_GRAYSCALE_8},
+}
+
+def reduced_flag(flags: int, side: int, imgsz: int) -> int:
+    # largest reduction that still leaves `side` at least imgsz, so the final
+    # resize only ever shrinks
+    for factor in (8, 4, 2):
+        if side >= factor * imgsz and flags in REDUCED_FLAGS:
+            return REDUCED_FLAGS[flags][factor]
+    return flags
+
+def build_sharded_dataset(cfg, img_path, batch, data, mode="train", rect=False, stride=32):
+    # counterpart of ultralytics' build_yolo_dataset for shard-backed views
+    return ShardedYOLODataset(
+        img_path=img_path,
+        imgsz=cfg.imgsz,
+        batch_size=batch,
+        augment=mode == "train",
+        hyp=cfg,
+        rect=cfg.rect or rect,
+        cache=cfg.cache or None,
+        single_cls=cfg.single_cls or False,
+        stride=stride,
+        pad=0.0 if mode == "train" else 0.5,
+        prefix=colorstr(f"{mode}: "),
+        task=cfg.task,
+        classes=cfg.classes,
+        data=data,
+        fraction=cfg.fraction if mode == "train" else 1.0,
+    )
+
+class ShardedSegmentationTrainer(SegmentationTrainer):
+    def build_dataset(self, img_path, mode="train", batch=None):
+        gs = max(int(unwrap_model(self.model).stride.max() if self.model else 0), 32)
+        return build_sharded_dataset(self.args, img_path, batch, self.data, mode=mode, rect=mode == "val", stride=gs)
+
+def trainer_for(data_yaml: Path):
+    # None lets ultralytics pick its default trainer for file-based views
+    data = yaml.safe_load(data_yaml.read_text())
+    return ShardedSegmentationTrainer if data.get("format") == "shards" else None
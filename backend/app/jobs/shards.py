@@ -0,0 +1,125 @@
+from pathlib import Path
+import io
+import mmap
+import shutil
+import cv2
+import numpy as np
+from PIL import Image
+
+# Training-ready dataset layout: images and YOLO label files packed back to back
+# into a few large shard files, plus an index with one record per frame.
+SHARDS_DIRNAME = "shards"
+SHARD_INDEX = "index.npy"
+SHARD_BYTES = 512 << 20
+
+INDEX_DTYPE = np.dtype([
+    ("frame", "<i4"),
+    ("shard", "<i2"),
+    ("image_offset", "<i8"),
+    ("image_size", "<i4"),
+    ("label_offset", "<i8"),
+    ("label_size", "<i4"),
+    ("height", "<i4"),
+    ("width", "<i4"),
+])
+
+def shard_name(shard: int) -> str:
+    return f"shard-{shard:05d}.bin"
+
+def has_shards(dataset_root: Path) -> bool:
+    return (dataset_root / SHARDS_DIRNAME / SHARD_INDEX).exists()
+
+def write_shards(images_dir: Path, labels_dir: Path, frames: list[int], out_dir: Path, shard_bytes: int = SHARD_BYTES) -> dict:
+    # Built in a temp dir and swapped in, so readers never see a partial set
+    tmp_dir = out_dir.with_name(f".{out_dir.name}.tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir(parents=True)
+
+    index = np.zeros(len(frames), dtype=INDEX_DTYPE)
+    n = 0
+    shard = -1
+    offset = 0
+    total_bytes = 0
+    f = None
+    try:
+        for frame_idx in frames:
+            img_path = images_dir / f"{frame_idx:05d}.jpg"
+            if not img_path.exists():
+                continue
+            image = img_path.read_bytes()
+            lbl_path = labels_dir / f"{frame_idx:05d}.txt"
+            label = lbl_path.read_bytes() if lbl_path.exists() else b""
+
+            if f is None or (offset and offset + len(image) + len(label) > shard_bytes):
+                if f is not None:
+                    f.close()
+                shard += 1
+                offset = 0
+                f = open(tmp_dir / shard_name(shard), "wb")
+
+            with Image.open(io.BytesIO(image)) as im:
+                width, height = im.size
+
+            index[n] = (frame_idx, shard, offset, len(image), offset + len(image), len(label), height, width)
+            f.write(image)
+            f.write(label)
+            offset += len(image) + len(label)
+            total_bytes += len(image) + len(label)
+            n += 1
+    finally:
+        if f is not None:
+            f.close()
+
+    np.save(tmp_dir / SHARD_INDEX, index[:n])
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    tmp_dir.rename(out_dir)
+
+    return {
+        "path": SHARDS_DIRNAME,
+        "shards": shard + 1,
+        "records": n,
+        "bytes": total_bytes,
+    }
+
+class ShardReader:
+    # Shards are memory-mapped on first use. Maps are dropped when pickled so
+    # readers can be handed to spawned dataloader workers.
+    def __init__(self, shards_dir: Path):
+        self.shards_dir = Path(shards_dir)
+        self.index = np.load(self.shards_dir / SHARD_INDEX)
+        self.maps = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["maps"] = {}
+        return state
+
+    def shard(self, shard: int) -> mmap.mmap:
+        if shard not in self.maps:
+            with open(self.shards_dir / shard_name(shard), "rb") as f:
+                self.maps[shard] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.maps[shard]
+
+    def image_name(self, i: int) -> str:
+        return str(self.shards_dir.parent / "images" / f"{int(self.index[i]['frame']):05d}.jpg")
+
+    def image_shape(self, i: int) -> tuple[int, int]:
+        rec = self.index[i]
+        return int(rec["height"]), int(rec["width"])
+
+    def image_bytes(self, i: int) -> np.ndarray:
+        rec = self.index[i]
+        return np.frombuffer(self.shard(int(rec["shard"])), dtype=np.uint8, count=int(rec["image_size"]), offset=int(rec["image_offset"]))
+
+    def read_image(self, i: int, flags: int = cv2.IMREAD_COLOR) -> np.ndarray | None:
+        return cv2.imdecode(self.image_bytes(i), flags)
+
+    def label_text(self, i: int) -> str:
+        rec = self.index[i]
+        start = int(rec["label_offset"])
+        return self.shard(int(rec["shard"]))[start:start + int(rec["label_size"])].decode()
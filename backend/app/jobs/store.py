@@ -38,6 +38,15 @@ def mark_job_running(job_id: str):
     job.updated_at = datetime.now()
     save_job(job)
 
+def mark_job_resumed(job_id: str, epoch: int):
+    job = load_job(job_id)
+    job.status = JobStatus.RESUMED
+    job.resume_count += 1
+    job.resumed_from_epoch = epoch
+    job.resumed_at = datetime.now()
+    job.updated_at = job.resumed_at
+    save_job(job)
+
 def mark_job_failed(job_id: str, error: str):
     job = load_job(job_id)
     job.status = JobStatus.FAILED
@@ -46,6 +55,13 @@ def mark_job_failed(job_id: str, error: str):
     job.updated_at = job.finished_at
     save_job(job)
 
+def mark_job_cancelled(job_id: str):
+    job = load_job(job_id)
+    job.status = JobStatus.CANCELLED
+    job.finished_at = datetime.now()
+    job.updated_at = job.finished_at
+    save_job(job)
+
 def mark_job_completed(job_id: str):
     job = load_job(job_id)
     job.status = JobStatus.COMPLETED
@@ -0,0 +1,215 @@
+from pathlib import Path
+import gc
+import multiprocessing as mp
+import os
+import shutil
+import time
+import psutil
+import torch
+from ultralytics.models.yolo.segment import SegmentationTrainer
+from ultralytics.utils import NUM_THREADS
+from app.jobs.sharded_dataset import trainer_for
+from app.models.finetune import TrainingConfig
+from app.utils.paths import TRAINING_VIEWS_DIR
+
+# Short trial run before training: dataloader settings (workers, image cache)
+# and compute settings (torch threads, batch size) are timed separately on a
+# small slice of the training set, then combined into the fastest pairing that
+# fits the host.
+TRIAL_IMAGES = 256
+TRIAL_BATCHES = 4
+TRIAL_STEPS = 2
+# cached images and training batches may use this share of memory
+MEMORY_FRACTION = 0.8
+
+def tuned_trainer(base: type | None, workers: int, threads: int) -> type:
+    # BaseTrainer forces workers=0 on CPU and select_device resets the torch
+    # thread count; the tuned values are applied again once it is set up.
+    class TunedTrainer(base or SegmentationTrainer):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.args.workers = workers
+            torch.set_num_threads(threads)
+    return TunedTrainer
+
+def candidate_settings(cfg: TrainingConfig, cores: int) -> dict:
+    # Celery's prefork children are daemonic and cannot start dataloader
+    # worker processes, so there only in-process loading is tried
+    daemonic = mp.current_process().daemon
+    return {
+        "workers": [0] if daemonic else sorted({0, *(w for w in (2, 4, 8) if w < cores)}),
+        # NUM_THREADS is what ultralytics would use untuned
+        "threads": sorted({1, max(1, cores // 2), NUM_THREADS, cores}),
+        "batch": sorted({max(1, cfg.batch_size // 2), cfg.batch_size, cfg.batch_size * 2}),
+    }
+
+def loader_rate(trainer, path: str, batch: int) -> float:
+    loader = trainer.get_dataloader(path, batch_size=batch, rank=-1, mode="train")
+
+    def cycle():
+        # each pass over the loader is one epoch, which a small set can finish
+        # within the trial
+        while True:
+            yield from loader
+
+    batches = cycle()
+    trainer.preprocess_batch(next(batches))  # worker start-up and first reads
+
+    images = 0
+    start = time.perf_counter()
+    for _ in range(TRIAL_BATCHES):
+        images += len(trainer.preprocess_batch(next(batches))["img"])
+    rate = images / (time.perf_counter() - start)
+
+    del batches, loader
+    gc.collect()
+    return rate
+
+def step_rate(model, batch: dict) -> tuple[float, int]:
+    # Returns images per second and the process RSS while the activations of
+    # a step are held, the high point of a training step at this batch size.
+    # The lifetime peak (ru_maxrss) would include earlier work of a long-lived
+    # worker process.
+    process = psutil.Process()
+    rss = 0
+
+    def step():
+        nonlocal rss
+        loss, _ = model(batch)
+        rss = max(rss, process.memory_info().rss)
+        loss.sum().backward()
+        model.zero_grad(set_to_none=True)
+
+    step()
+    start = time.perf_counter()
+    for _ in range(TRIAL_STEPS):
+        step()
+    return TRIAL_STEPS * len(batch["img"]) / (time.perf_counter() - start), rss
+
+def expected_rate(loader: float, compute: float, workers: int) -> float:
+    # worker processes overlap loading with the training step; in-process
+    # loading runs between steps
+    if workers:
+        return min(loader, compute)
+    return 1 / (1 / loader + 1 / compute)
+
+def tune_throughput(model_path: Path, data_yaml: Path, cfg: TrainingConfig, train_images: int, work_dir: Path) -> dict:
+    started = time.perf_counter()
+    cores = os.cpu_count() or 1
+    candidates = candidate_settings(cfg, cores)
+    memory = psutil.virtual_memory()
+    trainer_cls = trainer_for(data_yaml)
+    sharded = trainer_cls is not None
+
+    trainer = (trainer_cls or SegmentationTrainer)(overrides={
+        "model": str(model_path),
+        "data": str(data_yaml),
+        "imgsz": cfg.img_size,
+        "batch": cfg.batch_size,
+        "device": "cpu",
+        "fraction": min(1.0, TRIAL_IMAGES / max(train_images, 1)),
+        "project": str(work_dir),
+        "name": "autotune",
+        "exist_ok": True,
+        "plots": False,
+        "verbose": False,
+    })
+    trainer.setup_model()
+    trainer.model = trainer.model.to(trainer.device).train()
+    trainer.set_model_attributes()
+    for p in trainer.model.parameters():
+        p.requires_grad = True
+    path = trainer.data["train"]
+
+    trials = {"loader": [], "compute": []}
+
+    # Image caching is only a candidate when the full training set would fit:
+    # ultralytics keeps resized frames in RAM, or full-size ones as .npy files
+    # next to the images. Cached training views are shared between jobs and
+    # content-addressed, so .npy files are only written into a job's own view
+    # (and never for shard-backed views).
+    trainer.args.workers = 0
+    trainer.args.cache = False
+    sample = trainer.build_dataset(path, mode="train", batch=cfg.batch_size)
+    image_bytes = sample.load_image(0)[0].nbytes
+    shared_view = data_yaml.resolve().is_relative_to(TRAINING_VIEWS_DIR.resolve())
+    npy_files = [] if sharded or shared_view else sample.npy_files
+    del sample
+    caches = [None]
+    if image_bytes * train_images * 1.5 < memory.available * MEMORY_FRACTION:
+        caches.append("ram")
+    if not sharded and not shared_view:
+        caches.append("disk")
+
+    for cache in caches:
+        for workers in candidates["workers"]:
+            trainer.args.workers = workers
+            trainer.args.cache = cache or False
+            try:
+                rate = loader_rate(trainer, path, cfg.batch_size)
+            except Exception as e:
+                print(f"Warning: loader trial with {workers} workers and cache {cache} failed: {e}")
+                continue
+            trials["loader"].append({"workers": workers, "cache": cache, "images_per_second": rate})
+    # the real run rebuilds the disk cache for the whole set if it is chosen
+    for f in npy_files:
+        f.unlink(missing_ok=True)
+    if not trials["loader"]:
+        raise RuntimeError("No dataloader setting could load the training set")
+
+    trainer.args.workers = 0
+    trainer.args.cache = False
+    for batch_size in candidates["batch"]:
+        loader = trainer.get_dataloader(path, batch_size=batch_size, rank=-1, mode="train")
+        batch = trainer.preprocess_batch(next(iter(loader)))
+        del loader
+        rss = 0
+        try:
+            for threads in candidates["threads"]:
+                torch.set_num_threads(threads)
+                rate, step_rss = step_rate(trainer.model, batch)
+                rss = max(rss, step_rss)
+                trials["compute"].append({"threads": threads, "batch": batch_size, "images_per_second": rate})
+        except (MemoryError, RuntimeError) as e:
+            print(f"Warning: batch {batch_size} failed during tuning: {e}")
+            break
+        # larger batches only grow from here
+        if rss > memory.total * MEMORY_FRACTION:
+            trials["compute"] = [t for t in trials["compute"] if t["batch"] != batch_size]
+            break
+
+    torch.set_num_threads(NUM_THREADS)
+    del trainer
+    gc.collect()
+    shutil.rmtree(work_dir / "autotune", ignore_errors=True)
+
+    if not trials["compute"]:
+        raise RuntimeError("No batch size fits in memory")
+
+    options = [
+        (expected_rate(l["images_per_second"], c["images_per_second"], l["workers"]), l, c)
+        for l in trials["loader"]
+        for c in trials["compute"]
+        # worker processes and torch threads share the cores
+        if l["workers"] == 0 or l["workers"] + c["threads"] <= cores
+    ]
+    rate, l, c = max(options, key=lambda o: o[0])
+
+    default = [
+        expected_rate(dl["images_per_second"], dc["images_per_second"], 0)
+        for dl in trials["loader"] if dl["workers"] == 0 and dl["cache"] is None
+        for dc in trials["compute"] if dc["batch"] == cfg.batch_size and dc["threads"] == NUM_THREADS
+    ]
+
+    return {
+        "settings": {
+            "workers": l["workers"],
+            "cache": l["cache"],
+            "threads": c["threads"],
+            "batch": c["batch"],
+        },
+        "images_per_second": rate,
+        "default_images_per_second": default[0] if default else None,
+        "trials": trials,
+        "duration_seconds": time.perf_counter() - started,
+    }
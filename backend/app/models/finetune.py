@@ -23,6 +23,12 @@ class DatasetConfig(BaseModel):
     keep_empty_frames: bool = True
     empty_frame_keep_ratio: float = 0.8
     dataset_weights: dict[str, float] = {}
+    drop_near_duplicates: bool = False
+    near_duplicate_threshold: int = 4
+    # how training views materialise files; see app/jobs/file_placement.py
+    placement: Literal["symlink", "hardlink", "reflink", "copy", "auto"] = "symlink"
+    # train on frames pre-resized to img_size instead of decoding full-size ones
+    resize_images: bool = False
 
 class ModelInitConfig(BaseModel):
     resume: bool = False
@@ -31,12 +37,23 @@ class ModelInitConfig(BaseModel):
 
 class TuningConfig(BaseModel):
     enabled: bool = False
-    use_ray: bool = False
+    # dispatch trials as Celery tasks to workers consuming the trial queue
+    # instead of running them as local processes
+    celery_trials: bool = False
     iterations: int = 5
+    trial_epochs: int = 10
+    # defaults to half the cores, each trial getting an equal share of threads
+    max_concurrent_trials: int | None = None
+    # trials still running when it runs out are stopped, unstarted ones skipped
+    time_budget_minutes: float | None = None
 
 class ExportConfig(BaseModel):
     export_onnx: bool = True
     onnx_batch_size: int = 4
+    # INT8 variant of the ONNX export, calibrated on this many training images
+    # (at most 300) and scored against it on the validation split
+    quantize_int8: bool = False
+    calibration_images: int = 64
 
 class TrainingConfig(BaseModel):
     epochs: int = 100
@@ -46,6 +63,9 @@ class TrainingConfig(BaseModel):
     batch_size: int = 16
     learning_rate: float = 0.01
     patience: int = 50
+    # time dataloader workers, image caching, threads and batch size on a
+    # short trial and train with the fastest combination
+    auto_tune: bool = False
 
     dataset: DatasetConfig = DatasetConfig()
     augmentations: AugmentationConfig = AugmentationConfig()
@@ -6,6 +6,7 @@ from datetime import datetime
 class JobStatus(str, Enum):
     QUEUED = "queued"
     RUNNING = "running"
+    RESUMED = "resumed"
     COMPLETED = "completed"
     FAILED = "failed"
     CANCELLED = "cancelled"
@@ -25,4 +26,8 @@ class Job(BaseModel):
     started_at: Optional[datetime] = None
     finished_at: Optional[datetime] = None
 
+    resume_count: int = 0
+    resumed_from_epoch: Optional[int] = None
+    resumed_at: Optional[datetime] = None
+
     error: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+
+class EvaluateCheckpointsRequest(BaseModel):
+    # defaults to every checkpoint the model lists
+    checkpoints: list[str] | None = None
+    # defaults to the validation split the model was fine-tuned with
+    dataset_ids: list[str] | None = None
+    train_percentage: float = Field(0.8, gt=0, lt=1)
+    seed: int = 42
+    # defaults to the fine-tune's image size, else 640
+    img_size: int | None = Field(None, ge=32)
@@ -1,9 +1,20 @@
 from pydantic import BaseModel, Field
+from typing import Literal
 
 class SaveSegmentationsYOLORequest(BaseModel):
     folder: str
     min_area: int = 10
     simplify: bool = True
+    force: bool = False
+    shards: bool = False
+
+class SaveOverlayVideoRequest(BaseModel):
+    folder: str
+    format: Literal["mp4", "mjpeg"] = "mp4"
+    fps: float = 30.0
+    scale: float = Field(1.0, gt=0, le=1)
+    quality: int = Field(85, ge=1, le=100)
+    show_class: bool = True
 
 class SaveSegmentationsPNGRequest(BaseModel):
     folder: str
@@ -42,4 +53,6 @@ class SegmentationsYOLOMetadata(BaseModel):
     counts: YOLOCounts
     objects: list[YOLOObjectStats]
     classes: list[YOLOClassStats]
-    export_config: YOLOExportConfig
\ No newline at end of file
+    export_config: YOLOExportConfig | None = None
+    # per-format stats written by the COCO-RLE and PNG exporters
+    exports: dict[str, dict] = {}
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Literal
 
 class LoadModelRequest(BaseModel):
     folder: str
@@ -23,6 +24,17 @@ class SegmentRequest(BaseModel):
 class PropagateRequest(BaseModel):
     folder: str
     total_frames: int
+    mode: Literal["full", "chunked", "preview"] = "full"
+    chunk_size: int = 200
+    chunk_overlap: int = 16
+    preview_stride: int = 4
+
+class RefineRequest(BaseModel):
+    folder: str
+    start_frame: int
+    end_frame: int
+    chunk_size: int = 200
+    chunk_overlap: int = 16
 
 class GetFrameRequest(BaseModel):
     folder: str
@@ -33,4 +45,15 @@ class ResetMaskRequest(BaseModel):
     folder: str
     frame_idx: int
 class ResetMasksFolderRequest(BaseModel):
-    folder: str
\ No newline at end of file
+    folder: str
+
+class AutoLabelRequest(BaseModel):
+    folder: str
+    model_id: str
+    checkpoint: str = "best"
+    conf: float = Field(0.25, ge=0, le=1)
+    iou: float = Field(0.7, ge=0, le=1)
+    # defaults to the batch an ONNX model was exported with, else 8
+    batch_size: int | None = Field(None, ge=1)
+    # frames that already have masks are skipped unless this is set
+    overwrite: bool = False
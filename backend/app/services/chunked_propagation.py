@@ -0,0 +1,166 @@
+import asyncio
+import threading
+from app.services.mask_store import MASK_STORE
+from app.services.sam2_pool import get_all_schedulers
+from app.services.sam2_scheduler import BULK
+
+def plan_chunks(num_frames: int, chunk_size: int, overlap: int) -> list[tuple[int, int]]:
+    step = max(1, chunk_size - overlap)
+    chunks = []
+    start = 0
+    while True:
+        end = min(start + chunk_size, num_frames)
+        chunks.append((start, end))
+        if end >= num_frames:
+            break
+        start += step
+    return chunks
+
+def pick_seeds(folder: str, frame_indices: list[int], obj_ids: set[int]) -> dict:
+    # For every object, the best mask inside the chunk: prompted frames first,
+    # then whichever frame is closest to the middle of the chunk.
+    if folder not in MASK_STORE.store or not frame_indices:
+        return {}
+
+    center = (frame_indices[0] + frame_indices[-1]) / 2
+    in_chunk = set(frame_indices)
+    best = {}
+
+    for frame_idx, objs in list(MASK_STORE.store[folder].items()):
+        if frame_idx not in in_chunk:
+            continue
+        for obj_id, mask in list(objs.items()):
+            if obj_id not in obj_ids or mask is None or not mask.any():
+                continue
+            rank = (not MASK_STORE.is_prompted(folder, frame_idx, obj_id), abs(frame_idx - center))
+            if obj_id not in best or rank < best[obj_id][0]:
+                best[obj_id] = (rank, frame_idx, mask)
+
+    return {obj_id: (frame_idx, mask) for obj_id, (_, frame_idx, mask) in best.items()}
+
+class ChunkReconciler:
+    # Frames covered by more than one chunk keep the mask from the chunk whose
+    # seed was closest to them. Prompted masks are never overwritten, and
+    # preview runs never replace full-quality masks.
+    def __init__(self, folder: str, preview: bool = False, fill: dict[int, list[int]] | None = None):
+        self.folder = folder
+        self.preview = preview
+        # sampled frame -> skipped frames that show its preview mask
+        self.fill = fill or {}
+        self.distances = {}
+        self.lock = threading.Lock()
+        self.frames_written = set()
+
+    def write(self, frame_idx: int, obj_id: int, mask, seed_idx: int):
+        for target in [frame_idx, *self.fill.get(frame_idx, ())]:
+            self._write(target, obj_id, mask, abs(target - seed_idx))
+
+    def _write(self, frame_idx: int, obj_id: int, mask, distance: int):
+        if MASK_STORE.is_prompted(self.folder, frame_idx, obj_id):
+            return
+        if self.preview and not MASK_STORE.is_preview(self.folder, frame_idx, obj_id):
+            if MASK_STORE.store[self.folder][frame_idx].get(obj_id) is not None:
+                return
+        with self.lock:
+            if distance > self.distances.get((frame_idx, obj_id), float("inf")):
+                return
+            self.distances[(frame_idx, obj_id)] = distance
+            self.frames_written.add(frame_idx)
+        MASK_STORE.save_mask(self.folder, frame_idx, obj_id, mask, preview=self.preview)
+
+def sample_frames(folder: str, num_frames: int, stride: int) -> list[int]:
+    # Every stride-th frame plus every prompted frame, so all prompts can seed
+    prompted = {f for f, objs in MASK_STORE.prompted[folder].items() if objs}
+    return sorted(set(range(0, num_frames, stride)) | prompted)
+
+def fill_map(sampled: list[int], num_frames: int) -> dict[int, list[int]]:
+    fill = {f: [] for f in sampled}
+    j = 0
+    for frame_idx in range(num_frames):
+        while j + 1 < len(sampled) and abs(sampled[j + 1] - frame_idx) <= abs(sampled[j] - frame_idx):
+            j += 1
+        if sampled[j] != frame_idx:
+            fill[sampled[j]].append(frame_idx)
+    return fill
+
+def _chunk_task(folder_path: str, frame_indices: list[int], seeds: dict, reconciler: ChunkReconciler):
+    def task(engine):
+        for frame_idx, obj_ids, masks in engine.propagate_chunk(folder_path, frame_indices, seeds):
+            for obj_id, mask in zip(obj_ids, masks):
+                reconciler.write(frame_idx, obj_id, mask, seeds[obj_id][0])
+            yield frame_idx
+    return task
+
+async def propagate_chunked(
+    folder: str,
+    folder_path: str,
+    frame_indices: list[int],
+    chunk_size: int,
+    overlap: int,
+    reconciler: ChunkReconciler | None = None,
+) -> dict:
+    # Ready chunks are spread over the SAM2 worker lanes. With the default
+    # SAM2_WORKERS=0 there is a single lane and the chunks of a round run
+    # back to back; set SAM2_WORKERS > 1 to propagate them concurrently.
+    schedulers = get_all_schedulers()
+    reconciler = reconciler or ChunkReconciler(folder)
+    obj_ids = set(MASK_STORE.get_global_object_ids(folder))
+
+    # chunk (positions in frame_indices) -> objects that still have to be propagated through it
+    chunks = plan_chunks(len(frame_indices), chunk_size, overlap)
+    pending = {chunk: set(obj_ids) for chunk in chunks}
+    rounds = 0
+
+    # Chunks without a seed wait for a neighbour to propagate into their overlap.
+    while pending:
+        ready = []
+        for (start, end), remaining in pending.items():
+            chunk_frames = frame_indices[start:end]
+            seeds = pick_seeds(folder, chunk_frames, remaining)
+            if seeds:
+                ready.append(((start, end), chunk_frames, seeds))
+
+        if not ready:
+            break
+
+        await asyncio.gather(*[
+            schedulers[i % len(schedulers)].run(
+                folder,
+                _chunk_task(folder_path, chunk_frames, seeds, reconciler),
+                priority=BULK,
+            )
+            for i, (_, chunk_frames, seeds) in enumerate(ready)
+        ])
+
+        for chunk, _, seeds in ready:
+            pending[chunk] -= seeds.keys()
+            if not pending[chunk]:
+                del pending[chunk]
+        rounds += 1
+
+    return {
+        "chunks_total": len(chunks),
+        "chunks_unseeded": len(pending),
+        "rounds": rounds,
+        "parallel_lanes": len(schedulers),
+        "frames_updated": len(reconciler.frames_written),
+    }
+
+async def propagate_preview(folder: str, folder_path: str, num_frames: int, stride: int, chunk_size: int, overlap: int) -> dict:
+    sampled = sample_frames(folder, num_frames, stride)
+    reconciler = ChunkReconciler(folder, preview=True, fill=fill_map(sampled, num_frames))
+    stats = await propagate_chunked(folder, folder_path, sampled, chunk_size, overlap, reconciler)
+    return {
+        **stats,
+        "frames_sampled": len(sampled),
+        "previews_pending": MASK_STORE.count_previews(folder),
+    }
+
+async def refine_span(folder: str, folder_path: str, start_frame: int, end_frame: int, chunk_size: int, overlap: int) -> dict:
+    # Full-quality propagation over an accepted span, seeded from prompts or,
+    # failing those, from the previews themselves.
+    stats = await propagate_chunked(folder, folder_path, list(range(start_frame, end_frame + 1)), chunk_size, overlap)
+    return {
+        **stats,
+        "previews_pending": MASK_STORE.count_previews(folder),
+    }
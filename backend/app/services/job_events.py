@@ -0,0 +1,59 @@
+from collections import defaultdict
+from typing import AsyncIterator
+import asyncio
+import json
+import threading
+
+TERMINAL_STATUSES = {"completed", "failed"}
+
+class JobEvents:
+    # In-process broadcaster for jobs that run on executor threads. Each stream
+    # subscribes an asyncio.Queue on its own loop; publish may be called from
+    # any thread and hands snapshots over with call_soon_threadsafe.
+    def __init__(self):
+        self.subscribers = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        with self.lock:
+            self.subscribers[job_id].append((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue):
+        with self.lock:
+            subs = [s for s in self.subscribers.get(job_id, []) if s[1] is not queue]
+            if subs:
+                self.subscribers[job_id] = subs
+            else:
+                self.subscribers.pop(job_id, None)
+
+    def publish(self, job_id: str, data: dict):
+        snapshot = dict(data)
+        with self.lock:
+            subs = list(self.subscribers.get(job_id, []))
+        for loop, queue in subs:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, snapshot)
+            except RuntimeError:
+                # subscriber's loop already closed
+                self.unsubscribe(job_id, queue)
+
+JOB_EVENTS = JobEvents()
+
+async def stream_job(jobs: dict, job_id: str) -> AsyncIterator[str]:
+    # Subscribe before reading the current state so no update is missed, then
+    # forward events until the job reaches a terminal status.
+    queue = JOB_EVENTS.subscribe(job_id)
+    try:
+        job = dict(jobs[job_id])
+        while True:
+            yield f"data: {json.dumps(job)}\n\n"
+            if job["status"] in TERMINAL_STATUSES:
+                break
+            job = await queue.get()
+            # drop intermediate progress if the client fell behind
+            while not queue.empty() and job["status"] not in TERMINAL_STATUSES:
+                job = queue.get_nowait()
+    finally:
+        JOB_EVENTS.unsubscribe(job_id, queue)
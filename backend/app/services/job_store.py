@@ -1,3 +1,12 @@
 from typing import Dict
+from app.services.job_events import JOB_EVENTS
 
-YOLO_JOBS: Dict[str, dict] = {}
\ No newline at end of file
+YOLO_JOBS: Dict[str, dict] = {}
+EXPORT_JOBS: Dict[str, dict] = {}
+AUTO_LABEL_JOBS: Dict[str, dict] = {}
+EVALUATION_JOBS: Dict[str, dict] = {}
+
+def update_job(jobs: Dict[str, dict], job_id: str, **fields):
+    job = jobs[job_id]
+    job.update(fields)
+    JOB_EVENTS.publish(job_id, job)
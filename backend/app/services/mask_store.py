@@ -1,18 +1,67 @@
 from collections import defaultdict
+from uuid import uuid4
+import itertools
 
 class MaskStore:
     def __init__(self):
+        # versions only mean something within one server run
+        self.session_id = uuid4().hex
         # MASK_STORE[folder][frame_idx][obj_id] = mask
         self.store = defaultdict(lambda: defaultdict(lambda: defaultdict(lambda: None)))
         self.objects = defaultdict(dict)
+        # frames where the user prompted an object directly, folder -> frame_idx -> {obj_id}
+        self.prompted = defaultdict(lambda: defaultdict(set))
+        # low-quality preview masks still waiting for refinement, folder -> {(frame_idx, obj_id)}
+        self.previews = defaultdict(set)
+        # folder -> frame_idx -> version, bumped from one global clock on every change
+        self.versions = defaultdict(dict)
+        # frames changed since the last export, folder -> {frame_idx}
+        self.dirty = defaultdict(set)
+        self._clock = itertools.count(1)
 
-    def save_mask(self, folder, frame_idx, obj_id, mask):
+    def _touch(self, folder, frame_idx):
+        self.versions[folder][frame_idx] = next(self._clock)
+        self.dirty[folder].add(frame_idx)
+
+    def get_version(self, folder, frame_idx):
+        return self.versions[folder].get(frame_idx, 0)
+
+    def get_dirty_frames(self, folder):
+        return set(self.dirty[folder])
+
+    def mark_clean(self, folder, versions):
+        # Only frames that did not change again while they were being exported
+        for frame_idx, version in versions.items():
+            if self.versions[folder].get(frame_idx) == version:
+                self.dirty[folder].discard(frame_idx)
+
+    def save_mask(self, folder, frame_idx, obj_id, mask, preview=False):
         self.store[folder][frame_idx][obj_id] = mask
+        self._touch(folder, frame_idx)
+        if preview:
+            self.previews[folder].add((frame_idx, obj_id))
+        else:
+            self.previews[folder].discard((frame_idx, obj_id))
+
+    def is_preview(self, folder, frame_idx, obj_id):
+        return (frame_idx, obj_id) in self.previews[folder]
+
+    def count_previews(self, folder):
+        return len(self.previews[folder])
 
     def get_masks(self, folder, frame_idx):
         return self.store[folder][frame_idx]
 
+    def mark_prompted(self, folder, frame_idx, obj_id):
+        self.prompted[folder][frame_idx].add(obj_id)
+
+    def is_prompted(self, folder, frame_idx, obj_id):
+        return obj_id in self.prompted[folder].get(frame_idx, ())
+
     def delete_masks(self, folder, frame_idx):
+        self.prompted[folder].pop(frame_idx, None)
+        self._drop_previews(folder, lambda f, _: f == frame_idx)
+        self._touch(folder, frame_idx)
         if frame_idx in self.store[folder]:
             del self.store[folder][frame_idx]
             return True
@@ -23,9 +72,19 @@ class MaskStore:
             del self.store[folder]
         if folder in self.objects:
             self.objects.pop(folder, None)
+        self.prompted.pop(folder, None)
+        self.previews.pop(folder, None)
+        self.versions.pop(folder, None)
+        self.dirty.pop(folder, None)
 
     def clear_frame(self, folder, frame_idx):
         self.store[folder][frame_idx].clear()
+        self._touch(folder, frame_idx)
+        self.prompted[folder].pop(frame_idx, None)
+        self._drop_previews(folder, lambda f, _: f == frame_idx)
+
+    def _drop_previews(self, folder, predicate):
+        self.previews[folder] = {k for k in self.previews[folder] if not predicate(*k)}
 
     def create_obj_id(self, folder, obj_id, class_id):
         self.objects[folder][obj_id] = {
@@ -34,6 +93,9 @@ class MaskStore:
 
     def delete_obj_id(self, folder, obj_id):
         self.objects[folder].pop(obj_id, None)
+        for obj_ids in self.prompted[folder].values():
+            obj_ids.discard(obj_id)
+        self._drop_previews(folder, lambda _, o: o == obj_id)
 
     def get_obj_metadata(self, folder, obj_id):
         return self.objects[folder].get(obj_id)
@@ -2,6 +2,7 @@ from pathlib import Path
 import json
 from typing import Dict, List
 from ultralytics import YOLO
+from app.jobs.artifacts import load_artifacts
 from app.utils.paths import ML_MODELS_DIR
 
 class ModelService:
@@ -38,6 +39,7 @@ class ModelService:
                 "id": "best",
                 "label": "Best (pretrained)",
                 "path": model["path"],
+                "format": "pytorch",
                 "recommended": True,
             }]
 
@@ -53,6 +55,7 @@ class ModelService:
             "label": f"Best (epoch {best_epoch})" if best_epoch else "Best",
             "path": str(weights_dir / "best.pt"),
             "epoch": best_epoch,
+            "format": "pytorch",
             "recommended": True,
         })
 
@@ -61,6 +64,7 @@ class ModelService:
                 "id": "last",
                 "label": "Last",
                 "path": str(weights_dir / "last.pt"),
+                "format": "pytorch",
             })
 
         for p in sorted(weights_dir.glob("epoch*.pt"), reverse=True):
@@ -70,8 +74,32 @@ class ModelService:
                 "label": f"Epoch {epoch}",
                 "path": str(p),
                 "epoch": epoch,
+                "format": "pytorch",
             })
 
+        # exports of the best weights, indexed by the fine-tune job that
+        # trained into run_dir
+        quantization = meta.get("quantization") or {}
+        for a in load_artifacts(run_dir.name):
+            if a["kind"] not in ("onnx", "onnx_int8") or not Path(a["path"]).exists():
+                continue
+            precision = "int8" if a["kind"] == "onnx_int8" else "fp32"
+            details = [f"epoch {best_epoch}"] if best_epoch else []
+            details.append("ONNX INT8" if precision == "int8" else "ONNX")
+            checkpoint = {
+                "id": f"{Path(a['name']).stem.replace('.', '-')}-onnx",
+                "path": a["path"],
+                "epoch": best_epoch,
+                "format": "onnx",
+                "precision": precision,
+            }
+            # change in validation mask mAP50-95 against the FP32 export
+            if precision == "int8" and "delta" in quantization:
+                checkpoint["accuracy_delta"] = quantization["delta"]["mask_map"]
+                details.append(f"mask mAP {checkpoint['accuracy_delta']:+.3f}")
+            checkpoint["label"] = f"Best ({', '.join(details)})"
+            checkpoints.append(checkpoint)
+
         return checkpoints
     
     def resolve_checkpoint(self, model_id: str, checkpoint_id: str) -> Path:
@@ -0,0 +1,16 @@
+import os
+
+# "torch" runs the SAM2 video predictor, "onnx" runs click decoding on ONNX Runtime
+SAM2_BACKEND = os.environ.get("SAM2_BACKEND", "torch")
+
+def get_engine(num_threads: int | None = None):
+    # Imported lazily so the ONNX backend never pulls in torch
+    if SAM2_BACKEND == "onnx":
+        from app.services.sam2_onnx_engine import SAM2OnnxEngine
+        return SAM2OnnxEngine.get_instance(num_threads=num_threads)
+
+    import torch
+    from app.services.sam2_engine import SAM2Engine
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    return SAM2Engine.get_instance()
@@ -1,9 +1,17 @@
 from pathlib import Path
+import contextlib
+import os
+import shutil
+import tempfile
+import numpy as np
 import torch
 import threading
 from app.utils.paths import ML_MODELS_DIR
+from app.utils.validation import list_frame_files
 
 SAM2_CHECKPOINTS_DIR = ML_MODELS_DIR / "checkpoints"
+SAM2_MODEL_CFG = "configs/sam2.1/sam2.1_hiera_l"
+SAM2_CHECKPOINT = SAM2_CHECKPOINTS_DIR / "sam2.1_hiera_large.pt"
 
 class SAM2Engine:
     _instance = None
@@ -52,17 +60,82 @@ class SAM2Engine:
         if folder_path in self.states:
             del self.states[folder_path]
 
+    def autocast(self):
+        if self.device.type == "cuda":
+            return torch.autocast("cuda", dtype=torch.bfloat16)
+        return contextlib.nullcontext()
+
+    def add_click(self, folder_path: str, frame_idx: int, obj_id: int, points: np.ndarray, labels: np.ndarray):
+        state = self.load_video_once(folder_path)
+
+        _, out_obj_ids, out_logits = self.predictor.add_new_points_or_box(
+            inference_state=state,
+            frame_idx=frame_idx,
+            obj_id=obj_id,
+            points=points,
+            labels=labels,
+        )
+
+        return [int(o) for o in out_obj_ids], logits_to_masks(out_logits)
+
+    def propagate(self, folder_path: str):
+        state = self.load_video_once(folder_path)
+
+        for out_frame_idx, out_obj_ids, out_logits in self.predictor.propagate_in_video(state):
+            yield out_frame_idx, [int(o) for o in out_obj_ids], logits_to_masks(out_logits)
+
+        self.predictor.reset_state(state)
+
+    def propagate_chunk(self, folder_path: str, frame_indices: list[int], seeds: dict):
+        # Propagates a throwaway session over a subset of frames, seeded with one
+        # mask per object: seeds = {obj_id: (frame_idx, mask)}
+        self.load()
+
+        frame_files = list_frame_files(Path(folder_path))
+        local = {frame_idx: i for i, frame_idx in enumerate(frame_indices)}
+
+        chunk_dir = Path(tempfile.mkdtemp(prefix="sam2_chunk_"))
+        try:
+            for frame_idx, i in local.items():
+                os.symlink(frame_files[frame_idx], chunk_dir / f"{i:05d}.jpg")
+
+            state = self.predictor.init_state(video_path=str(chunk_dir))
+
+            for obj_id, (frame_idx, mask) in seeds.items():
+                self.predictor.add_new_mask(
+                    inference_state=state,
+                    frame_idx=local[frame_idx],
+                    obj_id=obj_id,
+                    mask=mask > 0,
+                )
+
+            first_seed = min(local[frame_idx] for frame_idx, _ in seeds.values())
+            for reverse in [False, True] if first_seed > 0 else [False]:
+                for out_frame_idx, out_obj_ids, out_logits in self.predictor.propagate_in_video(state, reverse=reverse):
+                    yield frame_indices[out_frame_idx], [int(o) for o in out_obj_ids], logits_to_masks(out_logits)
+
+            self.predictor.reset_state(state)
+        finally:
+            shutil.rmtree(chunk_dir, ignore_errors=True)
+
     @classmethod
     def get_instance(cls):
         if cls._instance is None:
             with cls._lock:
                 if cls._instance is None:
                     cls._instance = SAM2Engine(
-                        model_cfg=str("configs/sam2.1/sam2.1_hiera_l"),
-                        checkpoint_path=str(SAM2_CHECKPOINTS_DIR / "sam2.1_hiera_large.pt"),
+                        model_cfg=SAM2_MODEL_CFG,
+                        checkpoint_path=str(SAM2_CHECKPOINT),
                     )
         return cls._instance
 
+def logits_to_masks(out_logits) -> list[np.ndarray]:
+    masks = []
+    for logits in out_logits:
+        prob = torch.sigmoid(logits)
+        masks.append((prob > 0.5).int().squeeze().cpu().numpy().astype(np.uint8))
+    return masks
+
 # usage
 # engine = SAM2Engine.get_instance()
 # engine.load()  
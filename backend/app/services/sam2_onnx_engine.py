@@ -0,0 +1,168 @@
+from collections import OrderedDict
+from pathlib import Path
+import contextlib
+import threading
+import cv2
+import numpy as np
+from app.utils.paths import ML_MODELS_DIR
+from app.utils.validation import list_frame_files
+
+SAM2_ONNX_DIR = ML_MODELS_DIR / "sam2_onnx"
+SAM2_ONNX_ENCODER = SAM2_ONNX_DIR / "sam2.1_hiera_large.encoder.onnx"
+SAM2_ONNX_DECODER = SAM2_ONNX_DIR / "sam2.1_hiera_large.decoder.onnx"
+
+IMAGE_SIZE = 1024
+PIXEL_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+PIXEL_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+class SAM2OnnxEngine:
+    # Click-only SAM2 backend: image encoder and prompt/mask decoder exported by
+    # scripts/export_sam2_onnx.py and run on ONNX Runtime. Frame embeddings are
+    # cached so repeated clicks on a frame only pay for the decoder.
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, encoder_path: Path, decoder_path: Path, num_threads: int | None = None, cache_size: int = 8):
+        self.encoder_path = encoder_path
+        self.decoder_path = decoder_path
+        self.num_threads = num_threads
+        self.cache_size = cache_size
+        self.encoder = None
+        self.decoder = None
+        self.loaded = False
+        self.frames = {}
+        self.embeddings = OrderedDict()
+
+    def load(self):
+        if self.loaded:
+            return
+
+        with SAM2OnnxEngine._lock:
+            if not self.loaded:
+                import onnxruntime as ort
+
+                for p in (self.encoder_path, self.decoder_path):
+                    if not p.exists():
+                        raise FileNotFoundError(f"{p} not found, run scripts/export_sam2_onnx.py first")
+
+                opts = ort.SessionOptions()
+                opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                if self.num_threads:
+                    opts.intra_op_num_threads = self.num_threads
+
+                providers = ["CPUExecutionProvider"]
+                self.encoder = ort.InferenceSession(str(self.encoder_path), opts, providers=providers)
+                self.decoder = ort.InferenceSession(str(self.decoder_path), opts, providers=providers)
+                self.loaded = True
+
+    def load_video_once(self, folder_path: str):
+        self.load()
+
+        if folder_path not in self.frames:
+            self.frames[folder_path] = list_frame_files(Path(folder_path))
+        return self.frames[folder_path]
+
+    def reset_video(self, folder_path: str):
+        self.frames.pop(folder_path, None)
+        for key in [k for k in self.embeddings if k[0] == folder_path]:
+            del self.embeddings[key]
+
+    def autocast(self):
+        return contextlib.nullcontext()
+
+    def encode_image(self, image: np.ndarray) -> dict:
+        h, w = image.shape[:2]
+        image_embed, high_res_feats_0, high_res_feats_1 = self.encoder.run(None, {"image": preprocess_image(image)})
+        return {
+            "image_embed": image_embed,
+            "high_res_feats_0": high_res_feats_0,
+            "high_res_feats_1": high_res_feats_1,
+            "size": (h, w),
+        }
+
+    def encode_frame(self, folder_path: str, frame_idx: int) -> dict:
+        key = (folder_path, frame_idx)
+        if key in self.embeddings:
+            self.embeddings.move_to_end(key)
+            return self.embeddings[key]
+
+        frames = self.load_video_once(folder_path)
+        image = cv2.imread(str(frames[frame_idx]))
+        if image is None:
+            raise RuntimeError(f"Failed to load frame {frames[frame_idx]}")
+
+        features = self.encode_image(image)
+        self.embeddings[key] = features
+        while len(self.embeddings) > self.cache_size:
+            self.embeddings.popitem(last=False)
+        return features
+
+    def predict(self, features: dict, points: np.ndarray, labels: np.ndarray) -> np.ndarray:
+        h, w = features["size"]
+        coords = points.astype(np.float32) / np.array([w, h], dtype=np.float32) * IMAGE_SIZE
+
+        low_res_masks, _ = self.decoder.run(None, {
+            "point_coords": coords[None],
+            "point_labels": labels.astype(np.float32)[None],
+            "image_embed": features["image_embed"],
+            "high_res_feats_0": features["high_res_feats_0"],
+            "high_res_feats_1": features["high_res_feats_1"],
+        })
+
+        logits = cv2.resize(low_res_masks[0, 0], (w, h), interpolation=cv2.INTER_LINEAR)
+        return (logits > 0).astype(np.uint8)
+
+    def add_click(self, folder_path: str, frame_idx: int, obj_id: int, points: np.ndarray, labels: np.ndarray):
+        features = self.encode_frame(folder_path, frame_idx)
+        return [obj_id], [self.predict(features, points, labels)]
+
+    def propagate(self, folder_path: str):
+        raise NotImplementedError("Mask propagation is not available with the ONNX SAM2 backend")
+
+    def propagate_chunk(self, folder_path: str, frame_indices: list[int], seeds: dict):
+        raise NotImplementedError("Mask propagation is not available with the ONNX SAM2 backend")
+
+    @classmethod
+    def get_instance(cls, num_threads: int | None = None):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = SAM2OnnxEngine(
+                        encoder_path=SAM2_ONNX_ENCODER,
+                        decoder_path=SAM2_ONNX_DECODER,
+                        num_threads=num_threads,
+                    )
+        return cls._instance
+
+def preprocess_image(image: np.ndarray) -> np.ndarray:
+    # SAM2Transforms (SAM2ImagePredictor): scale to [0, 1], antialiased
+    # bilinear resize of the float image, then ImageNet normalisation. The
+    # torch backend's video predictor instead loads frames with a PIL bicubic
+    # resize to uint8, so its embeddings differ slightly from these.
+    rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB).astype(np.float32) / 255.0
+    x = resize_axis(resize_axis(rgb, IMAGE_SIZE, 1), IMAGE_SIZE, 0)
+    x = (x - PIXEL_MEAN) / PIXEL_STD
+    return np.ascontiguousarray(x.transpose(2, 0, 1)[None])
+
+def resize_weights(in_size: int, out_size: int) -> tuple[np.ndarray, np.ndarray]:
+    # Taps and weights of torch's antialiased bilinear interpolation: a
+    # triangle filter widened by the scale when shrinking, clipped at the
+    # borders and normalised
+    scale = in_size / out_size
+    support = max(scale, 1.0)
+    center = scale * (np.arange(out_size) + 0.5)
+    lo = np.maximum((center - support + 0.5).astype(np.int64), 0)
+    hi = np.minimum((center + support + 0.5).astype(np.int64), in_size)
+    idx = lo[:, None] + np.arange(int((hi - lo).max()))
+    weights = np.clip(1 - np.abs(idx - center[:, None] + 0.5) / support, 0, None)
+    weights[idx >= hi[:, None]] = 0
+    weights /= weights.sum(axis=1, keepdims=True)
+    return np.minimum(idx, in_size - 1), weights.astype(np.float32)
+
+def resize_axis(x: np.ndarray, size: int, axis: int) -> np.ndarray:
+    idx, weights = resize_weights(x.shape[axis], size)
+    out = 0
+    for k in range(idx.shape[1]):
+        w = weights[:, k].reshape([-1 if a == axis else 1 for a in range(x.ndim)])
+        out = out + np.take(x, idx[:, k], axis=axis) * w
+    return out
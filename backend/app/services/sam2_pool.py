@@ -0,0 +1,215 @@
+import contextlib
+import itertools
+import multiprocessing as mp
+import os
+import threading
+from collections import Counter
+from app.services.sam2_scheduler import SAM2Scheduler
+from app.utils.masks import pack_masks, unpack_masks
+
+# 0 keeps the single in-process engine, N > 0 starts N SAM2 worker processes.
+# Chunked propagation only runs chunks in parallel with N > 1: the in-process
+# engine has one predictor, so its chunks run one after another.
+SAM2_WORKERS = int(os.environ.get("SAM2_WORKERS", "0"))
+
+class SAM2WorkerProxy:
+    # Engine-shaped handle to one worker process. Only the scheduler lane that
+    # owns it talks to it, so requests and replies never interleave on the pipe.
+    def __init__(self, index: int, num_threads: int, on_restart=None):
+        self.index = index
+        self.num_threads = num_threads
+        # called with the worker index after a dead worker was replaced
+        self.on_restart = on_restart
+        self._lock = threading.Lock()
+        self._spawn()
+
+    def _spawn(self):
+        ctx = mp.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.num_threads),
+            name=f"sam2-worker-{self.index}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+    def _call(self, op: str, *args):
+        with self._lock:
+            try:
+                self._conn.send((op, args))
+                status, payload = self._conn.recv()
+            except (EOFError, OSError):
+                # The worker died (killed, out of memory, crash in native code)
+                # and took its video states with it. Start a fresh one so the
+                # lane keeps serving, and fail this call.
+                self.process.join(timeout=1)
+                exitcode = self.process.exitcode
+                self._conn.close()
+                self._spawn()
+                died = True
+            else:
+                died = False
+        if died:
+            if self.on_restart is not None:
+                self.on_restart(self.index)
+            raise RuntimeError(
+                f"SAM2 worker {self.index} exited (code {exitcode}) and was restarted; "
+                "reload the folder to continue segmenting"
+            )
+        if status == "error":
+            raise payload
+        return payload
+
+    def autocast(self):
+        return contextlib.nullcontext()
+
+    def load(self):
+        self._call("load")
+
+    def load_video_once(self, folder_path: str):
+        self._call("load_video_once", folder_path)
+
+    def reset_video(self, folder_path: str):
+        self._call("reset_video", folder_path)
+
+    def add_click(self, folder_path, frame_idx, obj_id, points, labels):
+        obj_ids, packed = self._call("add_click", folder_path, frame_idx, obj_id, points, labels)
+        return obj_ids, unpack_masks(packed)
+
+    def propagate(self, folder_path: str):
+        return self._stream("propagate", folder_path)
+
+    def propagate_chunk(self, folder_path: str, frame_indices: list[int], seeds: dict):
+        return self._stream("propagate_chunk", folder_path, frame_indices, seeds)
+
+    def _stream(self, method: str, *args):
+        gen_id = self._call("start", method, args)
+        try:
+            while True:
+                item = self._call("next", gen_id)
+                if item is None:
+                    return
+                frame_idx, obj_ids, packed = item
+                yield frame_idx, obj_ids, unpack_masks(packed)
+        finally:
+            self._call("close", gen_id)
+
+def _worker_main(conn, num_threads: int):
+    from app.services.sam2_backends import get_engine
+
+    engine = get_engine(num_threads=num_threads)
+    generators = {}
+    gen_ids = itertools.count()
+
+    while True:
+        try:
+            op, args = conn.recv()
+        except EOFError:
+            break
+
+        try:
+            if op == "add_click":
+                obj_ids, masks = engine.add_click(*args)
+                result = obj_ids, pack_masks(masks)
+            elif op == "start":
+                method, call_args = args
+                gen_id = next(gen_ids)
+                generators[gen_id] = getattr(engine, method)(*call_args)
+                result = gen_id
+            elif op == "next":
+                try:
+                    frame_idx, obj_ids, masks = next(generators[args[0]])
+                    result = frame_idx, obj_ids, pack_masks(masks)
+                except StopIteration:
+                    generators.pop(args[0], None)
+                    result = None
+            elif op == "close":
+                gen = generators.pop(args[0], None)
+                if gen is not None:
+                    gen.close()
+                result = None
+            elif op in ("load", "load_video_once", "reset_video"):
+                getattr(engine, op)(*args)
+                result = None
+            else:
+                raise ValueError(f"Unknown SAM2 worker op: {op}")
+            reply = ("ok", result)
+        except Exception as e:
+            reply = ("error", e)
+
+        try:
+            conn.send(reply)
+        except Exception as e:
+            conn.send(("error", RuntimeError(str(e))))
+
+class SAM2WorkerPool:
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, num_workers: int):
+        num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+        self.schedulers = [
+            SAM2Scheduler(SAM2WorkerProxy(i, num_threads, on_restart=self._release_worker))
+            for i in range(num_workers)
+        ]
+        self.assignments = {}
+
+    def scheduler_for(self, folder: str) -> SAM2Scheduler:
+        with SAM2WorkerPool._lock:
+            if folder not in self.assignments:
+                load = Counter(self.assignments.values())
+                self.assignments[folder] = min(range(len(self.schedulers)), key=lambda i: load[i])
+            return self.schedulers[self.assignments[folder]]
+
+    def release(self, folder: str) -> SAM2Scheduler | None:
+        # Returns the scheduler the folder was on, so its video state can be dropped there
+        with SAM2WorkerPool._lock:
+            worker = self.assignments.pop(folder, None)
+        return None if worker is None else self.schedulers[worker]
+
+    def _release_worker(self, worker: int):
+        # a restarted worker has no video states left, so its folders are
+        # spread over the pool again on their next request
+        with SAM2WorkerPool._lock:
+            for folder in [f for f, w in self.assignments.items() if w == worker]:
+                del self.assignments[folder]
+
+    def queue_depth(self) -> list[dict]:
+        return [
+            {
+                **s.queue_depth(),
+                "worker": i,
+                "folders": sorted(f for f, w in self.assignments.items() if w == i),
+            }
+            for i, s in enumerate(self.schedulers)
+        ]
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = SAM2WorkerPool(SAM2_WORKERS)
+        return cls._instance
+
+def get_scheduler(folder: str) -> SAM2Scheduler:
+    if SAM2_WORKERS > 0:
+        return SAM2WorkerPool.get_instance().scheduler_for(folder)
+    return SAM2Scheduler.get_instance()
+
+async def release_folder(folder: str, folder_path: str):
+    # Drops the folder's video state and, with worker processes, its worker slot
+    if SAM2_WORKERS > 0:
+        scheduler = SAM2WorkerPool.get_instance().release(folder)
+        if scheduler is None:
+            return
+    else:
+        scheduler = SAM2Scheduler.get_instance()
+    await scheduler.run(folder, lambda engine: engine.reset_video(folder_path))
+
+def get_all_schedulers() -> list[SAM2Scheduler]:
+    if SAM2_WORKERS > 0:
+        return SAM2WorkerPool.get_instance().schedulers
+    return [SAM2Scheduler.get_instance()]
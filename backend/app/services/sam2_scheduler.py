@@ -0,0 +1,159 @@
+import asyncio
+import inspect
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable, Optional
+from app.services.sam2_backends import get_engine
+
+INTERACTIVE = 0
+BULK = 1
+
+@dataclass
+class _Task:
+    folder: str
+    fn: Callable[[Any], Any]
+    priority: int
+    key: Optional[Hashable] = None
+    # one per caller, so a caller cancelling does not cancel the others
+    futures: list = field(default_factory=list)
+    steps: Any = None
+
+class SAM2Scheduler:
+    # Every predictor call runs on one dispatch thread. Interactive prompts always
+    # go before bulk work, folders take turns within a priority, and bulk tasks
+    # (generators) are advanced one step at a time so clicks can slip in between.
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._cond = threading.Condition()
+        self._queues = {INTERACTIVE: OrderedDict(), BULK: OrderedDict()}
+        self._pending = {}
+        self._active_bulk = set()
+        self._thread = None
+
+    def submit(self, folder: str, fn: Callable[[Any], Any], priority: int = INTERACTIVE, key: Optional[Hashable] = None) -> Future:
+        with self._cond:
+            if key is not None and key in self._pending:
+                # Same object on the same frame is still queued: only the newest
+                # prompt matters, so both callers share a single predictor call.
+                task = self._pending[key]
+                task.fn = fn
+                future = Future()
+                task.futures.append(future)
+                return future
+
+            task = _Task(folder=folder, fn=fn, priority=priority, key=key)
+            future = Future()
+            task.futures.append(future)
+            if key is not None:
+                self._pending[key] = task
+
+            self._queues[priority].setdefault(folder, deque()).append(task)
+            self._ensure_thread()
+            self._cond.notify()
+            return future
+
+    async def run(self, folder: str, fn: Callable[[Any], Any], priority: int = INTERACTIVE, key: Optional[Hashable] = None):
+        return await asyncio.wrap_future(self.submit(folder, fn, priority=priority, key=key))
+
+    def queue_depth(self) -> dict:
+        with self._cond:
+            return {
+                "interactive": sum(len(q) for q in self._queues[INTERACTIVE].values()),
+                "bulk": sum(len(q) for q in self._queues[BULK].values()),
+                "active_bulk_folders": sorted(self._active_bulk),
+            }
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="sam2-scheduler", daemon=True)
+            self._thread.start()
+
+    def _next_task(self) -> Optional[_Task]:
+        for priority in (INTERACTIVE, BULK):
+            queue = self._queues[priority]
+            for folder in list(queue.keys()):
+                # A folder that is mid-propagation keeps its clicks until the
+                # propagation finishes, since both share one inference state.
+                if priority == INTERACTIVE and folder in self._active_bulk:
+                    continue
+                tasks = queue.pop(folder)
+                task = tasks.popleft()
+                if tasks:
+                    queue[folder] = tasks
+                if task.key is not None and self._pending.get(task.key) is task:
+                    del self._pending[task.key]
+                return task
+        return None
+
+    def _requeue_bulk(self, task: _Task):
+        with self._cond:
+            tasks = self._queues[BULK].pop(task.folder, deque())
+            tasks.appendleft(task)
+            self._queues[BULK][task.folder] = tasks
+
+    def _run(self):
+        with self.engine.autocast():
+            while True:
+                with self._cond:
+                    task = self._next_task()
+                    while task is None:
+                        self._cond.wait()
+                        task = self._next_task()
+
+                self._step(task)
+
+    def _step(self, task: _Task):
+        if task.steps is None:
+            # Callers that cancelled while the task was queued drop out; it
+            # only runs if someone is still waiting. Running futures can no
+            # longer be cancelled.
+            task.futures = [f for f in task.futures if f.set_running_or_notify_cancel()]
+            if not task.futures:
+                return
+
+        try:
+            if task.steps is None:
+                result = task.fn(self.engine)
+                if not inspect.isgenerator(result):
+                    self._resolve(task, result=result)
+                    return
+                task.steps = result
+                with self._cond:
+                    self._active_bulk.add(task.folder)
+
+            next(task.steps)
+            self._requeue_bulk(task)
+        except StopIteration as e:
+            self._finish_bulk(task)
+            self._resolve(task, result=e.value)
+        except Exception as e:
+            self._finish_bulk(task)
+            self._resolve(task, error=e)
+
+    def _resolve(self, task: _Task, result: Any = None, error: Optional[BaseException] = None):
+        for future in task.futures:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _finish_bulk(self, task: _Task):
+        if task.steps is None:
+            return
+        with self._cond:
+            self._active_bulk.discard(task.folder)
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = SAM2Scheduler(get_engine())
+        return cls._instance
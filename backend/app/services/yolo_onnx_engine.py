@@ -0,0 +1,158 @@
+from pathlib import Path
+import ast
+import threading
+import cv2
+import numpy as np
+
+PAD_VALUE = 114
+NUM_MASK_COEFFS = 32
+
+class YOLOOnnxEngine:
+    # CPU inference for fine-tuned YOLO segmentation models exported to ONNX
+    # after training. Pre- and post-processing follow ultralytics (letterbox,
+    # class-aware NMS, prototype masks) in numpy/OpenCV, so neither torch nor
+    # the YOLO object is loaded. One session is kept per exported model.
+    _instances = {}
+    _lock = threading.Lock()
+
+    def __init__(self, model_path: Path, num_threads: int | None = None):
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.session = None
+        self.loaded = False
+        self.names = {}
+        self.imgsz = None
+        self.batch = None
+
+    def load(self):
+        if self.loaded:
+            return
+
+        with YOLOOnnxEngine._lock:
+            if not self.loaded:
+                import onnxruntime as ort
+
+                if not self.model_path.exists():
+                    raise FileNotFoundError(f"{self.model_path} not found")
+
+                opts = ort.SessionOptions()
+                opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                if self.num_threads:
+                    opts.intra_op_num_threads = self.num_threads
+
+                self.session = ort.InferenceSession(str(self.model_path), opts, providers=["CPUExecutionProvider"])
+
+                # written into the model by the ultralytics exporter
+                meta = self.session.get_modelmeta().custom_metadata_map
+                if meta.get("task") != "segment":
+                    raise ValueError(f"{self.model_path.name} is not a segmentation model")
+                self.names = ast.literal_eval(meta["names"])
+
+                shape = self.session.get_inputs()[0].shape
+                self.imgsz = (shape[2], shape[3])
+                # a static batch dimension means every run takes exactly that
+                # many images
+                self.batch = shape[0] if isinstance(shape[0], int) else None
+                self.loaded = True
+
+    def predict(self, images: list[np.ndarray], conf: float = 0.25, iou: float = 0.7, max_det: int = 300) -> list[list[dict]]:
+        # images are BGR, as read by cv2.imread; returns the instances found in
+        # each image with boxes and masks at the image's own resolution
+        self.load()
+
+        step = self.batch or len(images)
+        results = []
+        for i in range(0, len(images), step):
+            chunk = images[i:i + step]
+            x = np.stack([letterbox(image, self.imgsz) for image in chunk])
+            if len(chunk) < step:
+                x = np.concatenate([x, np.zeros((step - len(chunk), *x.shape[1:]), x.dtype)])
+
+            preds, protos = self.session.run(None, {"images": x})
+            for image, pred, proto in zip(chunk, preds, protos):
+                results.append(self.postprocess(pred, proto, image.shape[:2], conf, iou, max_det))
+        return results
+
+    def postprocess(self, pred: np.ndarray, protos: np.ndarray, shape: tuple[int, int], conf: float, iou: float, max_det: int) -> list[dict]:
+        # pred is (4 + classes + mask coefficients, anchors) with xywh boxes in
+        # input pixels; protos is (mask coefficients, mask h, mask w)
+        pred = pred.T
+        nc = pred.shape[1] - 4 - NUM_MASK_COEFFS
+        scores = pred[:, 4:4 + nc]
+        class_ids = scores.argmax(1)
+        best = scores[np.arange(len(pred)), class_ids]
+        keep = best > conf
+        pred, class_ids, best = pred[keep], class_ids[keep], best[keep]
+        if not len(pred):
+            return []
+
+        xywh = pred[:, :4]
+        corners = np.concatenate([xywh[:, :2] - xywh[:, 2:] / 2, xywh[:, 2:]], axis=1)
+        idx = cv2.dnn.NMSBoxesBatched(corners.tolist(), best.tolist(), class_ids.tolist(), conf, iou)
+        idx = np.asarray(idx, dtype=np.int64).reshape(-1)[:max_det]
+
+        boxes = scale_boxes(np.concatenate([corners[idx, :2], corners[idx, :2] + corners[idx, 2:]], axis=1), self.imgsz, shape)
+        masks = scale_masks(pred[idx, 4 + nc:] @ protos.reshape(len(protos), -1), protos.shape[1:], shape)
+
+        instances = []
+        for box, mask, class_id, score in zip(boxes, masks, class_ids[idx], best[idx]):
+            x1, y1, x2, y2 = np.round(box).astype(int)
+            cropped = np.zeros(shape, np.uint8)
+            cropped[y1:y2, x1:x2] = mask[y1:y2, x1:x2] > 0
+            instances.append({
+                "class_id": int(class_id),
+                "class_name": self.names.get(int(class_id)),
+                "score": float(score),
+                "box": box.tolist(),
+                "mask": cropped,
+            })
+        return instances
+
+    @classmethod
+    def get_instance(cls, model_path: Path, num_threads: int | None = None):
+        key = str(model_path)
+        if key not in cls._instances:
+            with cls._lock:
+                if key not in cls._instances:
+                    cls._instances[key] = YOLOOnnxEngine(model_path, num_threads=num_threads)
+        return cls._instances[key]
+
+def letterbox(image: np.ndarray, imgsz: tuple[int, int]) -> np.ndarray:
+    # resize keeping the aspect ratio and pad to imgsz, centred; returns the
+    # normalised RGB CHW input
+    h, w = image.shape[:2]
+    r = min(imgsz[0] / h, imgsz[1] / w)
+    new_w, new_h = round(w * r), round(h * r)
+    if (new_w, new_h) != (w, h):
+        image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    dw, dh = (imgsz[1] - new_w) / 2, (imgsz[0] - new_h) / 2
+    image = cv2.copyMakeBorder(
+        image,
+        round(dh - 0.1), round(dh + 0.1), round(dw - 0.1), round(dw + 0.1),
+        cv2.BORDER_CONSTANT,
+        value=(PAD_VALUE, PAD_VALUE, PAD_VALUE),
+    )
+    x = cv2.cvtColor(image, cv2.COLOR_BGR2RGB).transpose(2, 0, 1)
+    return np.ascontiguousarray(x, dtype=np.float32) / 255.0
+
+def scale_boxes(boxes: np.ndarray, imgsz: tuple[int, int], shape: tuple[int, int]) -> np.ndarray:
+    gain = min(imgsz[0] / shape[0], imgsz[1] / shape[1])
+    pad_x = round((imgsz[1] - shape[1] * gain) / 2 - 0.1)
+    pad_y = round((imgsz[0] - shape[0] * gain) / 2 - 0.1)
+    boxes = (boxes - [pad_x, pad_y, pad_x, pad_y]) / gain
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, shape[1])
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, shape[0])
+    return boxes
+
+def scale_masks(logits: np.ndarray, proto_shape: tuple[int, int], shape: tuple[int, int]) -> list[np.ndarray]:
+    # Mask logits at prototype resolution are cut to the unpadded area and
+    # upsampled straight to the image size, like ultralytics' retina masks
+    mh, mw = proto_shape
+    gain = min(mh / shape[0], mw / shape[1])
+    pad_w, pad_h = (mw - shape[1] * gain) / 2, (mh - shape[0] * gain) / 2
+    top, left = round(pad_h - 0.1), round(pad_w - 0.1)
+    bottom, right = mh - round(pad_h + 0.1), mw - round(pad_w + 0.1)
+
+    logits = logits.reshape(-1, mh, mw)[:, top:bottom, left:right]
+    return [cv2.resize(m, (shape[1], shape[0]), interpolation=cv2.INTER_LINEAR) for m in logits]
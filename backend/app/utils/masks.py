@@ -0,0 +1,15 @@
+import numpy as np
+
+def pack_mask(mask: np.ndarray) -> tuple[tuple[int, int], bytes]:
+    return mask.shape, np.packbits(mask > 0, axis=None).tobytes()
+
+def unpack_mask(packed: tuple[tuple[int, int], bytes]) -> np.ndarray:
+    shape, data = packed
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), count=shape[0] * shape[1])
+    return bits.reshape(shape)
+
+def pack_masks(masks: list[np.ndarray]) -> list[tuple[tuple[int, int], bytes]]:
+    return [pack_mask(m) for m in masks]
+
+def unpack_masks(packed: list[tuple[tuple[int, int], bytes]]) -> list[np.ndarray]:
+    return [unpack_mask(p) for p in packed]
@@ -6,4 +6,7 @@ UPLOADS_DIR = BACKEND_DIR / "uploads"
 SEGMENTATIONS_DIR = BACKEND_DIR / "segmentations"
 ML_MODELS_DIR = BACKEND_DIR / "ml_models"
 JOBS_DIR = BACKEND_DIR / "jobs"
+TRAINING_VIEWS_DIR = BACKEND_DIR / "training_views"
+RESIZED_IMAGES_DIR = BACKEND_DIR / "resized_images"
+EVALUATION_CACHE_DIR = BACKEND_DIR / "evaluation_cache"
 CONFIGS_DIR = BACKEND_DIR / "configs"
\ No newline at end of file
@@ -22,6 +22,12 @@ def list_image_files(folder_path: Path) -> list[Path]:
         key=lambda p: p.name
     )
 
+def list_frame_files(folder_path: Path) -> list[Path]:
+    return sorted(
+        [p for p in folder_path.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS],
+        key=lambda x: int(''.join(filter(str.isdigit, x.name)) or -1)
+    )
+
 def get_first_image_size(folder_path):
     image_files = list_image_files(folder_path)
     try:
@@ -1,6 +1,15 @@
 from app.jobs.celery_app import celery_app
 from app.jobs.finetune_worker import run_finetune_job
+from app.jobs.hparam_search import run_trial
 
-@celery_app.task(bind=True, name="finetune.run")
+# requeued when the worker process dies mid-run; the retry resumes from the
+# last saved epoch
+@celery_app.task(bind=True, name="finetune.run", acks_late=True, reject_on_worker_lost=True)
 def run_finetune_task(self, job_id: str, payload: dict):
-    return run_finetune_job(job_id, payload)
\ No newline at end of file
+    return run_finetune_job(job_id, payload)
+
+# one short hyper-parameter trial of a sweep, routed to TRIAL_QUEUE; the
+# coordinating fine-tune task polls its result meanwhile
+@celery_app.task(name="finetune.trial")
+def run_trial_task(spec: dict):
+    return run_trial(spec)
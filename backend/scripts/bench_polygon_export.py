@@ -0,0 +1,113 @@
+from pathlib import Path
+import argparse
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import cv2
+import numpy as np
+from app.jobs.export_pool import LabelWriter, write_atomic
+from app.jobs.yolo_export import format_polygon, mask_to_polygons
+
+# Micro-benchmark for the YOLO polygon serialisation path:
+#   python scripts/bench_polygon_export.py --frames 200 --no-simplify
+
+def format_polygon_loop(class_id, cnt, w, h):
+    # serialisation used by run_yolo_export before vectorisation
+    coords = []
+    for x, y in cnt:
+        coords.append(x / w)
+        coords.append(y / h)
+
+    return " ".join([str(class_id)] + [f"{c:.6f}" for c in coords])
+
+def write_labels_loop(labels_dir: Path, labels: list[tuple[str, str]]):
+    for name, text in labels:
+        write_atomic(labels_dir / name, text)
+
+def write_labels_buffered(labels_dir: Path, labels: list[tuple[str, str]]):
+    writer = LabelWriter(labels_dir)
+    for name, text in labels:
+        writer.add(name, text)
+    writer.flush()
+
+def make_masks(frames: int, objects: int, width: int, height: int, seed: int = 0) -> list[list[np.ndarray]]:
+    # Blobby masks with noisy edges so contours stay long without simplification
+    rng = np.random.default_rng(seed)
+    out = []
+    for _ in range(frames):
+        masks = []
+        for _ in range(objects):
+            mask = np.zeros((height, width), np.uint8)
+            for _ in range(4):
+                center = (int(rng.integers(width // 8, width * 7 // 8)), int(rng.integers(height // 8, height * 7 // 8)))
+                axes = (int(rng.integers(width // 20, width // 6)), int(rng.integers(height // 20, height // 6)))
+                cv2.ellipse(mask, center, axes, float(rng.integers(0, 180)), 0, 360, 1, -1)
+            noise = rng.random((height // 8, width // 8)) > 0.5
+            mask &= cv2.resize(noise.astype(np.uint8), (width, height), interpolation=cv2.INTER_NEAREST)
+            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((5, 5), np.uint8))
+            masks.append(mask)
+        out.append(masks)
+    return out
+
+def bench(fn, polygons, w, h, repeat):
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = [fn(0, cnt, w, h) for cnt in polygons]
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--objects", type=int, default=3)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--no-simplify", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    w, h = args.width, args.height
+    masks = make_masks(args.frames, args.objects, w, h)
+    frame_polygons = [
+        [cnt for mask in frame for cnt in mask_to_polygons(mask, 10, not args.no_simplify)]
+        for frame in masks
+    ]
+    polygons = [cnt for frame in frame_polygons for cnt in frame]
+    points = sum(len(cnt) for cnt in polygons)
+    print(f"{len(polygons)} polygons, {points} points ({points / max(len(polygons), 1):.0f} per polygon)")
+
+    loop_time, loop_out = bench(format_polygon_loop, polygons, w, h, args.repeat)
+    vec_time, vec_out = bench(format_polygon, polygons, w, h, args.repeat)
+    assert loop_out == vec_out, "vectorised output differs from the loop"
+
+    print(f"serialise  loop         {len(polygons) / loop_time:10.0f} polygons/s")
+    print(f"serialise  vectorised   {len(polygons) / vec_time:10.0f} polygons/s  ({loop_time / vec_time:.1f}x)")
+
+    labels = []
+    i = 0
+    for frame in frame_polygons:
+        lines = vec_out[i:i + len(frame)]
+        i += len(frame)
+        labels.append((f"{len(labels):05d}.txt", "\n".join(lines)))
+
+    # interleaved and repeated more often than serialisation: small-file
+    # writes are dominated by filesystem noise
+    writers = {"write_atomic": write_labels_loop, "buffered": write_labels_buffered}
+    best = dict.fromkeys(writers, float("inf"))
+    for _ in range(max(args.repeat, 10)):
+        for name, write in writers.items():
+            with tempfile.TemporaryDirectory() as d:
+                start = time.perf_counter()
+                write(Path(d), labels)
+                best[name] = min(best[name], time.perf_counter() - start)
+    for name in writers:
+        print(f"write      {name:<12} {len(labels) / best[name]:10.0f} files/s")
+
+if __name__ == "__main__":
+    main()
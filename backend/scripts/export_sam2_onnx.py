@@ -0,0 +1,202 @@
+from pathlib import Path
+import argparse
+import sys
+import time
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import cv2
+import numpy as np
+import torch
+from app.services.sam2_engine import SAM2_MODEL_CFG, SAM2_CHECKPOINT
+from app.services.sam2_onnx_engine import (
+    SAM2_ONNX_ENCODER,
+    SAM2_ONNX_DECODER,
+    SAM2OnnxEngine,
+    IMAGE_SIZE,
+)
+
+# Exports the SAM2 image encoder and prompt/mask decoder used for clicks to ONNX,
+# then optionally checks the ONNX Runtime masks against the torch predictor:
+#   python scripts/export_sam2_onnx.py --check path/to/frame.jpg
+# tests/test_sam2_onnx_parity.py runs the same check once the checkpoint and
+# the exported models are in ml_models. Both compare with SAM2ImagePredictor,
+# which the ONNX models reproduce. The torch backend's /click runs the video
+# predictor instead: it resizes frames with PIL bicubic to uint8, and for a
+# single click keeps the best of three candidate masks where the exported
+# decoder predicts one, so single-click masks can differ more than the check
+# shows.
+
+class SAM2ImageEncoder(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, image):
+        backbone_out = self.model.forward_image(image)
+        _, vision_feats, _, feat_sizes = self.model._prepare_backbone_features(backbone_out)
+        if self.model.directly_add_no_mem_embed:
+            vision_feats[-1] = vision_feats[-1] + self.model.no_mem_embed
+        feats = [
+            feat.permute(1, 2, 0).reshape(1, -1, *size)
+            for feat, size in zip(vision_feats, feat_sizes)
+        ]
+        return feats[-1], feats[0], feats[1]
+
+class SAM2PromptDecoder(torch.nn.Module):
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+        self.prompt_encoder = model.sam_prompt_encoder
+
+    def embed_points(self, coords, labels):
+        # SAM2's _embed_points with boolean index assignment swapped for
+        # arithmetic masks, which export cleanly.
+        pe = self.prompt_encoder
+        coords = coords + 0.5
+        coords = torch.cat([coords, torch.zeros_like(coords[:, :1])], dim=1)
+        labels = torch.cat([labels, -torch.ones_like(labels[:, :1])], dim=1)
+
+        embedding = pe.pe_layer._pe_encoding(coords / IMAGE_SIZE)
+        labels = labels.unsqueeze(-1)
+
+        embedding = embedding * (labels != -1)
+        embedding = embedding + pe.not_a_point_embed.weight * (labels == -1)
+        for i in range(pe.num_point_embeddings):
+            embedding = embedding + pe.point_embeddings[i].weight * (labels == i)
+        return embedding
+
+    def forward(self, point_coords, point_labels, image_embed, high_res_feats_0, high_res_feats_1):
+        pe = self.prompt_encoder
+        sparse = self.embed_points(point_coords, point_labels)
+        dense = pe.no_mask_embed.weight.reshape(1, -1, 1, 1).expand(
+            point_coords.shape[0], -1, *pe.image_embedding_size
+        )
+
+        low_res_masks, iou_predictions, _, _ = self.model.sam_mask_decoder(
+            image_embeddings=image_embed,
+            image_pe=pe.get_dense_pe(),
+            sparse_prompt_embeddings=sparse,
+            dense_prompt_embeddings=dense,
+            multimask_output=False,
+            repeat_image=False,
+            high_res_features=[high_res_feats_0, high_res_feats_1],
+        )
+        return low_res_masks, iou_predictions
+
+def export(model, opset: int):
+    SAM2_ONNX_ENCODER.parent.mkdir(parents=True, exist_ok=True)
+
+    encoder = SAM2ImageEncoder(model).eval()
+    image = torch.randn(1, 3, IMAGE_SIZE, IMAGE_SIZE)
+    with torch.no_grad():
+        image_embed, feats_0, feats_1 = encoder(image)
+
+    print(f"Exporting encoder to {SAM2_ONNX_ENCODER}")
+    torch.onnx.export(
+        encoder,
+        (image,),
+        str(SAM2_ONNX_ENCODER),
+        input_names=["image"],
+        output_names=["image_embed", "high_res_feats_0", "high_res_feats_1"],
+        opset_version=opset,
+        dynamo=False,
+    )
+
+    decoder = SAM2PromptDecoder(model).eval()
+    coords = torch.randint(0, IMAGE_SIZE, (1, 2, 2)).float()
+    labels = torch.tensor([[1.0, 0.0]])
+
+    print(f"Exporting decoder to {SAM2_ONNX_DECODER}")
+    torch.onnx.export(
+        decoder,
+        (coords, labels, image_embed, feats_0, feats_1),
+        str(SAM2_ONNX_DECODER),
+        input_names=["point_coords", "point_labels", "image_embed", "high_res_feats_0", "high_res_feats_1"],
+        output_names=["low_res_masks", "iou_predictions"],
+        dynamic_axes={"point_coords": {1: "num_points"}, "point_labels": {1: "num_points"}},
+        opset_version=opset,
+        dynamo=False,
+    )
+
+def parity_ious(model, image: np.ndarray, num_points: int) -> list[float]:
+    # IoU of the torch predictor's and the ONNX engine's masks for random
+    # single-point prompts on a BGR image
+    from sam2.sam2_image_predictor import SAM2ImagePredictor
+
+    h, w = image.shape[:2]
+
+    predictor = SAM2ImagePredictor(model)
+    start = time.perf_counter()
+    predictor.set_image(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    torch_encode = time.perf_counter() - start
+
+    engine = SAM2OnnxEngine(SAM2_ONNX_ENCODER, SAM2_ONNX_DECODER)
+    engine.load()
+    start = time.perf_counter()
+    features = engine.encode_image(image)
+    onnx_encode = time.perf_counter() - start
+
+    print(f"encode: torch {torch_encode * 1000:.0f} ms, onnx {onnx_encode * 1000:.0f} ms")
+
+    rng = np.random.default_rng(0)
+    ious = []
+    for _ in range(num_points):
+        point = np.array([[rng.integers(0, w), rng.integers(0, h)]], dtype=np.float32)
+        label = np.array([1], dtype=np.int32)
+
+        start = time.perf_counter()
+        torch_masks, _, _ = predictor.predict(point_coords=point, point_labels=label, multimask_output=False)
+        torch_decode = time.perf_counter() - start
+        torch_mask = torch_masks[0] > 0
+
+        start = time.perf_counter()
+        onnx_mask = engine.predict(features, point, label) > 0
+        onnx_decode = time.perf_counter() - start
+
+        union = np.logical_or(torch_mask, onnx_mask).sum()
+        iou = float(np.logical_and(torch_mask, onnx_mask).sum() / union) if union else 1.0
+        ious.append(iou)
+        print(
+            f"point ({int(point[0, 0])}, {int(point[0, 1])}): IoU {iou:.4f}, "
+            f"decode torch {torch_decode * 1000:.1f} ms, onnx {onnx_decode * 1000:.1f} ms"
+        )
+
+    print(f"min IoU {min(ious):.4f}, mean IoU {np.mean(ious):.4f}")
+    return ious
+
+def check_parity(model, image_path: Path, num_points: int, min_iou: float) -> bool:
+    image = cv2.imread(str(image_path))
+    if image is None:
+        raise FileNotFoundError(image_path)
+    return min(parity_ious(model, image, num_points)) >= min_iou
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checkpoint", default=str(SAM2_CHECKPOINT))
+    parser.add_argument("--config", default=SAM2_MODEL_CFG)
+    parser.add_argument("--opset", type=int, default=17)
+    parser.add_argument("--skip-export", action="store_true")
+    parser.add_argument("--check", type=Path, help="image to compare torch and ONNX masks on")
+    parser.add_argument("--points", type=int, default=8)
+    parser.add_argument("--min-iou", type=float, default=0.9)
+    args = parser.parse_args()
+
+    from sam2.build_sam import build_sam2
+
+    ckpt = args.checkpoint or None
+    if ckpt and not Path(ckpt).exists():
+        raise FileNotFoundError(f"SAM2 checkpoint not found: {ckpt}")
+
+    model = build_sam2(args.config, ckpt, device="cpu")
+
+    if not args.skip_export:
+        export(model, args.opset)
+
+    if args.check and not check_parity(model, args.check, args.points, args.min_iou):
+        print("ONNX masks do not match the torch predictor")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# the backend is imported as the top-level "app" package, as uvicorn and the
+# Celery worker run it
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,85 @@
+import queue
+import pytest
+import redis
+from app.jobs import cancel, store
+from app.jobs.cancel import CancelWatcher, JobCancelled, request_cancel
+
+TIMEOUT = 5
+
+class FakePubSub:
+    def __init__(self, messages: queue.Queue):
+        self.messages = messages
+
+    def subscribe(self, channel):
+        pass
+
+    def get_message(self, timeout):
+        try:
+            return self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        pass
+
+class FakeRedis:
+    def __init__(self):
+        self.messages = queue.Queue()
+
+    def pubsub(self, ignore_subscribe_messages):
+        return FakePubSub(self.messages)
+
+    def publish(self, channel, message):
+        self.messages.put({"channel": channel, "data": message})
+
+class DownRedis:
+    def pubsub(self, ignore_subscribe_messages):
+        raise redis.ConnectionError("down")
+
+    def publish(self, channel, message):
+        raise redis.ConnectionError("down")
+
+def use_jobs_dir(monkeypatch, tmp_path, client):
+    monkeypatch.setattr(cancel, "JOBS_DIR", tmp_path)
+    monkeypatch.setattr(store, "JOBS_DIR", tmp_path)
+    monkeypatch.setattr(cancel, "redis_client", client)
+    (tmp_path / "job").mkdir()
+
+def test_published_cancel_is_noticed_before_the_poll_interval(monkeypatch, tmp_path):
+    use_jobs_dir(monkeypatch, tmp_path, FakeRedis())
+    monkeypatch.setattr(cancel, "CANCEL_POLL_SECONDS", 60)
+    watcher = CancelWatcher("job")
+    watcher.start()
+
+    request_cancel("job")
+    assert watcher.cancelled.wait(TIMEOUT)
+    with pytest.raises(JobCancelled):
+        watcher.check()
+
+def test_flag_file_is_polled_without_redis(monkeypatch, tmp_path):
+    use_jobs_dir(monkeypatch, tmp_path, DownRedis())
+    monkeypatch.setattr(cancel, "CANCEL_POLL_SECONDS", 0.01)
+    watcher = CancelWatcher("job")
+    watcher.start()
+
+    request_cancel("job")
+    assert (tmp_path / "job" / "cancel.flag").exists()
+    assert watcher.cancelled.wait(TIMEOUT)
+
+def test_request_made_before_start_is_not_missed(monkeypatch, tmp_path):
+    use_jobs_dir(monkeypatch, tmp_path, FakeRedis())
+    (tmp_path / "job" / "cancel.flag").write_text("1")
+    watcher = CancelWatcher("job")
+    watcher.start()
+    assert watcher.cancelled.wait(TIMEOUT)
+
+def test_stop_ends_the_watcher_without_cancelling(monkeypatch, tmp_path):
+    use_jobs_dir(monkeypatch, tmp_path, FakeRedis())
+    monkeypatch.setattr(cancel, "CANCEL_POLL_SECONDS", 0.01)
+    watcher = CancelWatcher("job")
+    watcher.start()
+
+    watcher.stop()
+    watcher.thread.join(TIMEOUT)
+    assert not watcher.thread.is_alive()
+    watcher.check()
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+import time
+import numpy as np
+from app.services import chunked_propagation
+from app.services.sam2_scheduler import SAM2Scheduler
+from contextlib import nullcontext
+
+class FakeEngine:
+    def __init__(self, tracker):
+        self.tracker = tracker
+
+    def autocast(self):
+        return nullcontext()
+
+    def propagate_chunk(self, folder_path, frame_indices, seeds):
+        with self.tracker["lock"]:
+            self.tracker["active"] += 1
+            self.tracker["peak"] = max(self.tracker["peak"], self.tracker["active"])
+        try:
+            for frame_idx in frame_indices:
+                time.sleep(0.01)
+                yield frame_idx, list(seeds), [np.ones((2, 2), bool) for _ in seeds]
+        finally:
+            with self.tracker["lock"]:
+                self.tracker["active"] -= 1
+
+class FakeMaskStore:
+    def get_global_object_ids(self, folder):
+        return [1]
+
+class FakeReconciler:
+    def __init__(self):
+        self.frames_written = set()
+
+    def write(self, frame_idx, obj_id, mask, seed_idx):
+        self.frames_written.add(frame_idx)
+
+def run_chunks(monkeypatch, workers: int) -> dict:
+    tracker = {"lock": threading.Lock(), "active": 0, "peak": 0}
+    schedulers = [SAM2Scheduler(FakeEngine(tracker)) for _ in range(workers)]
+    monkeypatch.setattr(chunked_propagation, "get_all_schedulers", lambda: schedulers)
+    monkeypatch.setattr(chunked_propagation, "MASK_STORE", FakeMaskStore())
+    # every chunk has its own seed, so all of them are ready in the first round
+    monkeypatch.setattr(chunked_propagation, "pick_seeds", lambda folder, frames, obj_ids: {1: (frames[0], None)})
+
+    stats = asyncio.run(chunked_propagation.propagate_chunked(
+        "folder", "/folder", list(range(40)), chunk_size=10, overlap=0, reconciler=FakeReconciler(),
+    ))
+    return {**stats, "peak": tracker["peak"]}
+
+def test_chunks_run_concurrently_with_several_workers(monkeypatch):
+    stats = run_chunks(monkeypatch, workers=4)
+    assert stats["chunks_total"] == 4
+    assert stats["parallel_lanes"] == 4
+    assert stats["peak"] > 1
+
+def test_chunks_run_one_after_another_on_a_single_engine(monkeypatch):
+    stats = run_chunks(monkeypatch, workers=1)
+    assert stats["parallel_lanes"] == 1
+    assert stats["peak"] == 1
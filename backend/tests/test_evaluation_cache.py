@@ -0,0 +1,101 @@
+import os
+import numpy as np
+import pytest
+
+pytest.importorskip("ultralytics")
+from app.jobs import evaluation
+from app.jobs.evaluation import cached_metrics, checkpoint_key, prune_evaluation_cache, run_evaluation, split_key, write_predictions
+from app.models.ml_models import EvaluateCheckpointsRequest
+from app.services.job_store import EVALUATION_JOBS
+
+DATA = {"names": {0: "class_0"}, "nc": 1}
+
+def predictions(hits: int = 3, misses: int = 1) -> dict:
+    n = hits + misses
+    tp = np.zeros((n, 10), bool)
+    tp[:hits] = True
+    return {
+        "stats": {
+            "tp": tp,
+            "tp_m": tp.copy(),
+            "conf": np.linspace(0.9, 0.5, n),
+            "pred_cls": np.zeros(n),
+            "target_cls": np.zeros(hits + 1),
+            "target_img": np.zeros(hits + 1),
+        },
+        "images": 2,
+        "inference_ms_per_image": 5.0,
+    }
+
+def test_miss_when_nothing_is_cached(tmp_path):
+    assert cached_metrics(tmp_path, DATA) is None
+
+def test_predictions_are_rescored_once_then_metrics_answer(tmp_path):
+    write_predictions(tmp_path, predictions())
+
+    metrics, source = cached_metrics(tmp_path, DATA)
+    assert source == "predictions"
+    assert 0 < metrics["mask_map50"] <= 1
+    assert metrics["images"] == 2
+    assert (tmp_path / "metrics.json").exists()
+
+    assert cached_metrics(tmp_path, DATA) == (metrics, "metrics")
+
+def test_keys_change_with_checkpoint_and_split(tmp_path):
+    ckpt = tmp_path / "best.pt"
+    ckpt.write_bytes(b"weights")
+    key = checkpoint_key(ckpt)
+    ckpt.write_bytes(b"new weights")
+    assert checkpoint_key(ckpt) != key
+
+    data_yaml = tmp_path / "data.yaml"
+    data_yaml.write_text("nc: 1")
+    assert split_key(data_yaml, "val", 640) != split_key(data_yaml, "val", 320)
+    assert split_key(data_yaml, "val", 640) != split_key(data_yaml, "train", 640)
+
+class FakeRun:
+    created = []
+
+    def __init__(self, model_path, data, work_dir):
+        FakeRun.created.append(model_path.name)
+
+    def update(self, batch):
+        pass
+
+    def predictions(self):
+        return predictions()
+
+def test_second_job_is_answered_from_cache(monkeypatch, tmp_path):
+    data_yaml = tmp_path / "view" / "data.yaml"
+    data_yaml.parent.mkdir()
+    data_yaml.write_text("nc: 1")
+    ckpt = tmp_path / "best.pt"
+    ckpt.write_bytes(b"weights")
+    monkeypatch.setattr(evaluation, "EVALUATION_CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(evaluation, "CheckpointRun", FakeRun)
+    monkeypatch.setattr(evaluation, "finetune_data_yaml", lambda model: data_yaml)
+    monkeypatch.setattr(evaluation, "split_batches", lambda *args: (DATA, [{"img": None}]))
+    FakeRun.created = []
+
+    model = {"id": "m", "source": "finetuned", "run_dir": str(tmp_path)}
+    checkpoints = [{"id": "best", "label": "best", "format": "pt", "path": str(ckpt)}]
+    req = EvaluateCheckpointsRequest(img_size=64)
+    for job_id in ("first", "second"):
+        EVALUATION_JOBS[job_id] = {"status": "running"}
+        run_evaluation(model, checkpoints, req, job_id)
+
+    first, second = EVALUATION_JOBS.pop("first"), EVALUATION_JOBS.pop("second")
+    assert FakeRun.created == ["best.pt"]
+    assert first["results"][0]["cached"] is None
+    assert second["results"][0]["cached"] == "metrics"
+    assert second["results"][0]["metrics"] == first["results"][0]["metrics"]
+
+def test_least_recently_used_splits_are_pruned(monkeypatch, tmp_path):
+    monkeypatch.setattr(evaluation, "EVALUATION_CACHE_DIR", tmp_path)
+    for i, name in enumerate(["old", "mid", "new"]):
+        (tmp_path / name).mkdir()
+        os.utime(tmp_path / name, (i, i))
+    (tmp_path / ".jobs").mkdir()
+
+    prune_evaluation_cache(keep=2)
+    assert sorted(p.name for p in tmp_path.iterdir()) == [".jobs", "mid", "new"]
@@ -0,0 +1,73 @@
+import errno
+import os
+import pytest
+from app.jobs import file_placement
+from app.jobs.file_placement import kernel_copy, place_file, place_files
+
+def source(tmp_path, data: bytes = b"frame bytes" * 100):
+    src = tmp_path / "src.jpg"
+    src.write_bytes(data)
+    return src
+
+def fails(code: int):
+    def fn(*args):
+        raise OSError(code, os.strerror(code))
+    return fn
+
+def test_auto_falls_back_to_hardlink_without_reflink(monkeypatch, tmp_path):
+    monkeypatch.setattr(file_placement, "reflink", fails(errno.EOPNOTSUPP))
+    src = source(tmp_path)
+
+    assert place_file(src, tmp_path / "dst.jpg", "auto") == "hardlink"
+    assert os.path.samefile(src, tmp_path / "dst.jpg")
+
+def test_auto_falls_back_to_copy_across_devices(monkeypatch, tmp_path):
+    monkeypatch.setattr(file_placement, "reflink", fails(errno.EOPNOTSUPP))
+    monkeypatch.setattr(file_placement.os, "link", fails(errno.EXDEV))
+    src = source(tmp_path)
+
+    assert place_file(src, tmp_path / "dst.jpg", "auto") == "copy"
+    assert (tmp_path / "dst.jpg").read_bytes() == src.read_bytes()
+    assert not os.path.samefile(src, tmp_path / "dst.jpg")
+
+def test_real_io_errors_are_raised(monkeypatch, tmp_path):
+    monkeypatch.setattr(file_placement, "reflink", fails(errno.EIO))
+    with pytest.raises(OSError):
+        place_file(source(tmp_path), tmp_path / "dst.jpg", "auto")
+
+def test_links_target_the_real_file_behind_export_symlinks(tmp_path):
+    src = source(tmp_path)
+    link = tmp_path / "export.jpg"
+    link.symlink_to(src)
+
+    assert place_file(link, tmp_path / "dst.jpg", "hardlink") == "hardlink"
+    assert not (tmp_path / "dst.jpg").is_symlink()
+    assert os.path.samefile(src, tmp_path / "dst.jpg")
+
+def test_existing_destination_is_left_alone(tmp_path):
+    (tmp_path / "dst.jpg").write_bytes(b"old")
+    counts = place_files([(source(tmp_path), tmp_path / "dst.jpg")], "copy")
+
+    assert counts == {"existing": 1}
+    assert (tmp_path / "dst.jpg").read_bytes() == b"old"
+
+@pytest.mark.skipif(not hasattr(os, "copy_file_range"), reason="needs copy_file_range")
+def test_kernel_copy_recovers_from_early_stop(monkeypatch, tmp_path):
+    real = os.copy_file_range
+    calls = []
+
+    def short(src_fd, dst_fd, count, *args):
+        calls.append(count)
+        return real(src_fd, dst_fd, min(count, 10)) if len(calls) == 1 else 0
+
+    monkeypatch.setattr(file_placement.os, "copy_file_range", short)
+    src = source(tmp_path)
+    kernel_copy(src, tmp_path / "dst.jpg")
+    assert (tmp_path / "dst.jpg").read_bytes() == src.read_bytes()
+
+@pytest.mark.skipif(not hasattr(os, "copy_file_range"), reason="needs copy_file_range")
+def test_kernel_copy_falls_back_when_unsupported(monkeypatch, tmp_path):
+    monkeypatch.setattr(file_placement.os, "copy_file_range", fails(errno.EXDEV))
+    src = source(tmp_path)
+    kernel_copy(src, tmp_path / "dst.jpg")
+    assert (tmp_path / "dst.jpg").read_bytes() == src.read_bytes()
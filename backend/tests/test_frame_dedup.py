@@ -0,0 +1,51 @@
+import json
+from pathlib import Path
+import cv2
+import numpy as np
+from app.jobs.frame_dedup import FRAME_HASHES, dhash, drop_near_duplicates, load_frame_hashes
+
+def gradient(path: Path, flip: bool = False) -> Path:
+    row = np.linspace(0, 255, 128, dtype=np.uint8)
+    img = np.tile(row[::-1] if flip else row, (96, 1))
+    cv2.imwrite(str(path), cv2.merge([img, img, img]))
+    return path
+
+def test_identical_frames_hash_equal_and_different_frames_far_apart(tmp_path):
+    a = dhash(gradient(tmp_path / "a.jpg"))
+    b = dhash(gradient(tmp_path / "b.jpg"))
+    c = dhash(gradient(tmp_path / "c.jpg", flip=True))
+
+    assert a == b
+    assert (a ^ c).bit_count() > 32
+
+def test_unreadable_image_has_no_hash(tmp_path):
+    (tmp_path / "broken.jpg").write_bytes(b"not a jpeg")
+    assert dhash(tmp_path / "broken.jpg") is None
+
+def test_near_duplicates_are_measured_against_last_kept_frame():
+    images = [Path(f"{i:05d}.jpg") for i in range(5)]
+    # each frame drifts one bit from the previous one
+    hashes = {img.name: (1 << i) - 1 for i, img in enumerate(images)}
+
+    kept, removed = drop_near_duplicates(list(range(5)), images, hashes, threshold=2)
+    assert kept == [0, 3]
+    assert removed == 3
+
+def test_frames_without_hash_are_kept():
+    images = [Path("00000.jpg"), Path("00001.jpg"), Path("00002.jpg")]
+    hashes = {"00000.jpg": 0, "00001.jpg": None, "00002.jpg": 0}
+
+    kept, _ = drop_near_duplicates(list(range(3)), images, hashes, threshold=0)
+    assert kept == [0, 1]
+
+def test_hashes_are_cached_by_stat(tmp_path):
+    img = gradient(tmp_path / "00000.jpg")
+    first = load_frame_hashes(tmp_path, [img])
+
+    cache = json.loads((tmp_path / FRAME_HASHES).read_text())
+    cache["hashes"]["00000.jpg"][2] = 42
+    (tmp_path / FRAME_HASHES).write_text(json.dumps(cache))
+    assert load_frame_hashes(tmp_path, [img]) == {"00000.jpg": 42}
+
+    gradient(img, flip=True)
+    assert load_frame_hashes(tmp_path, [img])["00000.jpg"] not in (42, first["00000.jpg"])
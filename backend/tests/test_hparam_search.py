@@ -0,0 +1,67 @@
+import json
+from pathlib import Path
+from app.jobs import hparam_search
+from app.jobs.hparam_search import rungs, run_sweep, should_stop
+from app.models.finetune import TrainingConfig, TuningConfig
+
+def trial_dirs(tmp_path, histories: dict[str, list[float]]) -> Path:
+    for name, history in histories.items():
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "progress.json").write_text(json.dumps(history))
+    return tmp_path
+
+def test_rungs_grow_by_reduction_factor():
+    assert rungs(20) == [2, 6, 18]
+    assert rungs(2) == []
+
+def test_first_trial_at_a_rung_continues(tmp_path):
+    trials = trial_dirs(tmp_path, {"000": [0.1]})
+    assert not should_stop(trials, trials / "000", 1, 0.1)
+
+def test_trial_below_top_third_is_stopped(tmp_path):
+    trials = trial_dirs(tmp_path, {"000": [0.5, 0.6], "001": [0.4, 0.5], "002": [0.1]})
+    assert should_stop(trials, trials / "002", 2, 0.2)
+    assert not should_stop(trials, trials / "002", 2, 0.7)
+
+def test_trials_short_of_the_rung_are_ignored(tmp_path):
+    trials = trial_dirs(tmp_path, {"000": [0.9], "001": [0.1, 0.2]})
+    # only trial 001 has reached epoch 2, and it scored lower
+    assert not should_stop(trials, trials / "002", 2, 0.3)
+
+class NoCancel:
+    def check(self):
+        pass
+
+class FakeTrial:
+    # trial 0 finishes at once, every other trial runs until stopped
+    stopped = []
+
+    def __init__(self, spec_path: Path, threads: int):
+        self.spec = json.loads(spec_path.read_text())
+        trial_dir = Path(self.spec["trial_dir"])
+        (trial_dir / "progress.json").write_text(json.dumps([0.3]))
+        if self.spec["trial"] == 0:
+            (trial_dir / "result.json").write_text(json.dumps({
+                "trial": 0, "params": self.spec["params"], "status": "completed",
+                "epochs": 1, "fitness": 0.3, "history": [0.3],
+            }))
+
+    def done(self) -> bool:
+        return self.spec["trial"] == 0
+
+    def stop(self):
+        FakeTrial.stopped.append(self.spec["trial"])
+
+def test_time_budget_stops_running_and_skips_pending_trials(monkeypatch, tmp_path):
+    monkeypatch.setattr(hparam_search, "LocalTrial", FakeTrial)
+    monkeypatch.setattr(hparam_search, "POLL_SECONDS", 0.01)
+    FakeTrial.stopped = []
+    cfg = TrainingConfig(tuning=TuningConfig(
+        enabled=True, iterations=3, trial_epochs=2, max_concurrent_trials=1, time_budget_minutes=0.005,
+    ))
+
+    summary = run_sweep(tmp_path, tmp_path / "model.pt", tmp_path / "data.yaml", cfg, 0, NoCancel())
+    assert [t["status"] for t in summary["trials"]] == ["completed", "out_of_budget", "skipped"]
+    assert FakeTrial.stopped == [1]
+    assert summary["best"]["trial"] == 0
+    assert (tmp_path / "sweep.json").exists()
@@ -0,0 +1,61 @@
+import json
+import os
+import cv2
+import numpy as np
+from app.jobs import image_cache
+from app.jobs.image_cache import RESIZED_INDEX, resize_images, resized_dims
+
+def frame(path, h: int, w: int):
+    cv2.imwrite(str(path), np.full((h, w, 3), 120, np.uint8))
+    return path
+
+def test_dims_match_rect_mode_rounding():
+    assert resized_dims(1920, 1080, 640) == (640, 360)
+    assert resized_dims(1000, 333, 640) == (640, 214)
+    assert resized_dims(333, 1000, 640) == (214, 640)
+
+def test_large_frames_are_resized_and_small_ones_kept(monkeypatch, tmp_path):
+    monkeypatch.setattr(image_cache, "RESIZED_IMAGES_DIR", tmp_path / "cache")
+    big = frame(tmp_path / "00000.jpg", 200, 300)
+    small = frame(tmp_path / "00001.jpg", 40, 60)
+
+    paths, _ = resize_images("d", [big, small], 64)
+    assert paths[0] == tmp_path / "cache" / "d" / "64" / "00000.jpg"
+    assert cv2.imread(str(paths[0])).shape == (43, 64, 3)
+    assert paths[1] == small
+
+def test_unchanged_frames_are_not_resized_again(monkeypatch, tmp_path):
+    monkeypatch.setattr(image_cache, "RESIZED_IMAGES_DIR", tmp_path / "cache")
+    big = frame(tmp_path / "00000.jpg", 200, 300)
+    resize_images("d", [big], 64)
+
+    calls = []
+    real = image_cache.resize_chunk
+    monkeypatch.setattr(image_cache, "resize_chunk", lambda args: calls.append(args) or real(args))
+    resize_images("d", [big], 64)
+    assert calls == []
+
+    frame(big, 300, 200)
+    os.utime(big, ns=(1, 1))
+    paths, stamps = resize_images("d", [big], 64)
+    assert len(calls) == 1
+    assert cv2.imread(str(paths[0])).shape == (64, 43, 3)
+    assert stamps == [(1, big.stat().st_size)]
+
+def test_each_size_has_its_own_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(image_cache, "RESIZED_IMAGES_DIR", tmp_path / "cache")
+    big = frame(tmp_path / "00000.jpg", 200, 300)
+    resize_images("d", [big], 64)
+    resize_images("d", [big], 128)
+
+    for imgsz in (64, 128):
+        index = json.loads((tmp_path / "cache" / "d" / str(imgsz) / RESIZED_INDEX).read_text())
+        assert index["00000.jpg"]["resized"]
+
+def test_unreadable_frames_fall_back_to_source(monkeypatch, tmp_path):
+    monkeypatch.setattr(image_cache, "RESIZED_IMAGES_DIR", tmp_path / "cache")
+    broken = tmp_path / "00000.jpg"
+    broken.write_bytes(b"not a jpeg")
+
+    paths, _ = resize_images("d", [broken], 64)
+    assert paths == [broken]
@@ -0,0 +1,51 @@
+import os
+from app.jobs.label_index import load_label_index, parse_label, read_label_index, scan_label, write_label_index
+
+def write_labels(root, labels: dict[str, str]):
+    labels_dir = root / "labels"
+    labels_dir.mkdir(parents=True, exist_ok=True)
+    for stem, text in labels.items():
+        (labels_dir / f"{stem}.txt").write_text(text)
+    return labels_dir
+
+def test_parse_label_statuses():
+    assert parse_label("0 0.1 0.1\n2 0.2 0.2\n0 0.3 0.3") == {
+        "status": None, "instances": 3, "classes": {"0": 2, "2": 1},
+    }
+    assert parse_label("")["status"] == "empty_label"
+    assert parse_label("x 0.1 0.1")["status"] == "malformed_label"
+
+def test_fresh_entries_are_trusted_without_reading(tmp_path):
+    labels_dir = write_labels(tmp_path, {"00000": "1 0.1 0.1 0.2 0.2 0.3 0.3"})
+    entry = scan_label(labels_dir / "00000.txt")
+    # an index entry that disagrees with the file but matches its stat wins
+    write_label_index(tmp_path, {"00000": {**entry, "instances": 7}})
+
+    entries, report = load_label_index(tmp_path, labels_dir, ["00000"])
+    assert entries["00000"]["instances"] == 7
+    assert report == {"indexed": 1, "rescanned": 0}
+
+def test_changed_files_are_rescanned_and_written_back(tmp_path):
+    labels_dir = write_labels(tmp_path, {"00000": "1 0.1 0.1", "00001": ""})
+    write_label_index(tmp_path, {"00000": scan_label(labels_dir / "00000.txt")})
+    (labels_dir / "00000.txt").write_text("3 0.1 0.1\n3 0.2 0.2")
+    os.utime(labels_dir / "00000.txt", ns=(1, 1))
+
+    entries, report = load_label_index(tmp_path, labels_dir, ["00000", "00001"])
+    assert entries["00000"]["classes"] == {"3": 2}
+    assert entries["00001"]["status"] == "empty_label"
+    assert report == {"indexed": 0, "rescanned": 2}
+    assert read_label_index(tmp_path)["00000"]["mtime_ns"] == 1
+
+def test_stems_without_label_file_are_left_out(tmp_path):
+    labels_dir = write_labels(tmp_path, {"00000": "0 0.1 0.1"})
+    write_label_index(tmp_path, {"00009": {"mtime_ns": 0, "size": 0, "status": None, "instances": 1, "classes": {}}})
+
+    entries, _ = load_label_index(tmp_path, labels_dir, ["00000", "00009"])
+    assert list(entries) == ["00000"]
+    # deleted label files are dropped from the index when it is rewritten
+    assert list(read_label_index(tmp_path)) == ["00000"]
+
+def test_corrupt_index_reads_as_empty(tmp_path):
+    (tmp_path / "label_index.json").write_text("{not json")
+    assert read_label_index(tmp_path) == {}
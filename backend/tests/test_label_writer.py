@@ -0,0 +1,45 @@
+import os
+import numpy as np
+from app.jobs.export_pool import LabelWriter
+from app.jobs.yolo_export import format_polygon
+
+def test_files_are_written_on_flush(tmp_path):
+    writer = LabelWriter(tmp_path)
+    writer.add("00000.txt", "0 0.1 0.2")
+    writer.add("00001.txt", "")
+    assert list(tmp_path.iterdir()) == []
+
+    writer.flush()
+    assert (tmp_path / "00000.txt").read_text() == "0 0.1 0.2"
+    assert (tmp_path / "00001.txt").read_text() == ""
+    # no temp files are left behind
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["00000.txt", "00001.txt"]
+
+def test_buffer_flushes_at_threshold(tmp_path):
+    writer = LabelWriter(tmp_path, flush_bytes=8)
+    writer.add("00000.txt", "0123")
+    assert not (tmp_path / "00000.txt").exists()
+    writer.add("00001.txt", "4567")
+    assert (tmp_path / "00000.txt").exists()
+    assert writer.pending == []
+
+def test_stats_match_written_files(tmp_path):
+    writer = LabelWriter(tmp_path)
+    writer.add("00000.txt", "1 0.5 0.5 0.25 0.25 0.75 0.75")
+    writer.flush()
+
+    st = os.stat(tmp_path / "00000.txt")
+    assert writer.stats["00000.txt"] == (st.st_mtime_ns, st.st_size)
+
+def test_existing_label_is_replaced(tmp_path):
+    (tmp_path / "00000.txt").write_text("a much longer old label line")
+    writer = LabelWriter(tmp_path)
+    writer.add("00000.txt", "new")
+    writer.flush()
+    assert (tmp_path / "00000.txt").read_text() == "new"
+
+def test_format_polygon_matches_per_coordinate_formatting():
+    cnt = np.array([[3, 7], [250, 9], [120, 199]], dtype=np.int32)
+    w, h = 320, 200
+    expected = "2 " + " ".join(f"{x / w:.6f} {y / h:.6f}" for x, y in cnt)
+    assert format_polygon(2, cnt, w, h) == expected
@@ -0,0 +1,70 @@
+import json
+import numpy as np
+import pytest
+from PIL import Image
+from app.jobs.mask_export import encode_coco_frame, rle_encode, write_coco, write_png_frame
+
+def random_mask(seed: int, shape=(37, 53)) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return rng.random(shape) < 0.3
+
+@pytest.mark.parametrize("seed", range(5))
+def test_rle_matches_pycocotools(seed):
+    mask_utils = pytest.importorskip("pycocotools.mask")
+    mask = random_mask(seed)
+    expected = mask_utils.encode(np.asfortranarray(mask.astype(np.uint8)))
+    assert rle_encode(mask) == {"size": expected["size"], "counts": expected["counts"].decode()}
+
+def test_rle_of_mask_starting_with_foreground_round_trips():
+    mask_utils = pytest.importorskip("pycocotools.mask")
+    mask = np.zeros((4, 6), bool)
+    mask[:, :2] = True
+    rle = rle_encode(mask)
+    decoded = mask_utils.decode({"size": rle["size"], "counts": rle["counts"].encode()})
+    assert np.array_equal(decoded.astype(bool), mask)
+
+def test_coco_frame_skips_empty_masks_and_reports_bbox():
+    mask = np.zeros((10, 20), bool)
+    mask[2:5, 3:9] = True
+    frame = encode_coco_frame(4, [(1, 7, mask), (2, 3, np.zeros((10, 20), bool))], 10, 20)
+
+    assert len(frame["annotations"]) == 1
+    ann = frame["annotations"][0]
+    assert ann["category_id"] == 7
+    assert ann["area"] == 18
+    assert ann["bbox"] == [3, 2, 6, 3]
+
+def test_streamed_coco_file_is_valid_json(tmp_path):
+    mask = np.ones((4, 4), bool)
+    results = [
+        [encode_coco_frame(0, [(1, 0, mask)], 4, 4), encode_coco_frame(1, [], 4, 4)],
+        [encode_coco_frame(2, [(1, 0, mask), (2, 5, mask)], 4, 4)],
+    ]
+    stats = write_coco(tmp_path / "annotations.json", iter(results), save_negatives=False)
+
+    coco = json.loads((tmp_path / "annotations.json").read_text())
+    assert [img["id"] for img in coco["images"]] == [0, 2]
+    assert [ann["id"] for ann in coco["annotations"]] == [1, 2, 3]
+    assert stats["frames_empty"] == 1
+    assert stats["annotations_total"] == 3
+
+def test_png_holds_class_plus_one_with_later_objects_on_top(tmp_path):
+    first = np.zeros((6, 6), bool)
+    first[:, :4] = True
+    second = np.zeros((6, 6), bool)
+    second[:, 2:] = True
+    result = write_png_frame(tmp_path, 3, [(1, 0, first), (2, 9, second)], 6, 6, save_negatives=False)
+
+    img = Image.open(tmp_path / "00003.png")
+    assert img.mode == "P"
+    index = np.array(img)
+    assert (index[:, :2] == 1).all()
+    assert (index[:, 2:] == 10).all()
+    assert result["pixels"] == {0: 12, 9: 24}
+
+def test_empty_png_is_written_only_for_negatives(tmp_path):
+    assert not write_png_frame(tmp_path, 0, [], 4, 4, save_negatives=False)["written"]
+    assert not (tmp_path / "00000.png").exists()
+
+    assert write_png_frame(tmp_path, 0, [], 4, 4, save_negatives=True)["written"]
+    assert not np.array(Image.open(tmp_path / "00000.png")).any()
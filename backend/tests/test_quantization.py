@@ -0,0 +1,61 @@
+import pytest
+
+onnx = pytest.importorskip("onnx")
+from onnx import TensorProto, helper
+from app.jobs import quantization
+from app.jobs.quantization import calibration_indices, export_batch, quantize_export
+
+def tiny_export(path, batch: int):
+    graph = helper.make_graph(
+        [helper.make_node("Identity", ["images"], ["output0"])],
+        "tiny",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, [batch, 3, 8, 8])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, [batch, 3, 8, 8])],
+    )
+    onnx.save(helper.make_model(graph), str(path))
+    return path
+
+def test_indices_are_whole_batches_spread_over_the_split():
+    indices = calibration_indices(100, 10, 4)
+    assert len(indices) == 8
+    assert indices == sorted(indices)
+    assert indices[0] == 0 and indices[-1] >= 80
+
+def test_small_splits_repeat_images():
+    indices = calibration_indices(3, 8, 4)
+    assert len(indices) == 8
+    assert set(indices) == {0, 1, 2}
+
+def test_at_least_one_batch_is_calibrated():
+    assert len(calibration_indices(50, 2, 4)) == 4
+
+def test_dynamic_batch_axis_reads_as_one(tmp_path):
+    assert export_batch(onnx.load(str(tiny_export(tmp_path / "a.onnx", 4)))) == 4
+    assert export_batch(onnx.load(str(tiny_export(tmp_path / "b.onnx", 0)))) == 1
+
+def test_report_holds_int8_minus_fp32_delta(monkeypatch, tmp_path):
+    fp32_path = tiny_export(tmp_path / "best.onnx", 4)
+    calls = {}
+
+    def fake_quantize(onnx_path, output, data_yaml, imgsz, calibration_images):
+        calls["calibration_images"] = calibration_images
+        output.write_bytes(b"int8")
+        return output
+
+    def fake_split_batches(data_yaml, split, imgsz, batch, limit):
+        calls["split"] = (split, batch, limit)
+        return {}, ["batch"]
+
+    def fake_evaluate(model_path, data, batches, work_dir):
+        scores = {"best.onnx": 0.5, "best.int8.onnx": 0.45}
+        return {"images": 1, "mask_map": scores[model_path.name]}
+
+    monkeypatch.setattr(quantization, "quantize_onnx", fake_quantize)
+    monkeypatch.setattr(quantization, "split_batches", fake_split_batches)
+    monkeypatch.setattr(quantization, "evaluate", fake_evaluate)
+
+    output, report = quantize_export(fp32_path, tmp_path / "data.yaml", 64, 1000)
+    assert output == tmp_path / "best.int8.onnx"
+    assert calls == {"calibration_images": 300, "split": ("val", 4, 200)}
+    assert report["delta"] == pytest.approx({"mask_map": -0.05})
+    assert report["size_mb"]["int8"] < report["size_mb"]["fp32"]
@@ -0,0 +1,61 @@
+import json
+import pytest
+import torch
+from app.jobs import resume
+from app.jobs.resume import adopt_checkpoint, clear_resume_state, read_resume_state, snapshot_checkpoint, write_resume_state
+
+def job_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(resume, "JOBS_DIR", tmp_path)
+    (tmp_path / "job").mkdir()
+    return tmp_path / "job"
+
+def test_state_round_trips_while_checkpoint_exists(monkeypatch, tmp_path):
+    d = job_dir(monkeypatch, tmp_path)
+    ckpt = d / "resume.pt"
+    ckpt.write_bytes(b"weights")
+    write_resume_state("job", 3, str(ckpt), {"batch": 8})
+
+    assert read_resume_state("job") == {"epoch": 3, "checkpoint": str(ckpt), "autotune": {"batch": 8}}
+    ckpt.unlink()
+    assert read_resume_state("job") is None
+
+def test_corrupt_state_reads_as_none(monkeypatch, tmp_path):
+    d = job_dir(monkeypatch, tmp_path)
+    (d / "resume.json").write_text('{"epoch": ')
+    assert read_resume_state("job") is None
+
+def test_clear_removes_state_and_checkpoint(monkeypatch, tmp_path):
+    d = job_dir(monkeypatch, tmp_path)
+    ckpt = d / "resume.pt"
+    ckpt.write_bytes(b"weights")
+    write_resume_state("job", 1, str(ckpt))
+
+    clear_resume_state("job")
+    assert list(d.iterdir()) == []
+
+def test_snapshot_copies_last_checkpoint(tmp_path):
+    last = tmp_path / "last.pt"
+    last.write_bytes(b"epoch 1")
+    snap = snapshot_checkpoint(last)
+    last.write_bytes(b"epoch 2, half writ")
+
+    assert snap.read_bytes() == b"epoch 1"
+    assert snapshot_checkpoint(last).read_bytes() == b"epoch 2, half writ"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["last.pt", "resume.pt"]
+
+def test_adopted_checkpoint_trains_into_new_job(tmp_path):
+    src = tmp_path / "last.pt"
+    torch.save({"epoch": 4, "optimizer": {"lr": 0.01}, "train_args": {"project": "old", "name": "run", "save_dir": "old/run"}}, src)
+    job = tmp_path / "jobs" / "new"
+    job.mkdir(parents=True)
+
+    dst = adopt_checkpoint(src, job, tmp_path / "data.yaml")
+    args = torch.load(dst, weights_only=False)["train_args"]
+    assert args == {"project": str(job.parent), "name": "new", "data": str(tmp_path / "data.yaml")}
+
+def test_finished_checkpoint_cannot_be_adopted(tmp_path):
+    src = tmp_path / "best.pt"
+    # ultralytics strips the optimizer and sets epoch -1 when training ends
+    torch.save({"epoch": -1, "optimizer": None, "train_args": {}}, src)
+    with pytest.raises(ValueError):
+        adopt_checkpoint(src, tmp_path, tmp_path / "data.yaml")
@@ -0,0 +1,7 @@
+import subprocess
+import sys
+from app.utils.paths import BACKEND_DIR
+
+def test_onnx_engine_does_not_import_torch():
+    code = "import sys, app.services.sam2_onnx_engine; sys.exit('torch' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR).returncode == 0
@@ -0,0 +1,40 @@
+import cv2
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip("sam2")
+
+from app.services.sam2_engine import SAM2_CHECKPOINT, SAM2_MODEL_CFG
+from app.services.sam2_onnx_engine import IMAGE_SIZE, SAM2_ONNX_DECODER, SAM2_ONNX_ENCODER, preprocess_image
+
+MIN_IOU = 0.9
+
+def frame(h: int = 480, w: int = 640) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    image = (rng.random((h, w, 3)) * 60 + 40).astype(np.uint8)
+    cv2.circle(image, (200, 220), 90, (30, 160, 230), -1)
+    cv2.rectangle(image, (380, 100), (590, 400), (200, 60, 40), -1)
+    return image
+
+@pytest.mark.parametrize("size", [(480, 640), (1080, 1920)])
+def test_preprocessing_matches_sam2_transforms(size):
+    from sam2.utils.transforms import SAM2Transforms
+
+    image = frame(*size)
+    expected = SAM2Transforms(resolution=IMAGE_SIZE, mask_threshold=0.0)(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    np.testing.assert_allclose(preprocess_image(image)[0], expected.numpy(), atol=1e-5)
+
+def test_onnx_masks_match_torch_predictor():
+    pytest.importorskip("onnxruntime")
+    for path in (SAM2_CHECKPOINT, SAM2_ONNX_ENCODER, SAM2_ONNX_DECODER):
+        if not path.exists():
+            pytest.skip(f"{path.name} is missing")
+
+    from sam2.build_sam import build_sam2
+    from scripts.export_sam2_onnx import parity_ious
+
+    with torch.inference_mode():
+        model = build_sam2(SAM2_MODEL_CFG, str(SAM2_CHECKPOINT), device="cpu")
+        ious = parity_ious(model, frame(), num_points=8)
+    assert min(ious) >= MIN_IOU
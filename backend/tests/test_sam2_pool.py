@@ -0,0 +1,38 @@
+import pytest
+from app.services.sam2_pool import SAM2WorkerPool
+
+TIMEOUT = 30
+
+def stop(pool):
+    for scheduler in pool.schedulers:
+        scheduler.engine.process.kill()
+
+def test_release_frees_the_worker_slot():
+    pool = SAM2WorkerPool(2)
+    try:
+        first = pool.scheduler_for("a")
+        assert pool.scheduler_for("b") is not first
+        assert pool.release("a") is first
+        assert pool.release("a") is None
+        # the freed worker is the least loaded again
+        assert pool.scheduler_for("c") is first
+    finally:
+        stop(pool)
+
+def test_dead_worker_is_restarted_and_its_folders_released():
+    pool = SAM2WorkerPool(1)
+    try:
+        pool.scheduler_for("a")
+        proxy = pool.schedulers[0].engine
+        dead = proxy.process
+        dead.kill()
+        dead.join(TIMEOUT)
+
+        with pytest.raises(RuntimeError, match="exited"):
+            proxy.reset_video("a")
+        assert proxy.process is not dead and proxy.process.is_alive()
+        assert pool.assignments == {}
+        # the replacement worker answers
+        proxy.reset_video("a")
+    finally:
+        stop(pool)
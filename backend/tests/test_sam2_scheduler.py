@@ -0,0 +1,85 @@
+import threading
+from concurrent.futures import CancelledError
+from contextlib import nullcontext
+import pytest
+from app.services.sam2_scheduler import BULK, SAM2Scheduler
+
+TIMEOUT = 5
+
+class FakeEngine:
+    def autocast(self):
+        return nullcontext()
+
+def blocker():
+    # a task that holds the dispatch thread until released
+    started, release = threading.Event(), threading.Event()
+
+    def fn(engine):
+        started.set()
+        release.wait(TIMEOUT)
+        return "blocker"
+    return fn, started, release
+
+def test_cancel_queued_request():
+    scheduler = SAM2Scheduler(FakeEngine())
+    fn, started, release = blocker()
+    first = scheduler.submit("a", fn)
+    assert started.wait(TIMEOUT)
+
+    ran = []
+    queued = scheduler.submit("a", lambda engine: ran.append(1))
+    assert queued.cancel()
+    release.set()
+
+    assert first.result(TIMEOUT) == "blocker"
+    with pytest.raises(CancelledError):
+        queued.result(TIMEOUT)
+    # the dispatch thread is still serving requests
+    assert scheduler.submit("a", lambda engine: "after").result(TIMEOUT) == "after"
+    assert ran == []
+
+def test_cancel_in_flight_request():
+    scheduler = SAM2Scheduler(FakeEngine())
+    fn, started, release = blocker()
+    running = scheduler.submit("a", fn)
+    assert started.wait(TIMEOUT)
+
+    # a running request cannot be cancelled and still delivers its result
+    assert not running.cancel()
+    release.set()
+    assert running.result(TIMEOUT) == "blocker"
+    assert scheduler.submit("a", lambda engine: "after").result(TIMEOUT) == "after"
+
+def test_cancel_in_flight_bulk_request():
+    scheduler = SAM2Scheduler(FakeEngine())
+    first_step, release = threading.Event(), threading.Event()
+
+    def propagate(engine):
+        def gen():
+            first_step.set()
+            yield
+            release.wait(TIMEOUT)
+            yield
+            return "done"
+        return gen()
+
+    bulk = scheduler.submit("a", propagate, priority=BULK)
+    assert first_step.wait(TIMEOUT)
+    assert not bulk.cancel()
+    release.set()
+    assert bulk.result(TIMEOUT) == "done"
+    assert scheduler.submit("a", lambda engine: "after").result(TIMEOUT) == "after"
+
+def test_cancelling_one_coalesced_caller_keeps_the_others():
+    scheduler = SAM2Scheduler(FakeEngine())
+    fn, started, release = blocker()
+    scheduler.submit("a", fn)
+    assert started.wait(TIMEOUT)
+
+    first = scheduler.submit("a", lambda engine: "old", key=("a", 0, 1))
+    second = scheduler.submit("a", lambda engine: "new", key=("a", 0, 1))
+    assert first.cancel()
+    release.set()
+
+    assert second.result(TIMEOUT) == "new"
+    assert first.cancelled()
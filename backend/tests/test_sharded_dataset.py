@@ -0,0 +1,45 @@
+import cv2
+import numpy as np
+import pytest
+from app.jobs.shards import write_shards
+
+pytest.importorskip("ultralytics")
+from ultralytics.cfg import get_cfg
+from app.jobs.sharded_dataset import build_sharded_dataset, reduced_flag
+
+def sharded_split(root) -> str:
+    images_dir, labels_dir = root / "images", root / "labels"
+    images_dir.mkdir(parents=True)
+    labels_dir.mkdir()
+    for frame_idx in range(2):
+        cv2.imwrite(str(images_dir / f"{frame_idx:05d}.jpg"), np.full((48, 64, 3), 90, np.uint8))
+        (labels_dir / f"{frame_idx:05d}.txt").write_text("0 0.25 0.25 0.75 0.25 0.75 0.75 0.25 0.75\n")
+    (labels_dir / "00001.txt").write_text("")
+    write_shards(images_dir, labels_dir, [0, 1], root / "shards")
+
+    split = root / "val.npz"
+    np.savez(
+        split,
+        datasets=np.array([str(root / "shards")]),
+        records=np.array([(0, 0), (0, 1)], dtype=[("dataset", "<i4"), ("record", "<i4")]),
+    )
+    return str(split)
+
+def test_labels_and_images_come_from_shards(tmp_path):
+    cfg = get_cfg(overrides={"imgsz": 32, "task": "segment"})
+    data = {"names": {0: "class_0"}, "nc": 1, "channels": 3}
+    dataset = build_sharded_dataset(cfg, sharded_split(tmp_path), 2, data, mode="val")
+
+    assert len(dataset) == 2
+    assert dataset.labels[0]["cls"].tolist() == [[0.0]]
+    assert dataset.labels[0]["shape"] == (48, 64)
+    assert len(dataset.labels[1]["cls"]) == 0
+
+    sample = dataset[0]
+    assert sample["img"].shape[0] == 3
+    assert max(sample["img"].shape[1:]) == 32
+
+def test_reduced_decode_never_undershoots_imgsz():
+    assert reduced_flag(cv2.IMREAD_COLOR, 1920, 640) == cv2.IMREAD_REDUCED_COLOR_2
+    assert reduced_flag(cv2.IMREAD_COLOR, 5120, 640) == cv2.IMREAD_REDUCED_COLOR_8
+    assert reduced_flag(cv2.IMREAD_COLOR, 1000, 640) == cv2.IMREAD_COLOR
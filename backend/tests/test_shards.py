@@ -0,0 +1,53 @@
+import pickle
+import cv2
+import numpy as np
+from app.jobs.shards import ShardReader, write_shards
+
+def write_frames(root, sizes: list[tuple[int, int]]):
+    images_dir, labels_dir = root / "images", root / "labels"
+    images_dir.mkdir(parents=True)
+    labels_dir.mkdir()
+    for frame_idx, (h, w) in enumerate(sizes):
+        image = np.full((h, w, 3), 40 * frame_idx, np.uint8)
+        cv2.imwrite(str(images_dir / f"{frame_idx:05d}.jpg"), image)
+        (labels_dir / f"{frame_idx:05d}.txt").write_text(f"{frame_idx} 0.1 0.1 0.5 0.1 0.5 0.5")
+    return images_dir, labels_dir
+
+def test_records_round_trip(tmp_path):
+    images_dir, labels_dir = write_frames(tmp_path, [(20, 30), (40, 10)])
+    stats = write_shards(images_dir, labels_dir, [0, 1], tmp_path / "shards")
+    reader = ShardReader(tmp_path / "shards")
+
+    assert stats["records"] == len(reader) == 2
+    for i in range(2):
+        assert reader.image_bytes(i).tobytes() == (images_dir / f"{i:05d}.jpg").read_bytes()
+        assert reader.label_text(i) == (labels_dir / f"{i:05d}.txt").read_text()
+    assert reader.image_shape(1) == (40, 10)
+    assert reader.read_image(1).shape == (40, 10, 3)
+
+def test_frames_without_image_are_skipped(tmp_path):
+    images_dir, labels_dir = write_frames(tmp_path, [(8, 8), (8, 8)])
+    (images_dir / "00000.jpg").unlink()
+    write_shards(images_dir, labels_dir, [0, 1], tmp_path / "shards")
+
+    reader = ShardReader(tmp_path / "shards")
+    assert reader.index["frame"].tolist() == [1]
+
+def test_shards_roll_over_at_size_limit(tmp_path):
+    images_dir, labels_dir = write_frames(tmp_path, [(16, 16)] * 3)
+    stats = write_shards(images_dir, labels_dir, [0, 1, 2], tmp_path / "shards", shard_bytes=1)
+
+    assert stats["shards"] == 3
+    reader = ShardReader(tmp_path / "shards")
+    assert reader.index["shard"].tolist() == [0, 1, 2]
+    assert reader.label_text(2).startswith("2 ")
+
+def test_reader_pickles_without_maps(tmp_path):
+    images_dir, labels_dir = write_frames(tmp_path, [(8, 8)])
+    write_shards(images_dir, labels_dir, [0], tmp_path / "shards")
+    reader = ShardReader(tmp_path / "shards")
+    reader.label_text(0)
+
+    copy = pickle.loads(pickle.dumps(reader))
+    assert copy.maps == {}
+    assert copy.label_text(0) == reader.label_text(0)
@@ -0,0 +1,67 @@
+import os
+import cv2
+import numpy as np
+from app.jobs import dataset_splitter
+from app.jobs.dataset_splitter import prune_training_views, split_and_build_training_view
+
+def make_dataset(monkeypatch, tmp_path, frames: int = 5):
+    monkeypatch.setattr(dataset_splitter, "SEGMENTATIONS_DIR", tmp_path / "segmentations")
+    monkeypatch.setattr(dataset_splitter, "TRAINING_VIEWS_DIR", tmp_path / "views")
+    root = tmp_path / "segmentations" / "d"
+    (root / "images").mkdir(parents=True)
+    (root / "labels").mkdir()
+    for i in range(frames):
+        cv2.imwrite(str(root / "images" / f"{i:05d}.jpg"), np.full((8, 8, 3), i, np.uint8))
+        (root / "labels" / f"{i:05d}.txt").write_text("0 0.1 0.1 0.5 0.1 0.5 0.5")
+    return root
+
+def build(tmp_path, job: str, **options):
+    return split_and_build_training_view(["d"], tmp_path / "jobs" / job, **options)
+
+def test_same_inputs_reuse_one_view(monkeypatch, tmp_path):
+    make_dataset(monkeypatch, tmp_path)
+    first_yaml, first = build(tmp_path, "a")
+    second_yaml, second = build(tmp_path, "b")
+
+    assert not first["view"]["cached"]
+    assert second["view"] == {"key": first["view"]["key"], "cached": True}
+    assert first_yaml.resolve() == second_yaml.resolve()
+    assert (tmp_path / "jobs" / "b" / "dataset").is_symlink()
+
+def test_key_follows_split_parameters_and_labels(monkeypatch, tmp_path):
+    root = make_dataset(monkeypatch, tmp_path)
+    key = build(tmp_path, "a")[1]["view"]["key"]
+
+    assert build(tmp_path, "b", seed=1)[1]["view"]["key"] != key
+    assert build(tmp_path, "c", train_ratio=0.6)[1]["view"]["key"] != key
+
+    label = root / "labels" / "00000.txt"
+    label.write_text("0 0.2 0.2 0.6 0.2 0.6 0.6")
+    os.utime(label, ns=(1, 1))
+    assert build(tmp_path, "d")[1]["view"]["key"] != key
+
+def test_linked_views_are_never_pruned(monkeypatch, tmp_path):
+    make_dataset(monkeypatch, tmp_path)
+    key = build(tmp_path, "a")[1]["view"]["key"]
+    view_dir = tmp_path / "views" / key
+
+    refs = list((view_dir / ".refs").iterdir())
+    assert [r.read_text() for r in refs] == [str((tmp_path / "jobs" / "a" / "dataset").absolute())]
+
+    prune_training_views(keep=0)
+    assert view_dir.exists()
+
+def test_views_without_live_links_are_pruned_oldest_first(monkeypatch, tmp_path):
+    make_dataset(monkeypatch, tmp_path)
+    old = tmp_path / "views" / build(tmp_path, "a")[1]["view"]["key"]
+    new = tmp_path / "views" / build(tmp_path, "b", seed=1)[1]["view"]["key"]
+    os.utime(old, (1, 1))
+
+    # a deleted job directory leaves a stale ref behind
+    (tmp_path / "jobs" / "a" / "dataset").unlink()
+    (tmp_path / "jobs" / "b" / "dataset").unlink()
+    prune_training_views(keep=1)
+
+    assert not old.exists()
+    assert new.exists()
+    assert list((new / ".refs").iterdir()) == []
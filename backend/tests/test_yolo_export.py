@@ -0,0 +1,58 @@
+import numpy as np
+from app.jobs import yolo_export
+from app.models.save import SaveSegmentationsYOLORequest
+from app.services.job_store import YOLO_JOBS
+from app.services.mask_store import MaskStore
+
+def square(x: int) -> np.ndarray:
+    mask = np.zeros((32, 32), bool)
+    mask[8:24, x:x + 12] = True
+    return mask
+
+def setup_store(monkeypatch, tmp_path, frames: int = 3) -> MaskStore:
+    store = MaskStore()
+    store.create_obj_id("v", 1, 0)
+    for frame_idx in range(frames):
+        store.save_mask("v", frame_idx, 1, square(4))
+    monkeypatch.setattr(yolo_export, "MASK_STORE", store)
+    monkeypatch.setattr(yolo_export, "SEGMENTATIONS_DIR", tmp_path / "segmentations")
+    monkeypatch.setattr(yolo_export, "UPLOADS_DIR", tmp_path / "uploads")
+    return store
+
+def export(job_id: str, **options) -> dict:
+    YOLO_JOBS[job_id] = {"status": "running", "processed": 0, "total": 0, "progress": 0.0, "error": None}
+    yolo_export.run_yolo_export("v", SaveSegmentationsYOLORequest(folder="v", **options), job_id)
+    return YOLO_JOBS.pop(job_id)
+
+def test_second_export_rewrites_only_changed_frames(monkeypatch, tmp_path):
+    store = setup_store(monkeypatch, tmp_path)
+    assert export("first")["total"] == 3
+
+    store.save_mask("v", 1, 1, square(10))
+    job = export("second")
+    assert job["total"] == 1
+    assert job["unchanged"] == 2
+
+def test_new_session_invalidates_manifest(monkeypatch, tmp_path):
+    store = setup_store(monkeypatch, tmp_path)
+    export("first")
+
+    # a restarted server starts versions from scratch under a new session id
+    store.session_id = "restarted"
+    assert export("second")["total"] == 3
+
+def test_new_export_config_invalidates_manifest(monkeypatch, tmp_path):
+    setup_store(monkeypatch, tmp_path)
+    export("first")
+
+    assert export("second", min_area=50)["total"] == 3
+    assert export("third", min_area=50)["total"] == 0
+
+def test_preview_masks_are_not_exported(monkeypatch, tmp_path):
+    store = setup_store(monkeypatch, tmp_path, frames=2)
+    store.save_mask("v", 1, 1, square(10), preview=True)
+    export("first")
+
+    labels_dir = tmp_path / "segmentations" / "v" / "labels"
+    assert (labels_dir / "00000.txt").read_text().startswith("0 ")
+    assert (labels_dir / "00001.txt").read_text() == ""
@@ -25,6 +25,11 @@ const statusConfig: Record<
     variant: "default",
     icon: <Loader2 className="h-3 w-3 animate-spin" />,
   },
+  resumed: {
+    label: "Resumed",
+    variant: "default",
+    icon: <Loader2 className="h-3 w-3 animate-spin" />,
+  },
   completed: {
     label: "Completed",
     variant: "outline",
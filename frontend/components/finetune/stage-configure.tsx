@@ -30,7 +30,9 @@ export function StageConfigure({
   onNext,
 }: StageConfigureProps) {
   const { models, isLoading: modelsLoading } = useFetchModels()
-  const { checkpoints, isLoading: checkpointsLoading } = useFetchCheckpoints(config.base_model)
+  const { checkpoints: allCheckpoints, isLoading: checkpointsLoading } = useFetchCheckpoints(config.base_model)
+  // exported models are for inference only
+  const checkpoints = allCheckpoints.filter((cp) => cp.format === "pytorch")
   const { datasets, isLoading: datasetsLoading } = useSegmentationDatasets()
 
   const updateConfig = <K extends keyof FineTuneConfig>(key: K, value: FineTuneConfig[K]) => {
@@ -464,12 +466,12 @@ export function StageConfigure({
                 <>
                   <div className="flex items-center gap-2">
                     <Switch
-                      id="use_ray"
-                      checked={config.tuning.use_ray_tune}
-                      onCheckedChange={(v) => updateTuning("use_ray_tune", v)}
+                      id="celery_trials"
+                      checked={config.tuning.celery_trials}
+                      onCheckedChange={(v) => updateTuning("celery_trials", v)}
                     />
-                    <Label htmlFor="use_ray" className="text-xs cursor-pointer">
-                      Use Ray
+                    <Label htmlFor="celery_trials" className="text-xs cursor-pointer">
+                      Run trials on Celery workers
                     </Label>
                   </div>
                   <div className="space-y-1.5">
@@ -485,6 +487,19 @@ export function StageConfigure({
                       className="h-8"
                     />
                   </div>
+                  <div className="space-y-1.5">
+                    <Label htmlFor="trial_epochs" className="text-xs">
+                      Epochs per Trial
+                    </Label>
+                    <Input
+                      id="trial_epochs"
+                      type="number"
+                      min={1}
+                      value={config.tuning.trial_epochs}
+                      onChange={(e) => updateTuning("trial_epochs", Number.parseInt(e.target.value) || 10)}
+                      className="h-8"
+                    />
+                  </div>
                 </>
               )}
             </div>
@@ -528,6 +543,34 @@ export function StageConfigure({
                   />
                 </div>
               )}
+              {config.export.export_onnx && (
+                <div className="flex items-center gap-2">
+                  <Switch
+                    id="quantize_int8"
+                    checked={config.export.quantize_int8}
+                    onCheckedChange={(v) => updateExport("quantize_int8", v)}
+                  />
+                  <Label htmlFor="quantize_int8" className="text-xs cursor-pointer">
+                    INT8 variant
+                  </Label>
+                </div>
+              )}
+              {config.export.export_onnx && config.export.quantize_int8 && (
+                <div className="space-y-1.5">
+                  <Label htmlFor="calibration_images" className="text-xs">
+                    Calibration Images
+                  </Label>
+                  <Input
+                    id="calibration_images"
+                    type="number"
+                    min={1}
+                    max={300}
+                    value={config.export.calibration_images}
+                    onChange={(e) => updateExport("calibration_images", Number.parseInt(e.target.value) || 1)}
+                    className="h-8"
+                  />
+                </div>
+              )}
             </div>
           </AccordionContent>
         </AccordionItem>
@@ -21,6 +21,7 @@ interface StageProgressProps {
 const getEventColor = (type: SSEEvent["event"]) => {
   switch (type) {
     case "starting":
+    case "resumed":
       return "text-blue-500"
     case "completed":
       return "text-green-500"
@@ -123,7 +124,7 @@ export function StageProgress({
             <Progress value={epochProgress} className="h-3" />
           </div>
 
-          {job.status === "running" && (
+          {(job.status === "running" || job.status === "resumed") && (
             <Button variant="destructive" onClick={onCancel} className="w-full">
               <XCircle className="mr-2 h-4 w-4" />
               Cancel Training
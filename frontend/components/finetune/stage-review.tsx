@@ -195,7 +195,8 @@ export function StageReview({
             value={
               config.export.export_onnx ? (
                 <span className="flex items-center gap-1 text-green-600">
-                  <Check className="h-4 w-4" /> Enabled (batch: {config.export.onnx_batch_size})
+                  <Check className="h-4 w-4" /> Enabled (batch: {config.export.onnx_batch_size}
+                  {config.export.quantize_int8 && `, INT8 from ${config.export.calibration_images} images`})
                 </span>
               ) : (
                 <span className="flex items-center gap-1 text-muted-foreground">
@@ -37,12 +37,15 @@ const buildFineTunePayload = (config: FineTuneConfig) => {
       },
       tuning: {
         enabled: config.tuning.enable_tuning,
-        use_ray: config.tuning.use_ray_tune,
+        celery_trials: config.tuning.celery_trials,
         iterations: config.tuning.iterations,
+        trial_epochs: config.tuning.trial_epochs,
       },
       export: {
         export_onnx: config.export.export_onnx,
         onnx_batch_size: config.export.onnx_batch_size,
+        quantize_int8: config.export.quantize_int8,
+        calibration_images: config.export.calibration_images,
       },
     },
   }
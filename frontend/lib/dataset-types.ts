@@ -29,5 +29,6 @@ export interface SegmentationsYOLOMetadata {
   export_config: {
     min_area: number
     simplify: boolean
-  }
+  } | null
+  exports: Record<string, Record<string, unknown>>
 }
\ No newline at end of file
@@ -1,4 +1,4 @@
-export type JobStatus = "queued" | "running" | "cancelled" | "completed" | "failed"
+export type JobStatus = "queued" | "running" | "resumed" | "cancelled" | "completed" | "failed"
 
 export type ModelSize = "n" | "s" | "m" | "l" | "x"
 
@@ -29,13 +29,16 @@ export interface DatasetConfig {
 
 export interface TuningConfig {
   enable_tuning: boolean
-  use_ray_tune: boolean
+  celery_trials: boolean
   iterations: number
+  trial_epochs: number
 }
 
 export interface ExportConfig {
   export_onnx: boolean
   onnx_batch_size: number
+  quantize_int8: boolean
+  calibration_images: number
   export_tensorrt: boolean
 }
 
@@ -95,13 +98,16 @@ export const defaultDatasetConfig: DatasetConfig = {
 
 export const defaultTuningConfig: TuningConfig = {
   enable_tuning: false,
-  use_ray_tune: false,
+  celery_trials: false,
   iterations: 10,
+  trial_epochs: 10,
 }
 
 export const defaultExportConfig: ExportConfig = {
   export_onnx: false,
   onnx_batch_size: 1,
+  quantize_int8: false,
+  calibration_images: 64,
   export_tensorrt: false,
 }
 
@@ -117,6 +123,9 @@ export interface FineTuneJob {
   started_at?: string | null
   finished_at?: string | null
   error?: string | null
+  resume_count: number
+  resumed_from_epoch?: number | null
+  resumed_at?: string | null
 }
 
 export type TrainingMetrics = Record<string, number>
@@ -147,6 +156,7 @@ export interface DatasetReport {
 
 export type FineTuneEventType =
   | "starting"
+  | "resumed"
   | "model_loaded"
   | "dataset_ready"
   | "epoch_end"
@@ -176,6 +186,14 @@ export type SSEEvent =
       timestamp: string
       data: DatasetReport
     }
+  | {
+      job_id: string
+      event: "resumed"
+      timestamp: string
+      data: {
+        epoch: number
+      }
+    }
   | {
       job_id: string
       event: "epoch_end"
@@ -32,5 +32,9 @@ export interface ModelCheckpoint {
   id: string
   label: string
   epoch?: number
+  format: "pytorch" | "onnx"
+  precision?: "fp32" | "int8"
+  // INT8 mask mAP50-95 minus the FP32 export's, on the validation split
+  accuracy_delta?: number
   recommended?: boolean
 }
\ No newline at end of file